@@ -0,0 +1,114 @@
+"""
+Bulk-download full fill histories into a columnar FillArchive.
+
+  python backfill.py wallets.txt --out data/archive
+  python backfill.py wallets.txt --format arrow --concurrency 16 --from-ms 1735689600000
+
+`wallets.txt` holds one address per line (blank lines and # comments are
+skipped). Users are fetched concurrently, all drawing from one rate limit
+(HL_WEIGHT_PER_MINUTE), and each UTC day is written as soon as it is
+complete. Every user keeps a checkpoint, so re-running after an
+interruption (or later, to pick up new fills) only re-fetches from the
+newest archived day.
+"""
+import sys
+import time
+import asyncio
+import argparse
+from src.infrastructure.fill_archive import ARCHIVE_FORMATS, DAY_MS, FillArchive, day_of
+from src.infrastructure.public_hl_datasource import PublicHLDataSource, create_http_client
+from src.infrastructure.rate_limiter import TokenBucketRateLimiter
+
+def read_addresses(path):
+  addresses = []
+  with open(path, encoding="utf-8") as f:
+    for line in f:
+      line = line.split("#", 1)[0]
+      addresses.extend(a.strip().lower() for a in line.split(",") if a.strip())
+  return list(dict.fromkeys(addresses))
+
+async def backfill_user(ds, archive, user, from_ms=None, to_ms=None, fresh=False):
+  """
+  Archive the user's fills day by day, moving their checkpoint after each
+  completed day. Returns (fills, days) written.
+  """
+  resume_ms = None if fresh else archive.resume_ms(user)
+  # Each day's file is replaced whole, so fetch from the start of from_ms's UTC day
+  start_ms = max(from_ms // DAY_MS * DAY_MS if from_ms else 0, resume_ms or 0) or None
+  day, day_fills = None, []
+  written_fills = written_days = 0
+
+  async def flush():
+    nonlocal written_fills, written_days
+    await asyncio.to_thread(archive.write_day, user, day, day_fills)
+    written_fills += len(day_fills)
+    written_days += 1
+
+  async for page in ds.iter_user_fill_pages(user, from_ms=start_ms, to_ms=to_ms):
+    for fill in page:
+      fill_day = day_of(fill.time)
+      if fill_day != day:
+        if day_fills:
+          # Pages are time-ordered, so the previous day is complete
+          await flush()
+          await asyncio.to_thread(archive.save_checkpoint, user, fill.time // DAY_MS * DAY_MS)
+        day, day_fills = fill_day, []
+      day_fills.append(fill)
+
+  if day_fills:
+    await flush()
+    # The newest day may still be receiving fills, so the next run re-fetches it
+    await asyncio.to_thread(archive.save_checkpoint, user, day_fills[0].time // DAY_MS * DAY_MS)
+  return written_fills, written_days
+
+async def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("addresses", help="file with one wallet address per line")
+  parser.add_argument("--out", default="data/archive", help="archive root directory")
+  parser.add_argument("--format", choices=list(ARCHIVE_FORMATS), default="parquet")
+  parser.add_argument(
+    "--compression", default=None,
+    help="codec (zstd, lz4, snappy, ...; 'none' to disable). Default: zstd for parquet, none for arrow so it can be memory-mapped"
+  )
+  parser.add_argument("--concurrency", type=int, default=8, help="users fetched at once")
+  parser.add_argument("--from-ms", type=int, default=None, help="rounded down to the start of its UTC day")
+  parser.add_argument("--to-ms", type=int, default=None)
+  parser.add_argument("--fresh", action="store_true", help="ignore checkpoints and re-fetch everything")
+  args = parser.parse_args()
+
+  try:
+    archive = FillArchive(args.out, args.format, args.compression)
+  except RuntimeError as e:
+    # pyarrow missing: stop before fetching anything
+    parser.error(str(e))
+  users = read_addresses(args.addresses)
+  semaphore = asyncio.Semaphore(args.concurrency)
+  failed = []
+  started = time.perf_counter()
+
+  async with create_http_client() as client:
+    rate_limiter = TokenBucketRateLimiter()
+    ds = PublicHLDataSource(client=client, rate_limiter=rate_limiter)
+
+    async def run(user):
+      async with semaphore:
+        user_started = time.perf_counter()
+        try:
+          fills, days = await backfill_user(ds, archive, user, args.from_ms, args.to_ms, args.fresh)
+        except Exception as e:
+          # Keep going; the checkpoint lets a re-run continue this user
+          failed.append(user)
+          print(f"{user}: failed after {time.perf_counter() - user_started:.1f}s: {e!r}", file=sys.stderr, flush=True)
+          return
+        print(f"{user}: {fills} fills over {days} days in {time.perf_counter() - user_started:.1f}s", flush=True)
+
+    await asyncio.gather(*(run(user) for user in users))
+    print(
+      f"{len(users) - len(failed)}/{len(users)} users archived to {args.out} "
+      f"in {time.perf_counter() - started:.1f}s; rate limiter: {rate_limiter.stats()}",
+      flush=True,
+    )
+  return 1 if failed else 0
+
+if __name__ == "__main__":
+  sys.exit(asyncio.run(main()))
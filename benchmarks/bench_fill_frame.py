@@ -0,0 +1,65 @@
+"""
+Compare the FillFrame vectorized metrics against the per-fill FillEngine pass.
+
+Run from the repo root:
+  python -m benchmarks.bench_fill_frame --fills 200000
+"""
+import argparse
+import time
+from benchmarks.synthetic import TARGET_BUILDER, synthetic_fills
+from src.core.models import to_fills
+from src.services.fill_engine import process_fills
+from src.services.fill_frame import FillFrame, summarize_fills
+
+def timed(fn, repeat):
+  best = float("inf")
+  for _ in range(repeat):
+    start = time.perf_counter()
+    result = fn()
+    best = min(best, time.perf_counter() - start)
+  return best, result
+
+def main():
+  parser = argparse.ArgumentParser()
+  parser.add_argument("--fills", type=int, default=200_000)
+  parser.add_argument("--repeat", type=int, default=5)
+  args = parser.parse_args()
+
+  fills = to_fills(synthetic_fills(args.fills), TARGET_BUILDER)
+  build_s, frame = timed(lambda: FillFrame.from_fills(fills, TARGET_BUILDER), args.repeat)
+
+  cases = [
+    ("aggregate", lambda: process_fills(fills, TARGET_BUILDER),
+      lambda: (frame.volume(), frame.realized_pnl(), frame.fees(), len(frame))),
+    ("builder_only", lambda: process_fills(fills, TARGET_BUILDER, builder_only=True),
+      lambda: summarize_fills(fills, TARGET_BUILDER, builder_only=True)),
+    ("positions", lambda: process_fills(fills, TARGET_BUILDER, collect_positions=True),
+      lambda: summarize_fills(fills, TARGET_BUILDER, collect_positions=True)),
+    ("per_coin_pnl", lambda: _per_coin_pnl(fills), lambda: frame.per_coin(frame.closed_pnl)),
+    ("cumulative_position", lambda: _cumulative_position(fills), lambda: frame.cumulative_position()),
+  ]
+
+  print(f"{args.fills} fills, FillFrame build: {build_s * 1000:.1f} ms")
+  print(f"{'metric':<22}{'engine ms':>12}{'frame ms':>12}{'speedup':>10}")
+  for name, per_fill, vectorized in cases:
+    per_fill_s, _ = timed(per_fill, args.repeat)
+    frame_s, _ = timed(vectorized, args.repeat)
+    print(f"{name:<22}{per_fill_s * 1000:>12.2f}{frame_s * 1000:>12.2f}{per_fill_s / frame_s:>9.1f}x")
+
+def _per_coin_pnl(fills):
+  sums = {}
+  for f in fills:
+    sums[f.coin] = sums.get(f.coin, 0.0) + f.closed_pnl
+  return sums
+
+def _cumulative_position(fills):
+  positions = {}
+  running = []
+  for f in fills:
+    size = f.sz if f.side == "B" else -f.sz
+    positions[f.coin] = positions.get(f.coin, 0.0) + size
+    running.append(positions[f.coin])
+  return running
+
+if __name__ == "__main__":
+  main()
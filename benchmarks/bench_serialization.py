@@ -0,0 +1,44 @@
+"""
+Serialization throughput for large /v1/trades and /v1/positions/history
+responses: FastAPI's default path (jsonable_encoder + stdlib json on dicts)
+vs. slotted row dataclasses through orjson.
+
+Run from the repo root:
+  python -m benchmarks.bench_serialization --rows 100000
+"""
+import argparse
+import json
+from dataclasses import asdict
+import orjson
+from fastapi.encoders import jsonable_encoder
+from benchmarks.bench_fill_frame import timed
+from benchmarks.synthetic import TARGET_BUILDER, synthetic_fills
+from src.services.fill_frame import summarize_fills
+
+def default_path(rows):
+  # What JSONResponse does with a returned list of dicts
+  return json.dumps(jsonable_encoder(rows), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def main():
+  parser = argparse.ArgumentParser()
+  parser.add_argument("--rows", type=int, default=100_000)
+  parser.add_argument("--repeat", type=int, default=3)
+  args = parser.parse_args()
+
+  report = summarize_fills(
+    synthetic_fills(args.rows), TARGET_BUILDER, collect_trades=True, collect_positions=True
+  )
+
+  print(f"{args.rows} rows")
+  print(f"{'payload':<12}{'encoder':<26}{'ms':>10}{'rows/s':>14}{'MB':>8}")
+  for name, rows in (("trades", report.trades), ("positions", report.positions)):
+    dict_rows = [asdict(row) for row in rows]
+    for label, fn in (
+      ("jsonable_encoder + json", lambda: default_path(dict_rows)),
+      ("orjson + slotted rows", lambda: orjson.dumps(rows)),
+    ):
+      seconds, body = timed(fn, args.repeat)
+      print(f"{name:<12}{label:<26}{seconds * 1000:>10.1f}{len(rows) / seconds:>14,.0f}{len(body) / 1e6:>8.1f}")
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,159 @@
+"""
+Local stand-in for Hyperliquid's REST `/info`, serving synthetic or
+recorded histories with configurable latency, so endpoints can be
+benchmarked end to end without mainnet or its rate limits.
+
+  python -m benchmarks.stub_hl_info --port 8766 --users 20 --fills 20000 --latency-ms 40
+  python -m benchmarks.stub_hl_info --fixtures benchmarks/fixtures
+  HL_INFO_URL=http://127.0.0.1:8766/info uvicorn main:app
+
+Implements userFills, userFillsByTime, clearinghouseState,
+userNonFundingLedgerUpdates and userFunding with the real page limits.
+Unknown users have no fills. HTTP/1.1 with keep-alive, standard library only.
+"""
+import time
+import random
+import asyncio
+import argparse
+from bisect import bisect_left, bisect_right
+import orjson
+from benchmarks.synthetic import load_fixtures, synthetic_users
+
+FILLS_PAGE_LIMIT = 2000
+USER_FILLS_LIMIT = 2000
+LEDGER_PAGE_LIMIT = 2000
+FUNDING_PAGE_LIMIT = 500
+
+class StubHLInfo:
+  """
+  Serves `dataset` ({user: {"fills", "ledger", "funding", "accountValue"}}), sleeping
+  latency_ms (+ uniform jitter_ms) before each response
+  """
+  def __init__(self, dataset, host="127.0.0.1", port=0, latency_ms=0.0, jitter_ms=0.0, seed=0):
+    self.host = host
+    self.port = port
+    self.latency_ms = latency_ms
+    self.jitter_ms = jitter_ms
+    self.users = {}
+    for user, data in dataset.items():
+      fills = data["fills"]
+      ledger = sorted(data.get("ledger", []), key=lambda u: u["time"])
+      funding = sorted(data.get("funding", []), key=lambda u: u["time"])
+      self.users[user.lower()] = {
+        "fills": fills,
+        "fill_times": [f["time"] for f in fills],
+        "ledger": ledger,
+        "ledger_times": [u["time"] for u in ledger],
+        "funding": funding,
+        "funding_times": [u["time"] for u in funding],
+        "accountValue": data.get("accountValue", "0.0"),
+      }
+    self.requests = {}  # request type -> count
+    self.server = None
+    self._rnd = random.Random(seed)
+
+  @property
+  def info_url(self):
+    return f"http://{self.host}:{self.port}/info"
+
+  async def start(self):
+    self.server = await asyncio.start_server(self._serve, self.host, self.port)
+    self.port = self.server.sockets[0].getsockname()[1]
+    return self
+
+  async def stop(self):
+    self.server.close()
+    await self.server.wait_closed()
+
+  async def _serve(self, reader, writer):
+    try:
+      while True:
+        head = await reader.readuntil(b"\r\n\r\n")
+        lines = head.decode("latin-1").split("\r\n")
+        method, path, _ = lines[0].split(" ", 2)
+        headers = {}
+        for line in lines[1:]:
+          if ":" in line:
+            name, value = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+        body = await reader.readexactly(int(headers.get("content-length", 0)))
+
+        if method == "POST" and path == "/info":
+          status, payload = self.handle(orjson.loads(body))
+        else:
+          status, payload = 404, {"error": "not found"}
+        delay = self.latency_ms + self._rnd.uniform(0, self.jitter_ms)
+        if delay > 0:
+          await asyncio.sleep(delay / 1000)
+
+        data = orjson.dumps(payload)
+        writer.write(
+          f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+          f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n\r\n".encode() + data
+        )
+        await writer.drain()
+        if headers.get("connection", "").lower() == "close":
+          break
+    except (asyncio.IncompleteReadError, ConnectionError):
+      pass
+    finally:
+      writer.close()
+
+  def handle(self, request):
+    kind = request.get("type")
+    self.requests[kind] = self.requests.get(kind, 0) + 1
+    user = self.users.get(str(request.get("user", "")).lower())
+    if kind == "userFills":
+      fills = user["fills"][-USER_FILLS_LIMIT:] if user else []
+      return 200, fills[::-1]
+    if kind == "userFillsByTime":
+      if not user:
+        return 200, []
+      return 200, _window(user["fills"], user["fill_times"], request, FILLS_PAGE_LIMIT)
+    if kind == "clearinghouseState":
+      value = user["accountValue"] if user else "0.0"
+      return 200, {
+        "marginSummary": {"accountValue": value, "totalNtlPos": "0.0", "totalRawUsd": value, "totalMarginUsed": "0.0"},
+        "assetPositions": [],
+        "time": int(time.time() * 1000),
+      }
+    if kind == "userNonFundingLedgerUpdates":
+      if not user:
+        return 200, []
+      return 200, _window(user["ledger"], user["ledger_times"], request, LEDGER_PAGE_LIMIT)
+    if kind == "userFunding":
+      if not user:
+        return 200, []
+      return 200, _window(user["funding"], user["funding_times"], request, FUNDING_PAGE_LIMIT)
+    return 422, {"error": f"unsupported request type {kind!r}"}
+
+def _window(items, times, request, limit):
+  # Oldest first from startTime, like the time-ranged endpoints
+  start = bisect_left(times, request.get("startTime") or 0)
+  end_time = request.get("endTime")
+  end = bisect_right(times, end_time) if end_time is not None else len(items)
+  return items[start:min(end, start + limit)]
+
+async def main():
+  parser = argparse.ArgumentParser()
+  parser.add_argument("--host", default="127.0.0.1")
+  parser.add_argument("--port", type=int, default=8766)
+  parser.add_argument("--fixtures", help="directory of <address>.json files instead of synthetic users")
+  parser.add_argument("--users", type=int, default=20)
+  parser.add_argument("--fills", type=int, default=20_000, help="fills per synthetic user")
+  parser.add_argument("--coins", type=int, default=8)
+  parser.add_argument("--seed", type=int, default=7)
+  parser.add_argument("--latency-ms", type=float, default=0.0)
+  parser.add_argument("--jitter-ms", type=float, default=0.0)
+  args = parser.parse_args()
+
+  if args.fixtures:
+    dataset = load_fixtures(args.fixtures)
+  else:
+    dataset = synthetic_users(args.users, args.fills, seed=args.seed, coins=args.coins)
+  stub = await StubHLInfo(dataset, args.host, args.port, args.latency_ms, args.jitter_ms).start()
+  print(f"stub /info serving {len(dataset)} users on {stub.info_url}", flush=True)
+  await asyncio.Event().wait()
+
+if __name__ == "__main__":
+  asyncio.run(main())
@@ -0,0 +1,163 @@
+"""
+Local stand-in for the Hyperliquid websocket (`/ws`), for exercising live
+fill ingestion without mainnet. Speaks just enough of RFC 6455 (text, ping
+and close frames) with the standard library.
+
+  python -m benchmarks.stub_hl_ws --port 8765
+  HL_WS_BASE_URL=http://127.0.0.1:8765 LIVE_FILLS_USERS=0x... uvicorn main:app
+
+From Python, `StubHLWebsocket.push(user, fills)` delivers fills to
+subscribers and `drop_connections()` simulates a disconnect.
+"""
+import json
+import base64
+import struct
+import asyncio
+import hashlib
+import argparse
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+OP_TEXT, OP_CLOSE, OP_PING, OP_PONG = 0x1, 0x8, 0x9, 0xA
+
+class _Connection:
+  def __init__(self, reader, writer):
+    self.reader = reader
+    self.writer = writer
+    self.users = set()
+
+  async def handshake(self):
+    request = await self.reader.readuntil(b"\r\n\r\n")
+    headers = {}
+    for line in request.decode().split("\r\n")[1:]:
+      if ":" in line:
+        name, value = line.split(":", 1)
+        headers[name.strip().lower()] = value.strip()
+    accept = base64.b64encode(hashlib.sha1((headers["sec-websocket-key"] + WS_GUID).encode()).digest())
+    self.writer.write(
+      b"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+      b"Sec-WebSocket-Accept: " + accept + b"\r\n\r\n"
+    )
+    await self.writer.drain()
+
+  async def read_frame(self):
+    head = await self.reader.readexactly(2)
+    opcode = head[0] & 0x0F
+    length = head[1] & 0x7F
+    if length == 126:
+      (length,) = struct.unpack("!H", await self.reader.readexactly(2))
+    elif length == 127:
+      (length,) = struct.unpack("!Q", await self.reader.readexactly(8))
+    mask = await self.reader.readexactly(4) if head[1] & 0x80 else b"\0\0\0\0"
+    payload = bytearray(await self.reader.readexactly(length))
+    for i in range(length):
+      payload[i] ^= mask[i % 4]
+    return opcode, bytes(payload)
+
+  def send_frame(self, opcode, payload):
+    length = len(payload)
+    if length < 126:
+      header = struct.pack("!BB", 0x80 | opcode, length)
+    elif length < 2 ** 16:
+      header = struct.pack("!BBH", 0x80 | opcode, 126, length)
+    else:
+      header = struct.pack("!BBQ", 0x80 | opcode, 127, length)
+    self.writer.write(header + payload)
+
+  def send_json(self, message):
+    self.send_frame(OP_TEXT, json.dumps(message).encode())
+
+class StubHLWebsocket:
+  """
+  Serves `userFills` subscriptions: a snapshot of the user's known fills on
+  subscribe, then whatever is pushed
+  """
+  def __init__(self, host="127.0.0.1", port=0, snapshot_size=100):
+    self.host = host
+    self.port = port
+    self.snapshot_size = snapshot_size
+    self.fills = {}  # user (lowercased) -> fills, oldest first
+    self.connections = set()
+    self.server = None
+
+  @property
+  def base_url(self):
+    return f"http://{self.host}:{self.port}"
+
+  async def start(self):
+    self.server = await asyncio.start_server(self._serve, self.host, self.port)
+    self.port = self.server.sockets[0].getsockname()[1]
+    return self
+
+  async def stop(self):
+    self.drop_connections()
+    self.server.close()
+    await self.server.wait_closed()
+
+  def drop_connections(self):
+    for connection in list(self.connections):
+      connection.writer.close()
+    self.connections.clear()
+
+  def record(self, user, fills):
+    """
+    Add fills to the user's history without pushing them (e.g. while nobody is connected)
+    """
+    self.fills.setdefault(user.lower(), []).extend(fills)
+
+  async def push(self, user, fills):
+    self.record(user, fills)
+    for connection in list(self.connections):
+      if user.lower() in connection.users:
+        connection.send_json({"channel": "userFills", "data": {"user": user.lower(), "fills": fills}})
+        await connection.writer.drain()
+
+  async def _serve(self, reader, writer):
+    connection = _Connection(reader, writer)
+    try:
+      await connection.handshake()
+      self.connections.add(connection)
+      connection.send_frame(OP_TEXT, b"Websocket connection established.")
+      while True:
+        opcode, payload = await connection.read_frame()
+        if opcode == OP_CLOSE:
+          connection.send_frame(OP_CLOSE, payload[:2])
+          break
+        if opcode == OP_PING:
+          connection.send_frame(OP_PONG, payload)
+        elif opcode == OP_TEXT:
+          self._handle(connection, json.loads(payload))
+        await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError):
+      pass
+    finally:
+      self.connections.discard(connection)
+      writer.close()
+
+  def _handle(self, connection, message):
+    method = message.get("method")
+    if method == "ping":
+      connection.send_json({"channel": "pong"})
+      return
+    subscription = message.get("subscription", {})
+    if subscription.get("type") != "userFills":
+      return
+    user = subscription["user"].lower()
+    connection.send_json({"channel": "subscriptionResponse", "data": message})
+    if method == "subscribe":
+      connection.users.add(user)
+      snapshot = self.fills.get(user, [])[-self.snapshot_size:]
+      connection.send_json({"channel": "userFills", "data": {"isSnapshot": True, "user": user, "fills": snapshot}})
+    elif method == "unsubscribe":
+      connection.users.discard(user)
+
+async def main():
+  parser = argparse.ArgumentParser()
+  parser.add_argument("--host", default="127.0.0.1")
+  parser.add_argument("--port", type=int, default=8765)
+  args = parser.parse_args()
+  stub = await StubHLWebsocket(args.host, args.port).start()
+  print(f"stub websocket listening on {stub.base_url}/ws")
+  await asyncio.Event().wait()
+
+if __name__ == "__main__":
+  asyncio.run(main())
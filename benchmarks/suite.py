@@ -0,0 +1,354 @@
+"""
+Benchmark suite: microbenchmarks for the fill-processing paths (FillEngine,
+FillFrame and the metric helpers) and end-to-end latency/throughput for each endpoint, run against the stub
+/info server, written to a JSON report that later runs can be compared with.
+
+Run from the repo root:
+  python -m benchmarks.suite --out benchmarks/results/baseline.json
+  python -m benchmarks.suite --out after.json --compare benchmarks/results/baseline.json
+
+The API runs as `uvicorn main:app` in a subprocess with its own temporary
+fill store, pointed at the stub with the client-side rate limit lifted, so
+the numbers are this service's own cost plus the configured stub latency.
+`--compare` exits non-zero when anything is slower than the baseline by more
+than `--threshold`.
+"""
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+from datetime import datetime, timezone
+import httpx
+from benchmarks.synthetic import TARGET_BUILDER, load_fixtures, save_fixtures, synthetic_users
+from src.core.models import to_fills
+from src.services import helper_functions as helpers
+from src.services.fill_engine import process_fills
+from src.services.fill_frame import FillFrame, segment_lifecycles, summarize_fills
+
+REPORT_VERSION = 1
+
+# Helper microbenchmarks
+
+def helper_cases(fills):
+  """
+  (name, items processed, callable) for every fill-processing path, on one user's fills
+  """
+  coin = max({f["coin"] for f in fills}, key=lambda c: sum(f["coin"] == c for f in fills))
+  coin_fills = [f for f in fills if f["coin"] == coin]
+  records = to_fills(fills, TARGET_BUILDER)
+  frame = FillFrame.from_fills(records, TARGET_BUILDER)
+  loop = asyncio.new_event_loop()
+
+  def user_metrics():
+    return loop.run_until_complete(helpers.calculate_user_metrics(
+      "0xbench", None, None, None, True, "pnl", None, TARGET_BUILDER, None, raw_fills=fills
+    ))
+
+  def return_pcts():
+    for i in range(len(fills)):
+      helpers.calculate_return_pct(1000.0 + i, 12.5, 5000.0)
+
+  return [
+    ("to_fills", len(fills), lambda: to_fills(fills, TARGET_BUILDER)),
+    ("engine_aggregates", len(fills), lambda: process_fills(records, TARGET_BUILDER)),
+    ("engine_builder_only", len(fills), lambda: process_fills(records, TARGET_BUILDER, builder_only=True)),
+    ("engine_trades", len(fills), lambda: process_fills(records, TARGET_BUILDER, collect_trades=True)),
+    ("engine_coin_positions", len(coin_fills),
+      lambda: process_fills(records, TARGET_BUILDER, True, coin=coin, collect_positions=True)),
+    ("frame_build", len(fills), lambda: FillFrame.from_fills(records, TARGET_BUILDER)),
+    ("frame_lifecycles", len(fills), lambda: segment_lifecycles(frame)),
+    ("frame_builder_only", len(fills), lambda: summarize_fills(records, TARGET_BUILDER, builder_only=True)),
+    ("calculate_return_pct", len(fills), return_pcts),
+    ("calculate_user_metrics", len(fills), user_metrics),
+  ]
+
+def run_helpers(fills, repeat):
+  results = {}
+  for name, items, fn in helper_cases(fills):
+    fn()  # warm up
+    samples = []
+    for _ in range(repeat):
+      start = time.perf_counter()
+      fn()
+      samples.append(time.perf_counter() - start)
+    median = statistics.median(samples)
+    results[name] = {
+      "items": items,
+      "min_ms": min(samples) * 1000,
+      "median_ms": median * 1000,
+      "ns_per_item": median / max(items, 1) * 1e9,
+    }
+    print(f"  {name:<24}{median * 1000:>10.2f} ms{results[name]['ns_per_item']:>10.0f} ns/item")
+  return results
+
+# End-to-end endpoints
+
+def endpoint_scenarios(users, from_ms):
+  """
+  name -> function of a request index returning the path to request
+  """
+  cohort = ",".join(users)
+
+  def per_user(template):
+    return lambda i: template.format(user=users[i % len(users)], from_ms=from_ms)
+
+  return {
+    "trades": per_user("/v1/trades?user={user}"),
+    "trades_ndjson": per_user("/v1/trades?user={user}&format=ndjson"),
+    "pnl": per_user("/v1/pnl?user={user}&fromMs={from_ms}"),
+    "pnl_builder_only": per_user("/v1/pnl?user={user}&fromMs={from_ms}&builderOnly=true"),
+    "positions_history": per_user("/v1/positions/history?user={user}"),
+    "summary": per_user("/v1/summary?user={user}&fromMs={from_ms}"),
+    "leaderboard_pnl": lambda i: f"/v1/leaderboard?users={cohort}&metric=pnl",
+    "leaderboard_return_pct":
+      lambda i: f"/v1/leaderboard?users={cohort}&metric=returnPct&fromMs={from_ms}&maxStartCapital=10000",
+    "leaderboard_top": lambda i: "/v1/leaderboard/top?metric=volume",
+  }
+
+def _percentile(sorted_samples, pct):
+  index = min(len(sorted_samples) - 1, max(0, round(pct / 100 * len(sorted_samples)) - 1))
+  return sorted_samples[index]
+
+def _latency_stats(samples):
+  ordered = sorted(samples)
+  return {
+    "p50_ms": _percentile(ordered, 50) * 1000,
+    "p90_ms": _percentile(ordered, 90) * 1000,
+    "p99_ms": _percentile(ordered, 99) * 1000,
+    "max_ms": ordered[-1] * 1000,
+  }
+
+async def load(client, path_for, requests, concurrency):
+  """
+  `requests` requests over `concurrency` connections; returns latency and throughput stats
+  """
+  latencies = []
+  errors = 0
+  body_bytes = 0
+  next_index = 0
+
+  async def worker():
+    nonlocal errors, body_bytes, next_index
+    while next_index < requests:
+      i = next_index
+      next_index += 1
+      start = time.perf_counter()
+      response = await client.get(path_for(i))
+      latencies.append(time.perf_counter() - start)
+      body_bytes += len(response.content)
+      if response.status_code != 200:
+        errors += 1
+
+  started = time.perf_counter()
+  await asyncio.gather(*(worker() for _ in range(concurrency)))
+  elapsed = time.perf_counter() - started
+  return {
+    "requests": requests,
+    "concurrency": concurrency,
+    "errors": errors,
+    "rps": requests / elapsed,
+    "mean_response_bytes": body_bytes / requests,
+    **_latency_stats(latencies),
+  }
+
+def _stage_totals(metrics_text):
+  # hl_stage_seconds_sum / _count from the /metrics scrape
+  stages = {}
+  for line in metrics_text.splitlines():
+    for suffix, field in (("_sum", "seconds"), ("_count", "count")):
+      prefix = f"hl_stage_seconds{suffix}{{stage=\""
+      if line.startswith(prefix):
+        stage, value = line[len(prefix):].split("\"} ")
+        stages.setdefault(stage, {})[field] = float(value)
+  return stages
+
+async def run_endpoints(base_url, users, from_ms, args):
+  results = {}
+  limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+  async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=300) as client:
+    # First request per user pays for the upstream sync into the empty fill store
+    cold = []
+    for user in users:
+      start = time.perf_counter()
+      response = await client.get(f"/v1/pnl?user={user}")
+      response.raise_for_status()
+      cold.append(time.perf_counter() - start)
+    results["cold_sync"] = {"requests": len(users), **_latency_stats(cold)}
+    print(f"  {'cold_sync':<24}{results['cold_sync']['p50_ms']:>10.1f} ms p50")
+
+    for name, path_for in endpoint_scenarios(users, from_ms).items():
+      await load(client, path_for, max(1, args.requests // 10), args.concurrency)
+      results[name] = await load(client, path_for, args.requests, args.concurrency)
+      stats = results[name]
+      print(
+        f"  {name:<24}{stats['p50_ms']:>10.1f} ms p50{stats['p99_ms']:>10.1f} ms p99"
+        f"{stats['rps']:>10.1f} req/s{' (' + str(stats['errors']) + ' errors)' if stats['errors'] else ''}"
+      )
+
+    stages = _stage_totals((await client.get("/metrics")).text)
+  return results, stages
+
+def _free_port():
+  with socket.socket() as s:
+    s.bind(("127.0.0.1", 0))
+    return s.getsockname()[1]
+
+async def _wait_ready(url, process, timeout=60):
+  deadline = time.monotonic() + timeout
+  async with httpx.AsyncClient() as client:
+    while time.monotonic() < deadline:
+      if process.poll() is not None:
+        raise RuntimeError(f"{process.args} exited with {process.returncode}")
+      try:
+        if (await client.get(url)).status_code < 500:
+          return
+      except httpx.TransportError:
+        pass
+      await asyncio.sleep(0.2)
+  raise RuntimeError(f"{url} not ready after {timeout}s")
+
+async def benchmark_endpoints(dataset, args, workdir):
+  fixtures = os.path.join(workdir, "fixtures")
+  save_fixtures(dataset, fixtures)
+  users = list(dataset)
+  times = sorted(f["time"] for data in dataset.values() for f in data["fills"])
+  from_ms = times[len(times) // 2] if times else 0
+
+  stub_port, api_port = _free_port(), _free_port()
+  stub = subprocess.Popen([
+    sys.executable, "-m", "benchmarks.stub_hl_info", "--port", str(stub_port), "--fixtures", fixtures,
+    "--latency-ms", str(args.latency_ms), "--jitter-ms", str(args.jitter_ms),
+  ])
+  env = {
+    **os.environ,
+    "HL_INFO_URL": f"http://127.0.0.1:{stub_port}/info",
+    "HL_HTTP2": "false",
+    "HL_WEIGHT_PER_MINUTE": str(10 ** 9),
+    "FILL_STORE_PATH": os.path.join(workdir, "fills.sqlite3"),
+    "TARGET_BUILDER": TARGET_BUILDER,
+    "LEADERBOARD_COHORT": ",".join(users),
+    "LIVE_FILLS_USERS": "",
+  }
+  api = subprocess.Popen(
+    [sys.executable, "-m", "uvicorn", "main:app", "--port", str(api_port), "--log-level", "warning"], env=env
+  )
+  try:
+    await _wait_ready(f"http://127.0.0.1:{stub_port}/", stub)
+    await _wait_ready(f"http://127.0.0.1:{api_port}/v1/cache/stats", api)
+    return await run_endpoints(f"http://127.0.0.1:{api_port}", users, from_ms, args)
+  finally:
+    for process in (api, stub):
+      process.terminate()
+      process.wait()
+
+# Report
+
+def _git_commit():
+  try:
+    return subprocess.run(
+      ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+    ).stdout.strip()
+  except (OSError, subprocess.CalledProcessError):
+    return None
+
+# Metric -> True when bigger is better
+COMPARED = {
+  "helpers": {"median_ms": False},
+  "endpoints": {"p50_ms": False, "p99_ms": False, "rps": True},
+}
+
+def compare(report, baseline, threshold):
+  """
+  Print every compared metric against the baseline; returns the regressions
+  """
+  regressions = []
+  print(f"\n{'section':<10}{'name':<26}{'metric':<11}{'baseline':>12}{'current':>12}{'change':>9}")
+  for section, metrics in COMPARED.items():
+    for name, current in report.get(section, {}).items():
+      before = baseline.get(section, {}).get(name)
+      if before is None:
+        continue
+      for metric, higher_is_better in metrics.items():
+        if metric not in current or not before.get(metric):
+          continue
+        change = current[metric] / before[metric] - 1
+        worse = -change if higher_is_better else change
+        flag = " REGRESSION" if worse > threshold else ""
+        if flag:
+          regressions.append((section, name, metric, change))
+        print(
+          f"{section:<10}{name:<26}{metric:<11}{before[metric]:>12.2f}{current[metric]:>12.2f}{change:>+9.1%}{flag}"
+        )
+  return regressions
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+  parser.add_argument("--out", default="benchmarks/results/latest.json")
+  parser.add_argument("--compare", help="baseline report to compare against")
+  parser.add_argument("--threshold", type=float, default=0.15, help="allowed slowdown before flagging (0.15 = 15%%)")
+  parser.add_argument("--fixtures", help="directory of recorded <address>.json histories instead of synthetic users")
+  parser.add_argument("--users", type=int, default=8)
+  parser.add_argument("--fills", type=int, default=20_000, help="fills per synthetic user")
+  parser.add_argument("--coins", type=int, default=8)
+  parser.add_argument("--flip-rate", type=float, default=0.05)
+  parser.add_argument("--builder-share", type=float, default=0.5)
+  parser.add_argument("--seed", type=int, default=7)
+  parser.add_argument("--helper-fills", type=int, default=50_000)
+  parser.add_argument("--helper-repeat", type=int, default=5)
+  parser.add_argument("--requests", type=int, default=200, help="measured requests per endpoint")
+  parser.add_argument("--concurrency", type=int, default=8)
+  parser.add_argument("--latency-ms", type=float, default=20.0, help="stub /info latency")
+  parser.add_argument("--jitter-ms", type=float, default=10.0)
+  parser.add_argument("--skip-helpers", action="store_true")
+  parser.add_argument("--skip-endpoints", action="store_true")
+  args = parser.parse_args()
+
+  fill_options = {"coins": args.coins, "flip_rate": args.flip_rate, "builder_share": args.builder_share}
+  report = {
+    "version": REPORT_VERSION,
+    "meta": {
+      "createdAt": datetime.now(timezone.utc).isoformat(),
+      "commit": _git_commit(),
+      "python": platform.python_version(),
+      "platform": platform.platform(),
+      "cpus": os.cpu_count(),
+      "args": vars(args),
+    },
+  }
+
+  if not args.skip_helpers:
+    print(f"helpers ({args.helper_fills} fills)")
+    fills = synthetic_users(1, args.helper_fills, seed=args.seed, **fill_options).popitem()[1]["fills"]
+    report["helpers"] = run_helpers(fills, args.helper_repeat)
+
+  if not args.skip_endpoints:
+    if args.fixtures:
+      dataset = load_fixtures(args.fixtures)
+    else:
+      dataset = synthetic_users(args.users, args.fills, seed=args.seed, **fill_options)
+    print(f"endpoints ({len(dataset)} users, stub latency {args.latency_ms} ms)")
+    with tempfile.TemporaryDirectory() as workdir:
+      report["endpoints"], report["stages"] = asyncio.run(benchmark_endpoints(dataset, args, workdir))
+
+  os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+  with open(args.out, "w", encoding="utf-8") as f:
+    json.dump(report, f, indent=2)
+  print(f"report written to {args.out}")
+
+  if args.compare:
+    with open(args.compare, encoding="utf-8") as f:
+      baseline = json.load(f)
+    regressions = compare(report, baseline, args.threshold)
+    if regressions:
+      print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%}")
+      sys.exit(1)
+
+if __name__ == "__main__":
+  main()
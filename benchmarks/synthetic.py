@@ -0,0 +1,183 @@
+"""
+Deterministic synthetic Hyperliquid histories for benchmarks: fills shaped
+like `userFills` responses (position lifecycles with partial closes and
+flips, builder-fee mix) plus matching ledger updates and account values.
+
+Datasets are {user: {"fills": [...], "ledger": [...], "accountValue": "..."}}
+and can be written to / read from a fixtures directory, one JSON file per
+user. A plain list of fills (what helpful_but_probs_will_delete/extraction.py
+saves) is also accepted as a fixture.
+"""
+import os
+import json
+import random
+
+TARGET_BUILDER = "0x0000000000000000000000000000000000000b1d"
+OTHER_BUILDER = "0x0000000000000000000000000000000000000b2e"
+START_MS = 1_700_000_000_000
+
+def synthetic_fills(
+  n,
+  coins=8,
+  flip_rate=0.05,
+  close_rate=0.1,
+  builder_share=0.5,
+  stray_rate=0.05,
+  seed=7,
+  start_ms=START_MS,
+  target_builder=TARGET_BUILDER,
+):
+  """
+  `n` fills, oldest first, across `coins` coins.
+
+  flip_rate / close_rate: chance a fill reverses / flattens the open position
+  builder_share: chance a new lifecycle is traded through `target_builder`
+  stray_rate: chance a single fill inside a builder lifecycle goes through
+    another route instead, tainting that lifecycle
+  """
+  rnd = random.Random(seed)
+  names = [f"COIN{i}" for i in range(coins)]
+  positions = dict.fromkeys(names, 0.0)
+  entry_px = dict.fromkeys(names, 0.0)
+  marks = {coin: rnd.uniform(1, 50000) for coin in names}
+  via_builder = {coin: rnd.random() < builder_share for coin in names}
+  fills = []
+  t = start_ms
+  for i in range(n):
+    coin = rnd.choice(names)
+    position = positions[coin]
+    marks[coin] *= 1 + rnd.gauss(0, 0.002)
+    px = marks[coin]
+
+    roll = rnd.random()
+    if position and roll < flip_rate:
+      sz = abs(position) + round(rnd.uniform(0.01, 5), 4)
+      side = "A" if position > 0 else "B"
+    elif position and roll < flip_rate + close_rate:
+      sz = abs(position)
+      side = "A" if position > 0 else "B"
+    else:
+      sz = round(rnd.uniform(0.01, 5), 4)
+      side = rnd.choice("AB")
+    signed = sz if side == "B" else -sz
+    end = round(position + signed, 8)
+
+    # Realized PnL on the part of the fill that reduces the position
+    closed = min(sz, abs(position)) if position and (position > 0) != (signed > 0) else 0.0
+    closed_pnl = closed * (px - entry_px[coin]) * (1 if position > 0 else -1)
+    if end == 0:
+      entry_px[coin] = 0.0
+    elif not position or (position > 0) != (end > 0):
+      entry_px[coin] = px
+    elif abs(end) > abs(position):
+      entry_px[coin] = (entry_px[coin] * abs(position) + px * sz) / abs(end)
+
+    if not position:
+      via_builder[coin] = rnd.random() < builder_share
+    builder = via_builder[coin] and rnd.random() >= stray_rate
+
+    t += rnd.randint(0, 2000)
+    fee = px * sz * 0.00035
+    fill = {
+      "coin": coin, "px": f"{px:.6g}", "sz": f"{sz:.4f}", "side": side, "time": t,
+      "startPosition": f"{position:.8g}", "dir": _direction(position, end),
+      "closedPnl": f"{closed_pnl:.6f}", "hash": f"0x{rnd.getrandbits(256):064x}", "oid": 10_000_000 + i,
+      "crossed": rnd.random() < 0.7, "fee": f"{fee:.6f}", "tid": 1_000_000_000 + i, "feeToken": "USDC",
+    }
+    if builder:
+      fill["builder"] = target_builder
+      fill["builderFee"] = f"{fee * 0.1:.6f}"
+    elif via_builder[coin] and rnd.random() < 0.5:
+      fill["builder"] = OTHER_BUILDER
+      fill["builderFee"] = f"{fee * 0.1:.6f}"
+    positions[coin] = end
+    fills.append(fill)
+  return fills
+
+def _direction(start, end):
+  if start == 0:
+    return "Open Long" if end > 0 else "Open Short"
+  if (start > 0) != (end > 0) and end != 0:
+    return "Long > Short" if start > 0 else "Short > Long"
+  if abs(end) > abs(start):
+    return "Open Long" if start > 0 else "Open Short"
+  return "Close Long" if start > 0 else "Close Short"
+
+def synthetic_ledger(user, fills, deposits=4, seed=7):
+  """
+  Deposits spread over the fills' time range (the first before any fill),
+  plus one withdrawal, as userNonFundingLedgerUpdates entries
+  """
+  rnd = random.Random(seed)
+  first = fills[0]["time"] if fills else START_MS
+  last = fills[-1]["time"] if fills else START_MS
+  times = sorted([first - 60_000] + [rnd.randint(first, last) for _ in range(deposits - 1)])
+  updates = [
+    {"time": ts, "hash": f"0x{rnd.getrandbits(256):064x}",
+     "delta": {"type": "deposit", "usdc": f"{rnd.uniform(1_000, 50_000):.2f}"}}
+    for ts in times
+  ]
+  updates.append({
+    "time": rnd.randint(first, last), "hash": f"0x{rnd.getrandbits(256):064x}",
+    "delta": {"type": "withdraw", "usdc": f"{rnd.uniform(100, 1_000):.2f}", "nonce": 0, "fee": "1.0"},
+  })
+  updates.sort(key=lambda u: u["time"])
+  return updates
+
+def synthetic_funding(fills, every_ms=8 * 3_600_000, seed=7):
+  """
+  A funding payment on the first fill's coin every `every_ms` over the
+  fills' time range, as userFunding entries
+  """
+  if not fills:
+    return []
+  rnd = random.Random(seed)
+  coin = fills[0]["coin"]
+  return [
+    {"time": ts, "hash": "0x" + "0" * 64,
+     "delta": {"type": "funding", "coin": coin, "usdc": f"{rnd.uniform(-5, 5):.6f}", "szi": "1.0",
+               "fundingRate": f"{rnd.uniform(-1e-4, 1e-4):.8f}"}}
+    for ts in range(fills[0]["time"] - fills[0]["time"] % every_ms + every_ms, fills[-1]["time"] + 1, every_ms)
+  ]
+
+def synthetic_users(users, fills_per_user, seed=7, **fill_options):
+  """
+  A dataset of `users` addresses with `fills_per_user` fills each
+  """
+  dataset = {}
+  for i in range(users):
+    user = f"0x{0xbe9c << 144 | i:040x}"
+    fills = synthetic_fills(fills_per_user, seed=seed + i, **fill_options)
+    ledger = synthetic_ledger(user, fills, seed=seed + i)
+    funding = synthetic_funding(fills, seed=seed + i)
+    net = sum(float(u["delta"]["usdc"]) * (1 if u["delta"]["type"] == "deposit" else -1) for u in ledger)
+    net += sum(float(u["delta"]["usdc"]) for u in funding)
+    net += sum(float(f["closedPnl"]) - float(f["fee"]) for f in fills)
+    dataset[user] = {"fills": fills, "ledger": ledger, "funding": funding, "accountValue": f"{max(net, 0.0):.2f}"}
+  return dataset
+
+def save_fixtures(dataset, directory):
+  os.makedirs(directory, exist_ok=True)
+  for user, data in dataset.items():
+    with open(os.path.join(directory, f"{user}.json"), "w", encoding="utf-8") as f:
+      json.dump(data, f)
+
+def load_fixtures(directory):
+  """
+  Read every `<address>.json` (or `trades_<address>.json`) in `directory`
+  """
+  dataset = {}
+  for name in sorted(os.listdir(directory)):
+    if not name.endswith(".json"):
+      continue
+    user = name[:-len(".json")].removeprefix("trades_")
+    with open(os.path.join(directory, name), encoding="utf-8") as f:
+      data = json.load(f)
+    if isinstance(data, list):
+      data = {"fills": data}
+    data["fills"] = sorted(data.get("fills", []), key=lambda f: (f["time"], f.get("tid", 0)))
+    data.setdefault("ledger", [])
+    data.setdefault("funding", [])
+    data.setdefault("accountValue", "0.0")
+    dataset[user.lower()] = data
+  return dataset
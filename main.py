@@ -1,16 +1,88 @@
+import os
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from src.api.leaderboard import router as leaderboard_router
 from src.api.trades import router as trades_router
 from src.api.pnl import router as pnl_rounter
 from src.api.positions_history import router as positions_router
+from src.api.summary import router as summary_router
+from src.api.monitoring import TimingMiddleware, router as monitoring_router
+from src.api.responses import TimedORJSONResponse
+from src.infrastructure.public_hl_datasource import PublicHLDataSource, create_http_client
+from src.infrastructure.fill_store import SQLiteFillStore, StoredFillDataSource
+from src.infrastructure.fill_archive import FillArchive
+from src.infrastructure.cached_datasource import CachedDataSource
+from src.infrastructure.rate_limiter import TokenBucketRateLimiter
+from src.services.compute_pool import compute_pool
+from src.services.fill_buckets import BucketAggregator
+from src.services.fill_segments import SegmentCache
+from src.services.leaderboard_engine import LeaderboardEngine
+from src.services.live_fills import LiveFillIngestor
 
-app = FastAPI(title="Hyperliquid Trading Challenge API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+  # One pooled client for the whole process, shared by every request
+  async with create_http_client() as client:
+    # Fills are served from the local store, which only pulls new ones upstream
+    store = SQLiteFillStore()
+    # Every upstream call draws from the same weight budget
+    app.state.rate_limiter = TokenBucketRateLimiter()
+    upstream = PublicHLDataSource(client=client, rate_limiter=app.state.rate_limiter)
+    # Columnar copies of the stored fills, memory-mapped and shared by every worker process
+    segments = SegmentCache() if os.getenv("FILL_SEGMENTS", "true").lower() != "false" else None
+    # Users archived by backfill.py are loaded from FILL_ARCHIVE_DIR instead of re-downloaded
+    archive_dir = os.getenv("FILL_ARCHIVE_DIR")
+    archive = FillArchive(archive_dir, os.getenv("FILL_ARCHIVE_FORMAT", "parquet")) if archive_dir else None
+    # Hourly/daily sums let PnL and leaderboard windows skip most of the fills
+    stored = StoredFillDataSource(
+      upstream, store, BucketAggregator(store, os.getenv("TARGET_BUILDER")), segments, archive
+    )
+    # Short-lived responses are cached and identical concurrent requests coalesced; with
+    # segments, fill lists aren't copied into every worker's cache
+    app.state.cache = CachedDataSource(stored, cache_fills=segments is None)
+    app.state.datasource = app.state.cache
+
+    # Precomputed leaderboard, seeded from LEADERBOARD_COHORT and refreshed in the background
+    engine = LeaderboardEngine(app.state.datasource, os.getenv("TARGET_BUILDER"))
+    engine.add_users(u.strip() for u in os.getenv("LEADERBOARD_COHORT", "").split(",") if u.strip())
+    app.state.leaderboard_engine = engine
+    refresher = asyncio.create_task(engine.run())
+
+    # Worker processes for large fill sets
+    compute_pool.start()
+
+    # Stream fills for LIVE_FILLS_USERS into the store as they happen
+    live_users = [u.strip() for u in os.getenv("LIVE_FILLS_USERS", "").split(",") if u.strip()]
+    app.state.live_fills = None
+    if live_users:
+      app.state.live_fills = LiveFillIngestor(stored, engine=engine)
+      app.state.live_fills.track(live_users)
+      await app.state.live_fills.start()
+
+    yield
+
+    if app.state.live_fills is not None:
+      await app.state.live_fills.stop()
+    refresher.cancel()
+    compute_pool.shutdown()
+    store.close()
+
+app = FastAPI(
+  title="Hyperliquid Trading Challenge API",
+  lifespan=lifespan,
+  default_response_class=TimedORJSONResponse,
+)
+
+app.add_middleware(TimingMiddleware)
 
 app.include_router(leaderboard_router)
 app.include_router(trades_router)
 app.include_router(pnl_rounter)
 app.include_router(positions_router)
+app.include_router(summary_router)
+app.include_router(monitoring_router)
 
 if __name__ == "__main__":
   import uvicorn
-  uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+  uvicorn.run(app, host="0.0.0.0", port=8000)
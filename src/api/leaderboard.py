@@ -1,21 +1,28 @@
 import os
-from fastapi import APIRouter, Depends, HTTPException
-from typing import Optional, Literal
+import asyncio
+import logging
+from contextlib import aclosing
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from src.api.responses import TimedORJSONResponse
+from typing import List, Optional, Literal
+from pydantic import BaseModel
 from dotenv import load_dotenv
-from src.infrastructure.public_hl_datasource import PublicHLDataSource
 from src.core.base import BaseDataSource
-from src.services.helper_functions import (
-  calculate_user_metrics
-)
+from src.services.helper_functions import calculate_user_metrics
 
 load_dotenv()
 TARGET_BUILDER = os.getenv("TARGET_BUILDER")
+# Max users fetched/computed at once, and default time budget for the whole board
+LEADERBOARD_CONCURRENCY = int(os.getenv("LEADERBOARD_CONCURRENCY", 16))
+LEADERBOARD_DEADLINE_MS = int(os.getenv("LEADERBOARD_DEADLINE_MS", 10000))
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 # Dependency provider
-def get_datasource() -> BaseDataSource:
-  return PublicHLDataSource()
+def get_datasource(request: Request) -> BaseDataSource:
+  return request.app.state.datasource
 
 @router.get("/v1/leaderboard")
 async def get_leaderboard(
@@ -26,6 +33,7 @@ async def get_leaderboard(
   metric: Literal["volume", "pnl", "returnPct"] = "pnl",
   builderOnly: bool = False,
   maxStartCapital: Optional[float] = None,
+  deadlineMs: Optional[int] = None,
   ds: BaseDataSource = Depends(get_datasource)
 ):
   # Validate metric
@@ -48,31 +56,176 @@ async def get_leaderboard(
   if not user_addresses:
     raise HTTPException(status_code=400, detail="No valid user addresses provided")
   
-  # Calculate metrics for each user
-  leaderboard_data = []
-  
-  for user_address in user_addresses:
-    user_metrics = calculate_user_metrics(
-      user_address,
-      coin,
-      fromMs,
-      toMs,
-      builderOnly,
-      metric,
-      maxStartCapital,
-      TARGET_BUILDER,
-      ds
+  # De-duplicate while keeping the caller's order
+  user_addresses = list(dict.fromkeys(user_addresses))
+
+  # returnPct over a window needs every user's start equity, fetched as one batch
+  # while the fills are being fetched
+  equities = None
+  if metric == "returnPct" and fromMs:
+    equities = asyncio.create_task(ds.get_equity_at_timestamps(user_addresses, fromMs))
+
+  rows = {}
+  failed_users = set()
+
+  async def add_row(user_address, raw_fills=None, report=None):
+    try:
+      equity_at_start = None
+      if equities is not None:
+        # A failed equity lookup raises KeyError, so the user is reported as failed
+        equity_at_start = (await asyncio.shield(equities))[user_address]
+      row = await calculate_user_metrics(
+        user_address,
+        coin,
+        fromMs,
+        toMs,
+        builderOnly,
+        metric,
+        maxStartCapital,
+        TARGET_BUILDER,
+        ds,
+        raw_fills,
+        report,
+        equity_at_start
+      )
+    except Exception as e:
+      # One bad address should not fail the whole board
+      logger.warning("leaderboard metrics failed for %s: %r", user_address, e)
+      failed_users.add(user_address)
+      return
+    rows[user_address] = row
+
+  async def collect():
+    # Step 1: window totals from the pre-aggregated buckets, when the datasource keeps them
+    semaphore = asyncio.Semaphore(LEADERBOARD_CONCURRENCY)
+
+    async def summarize(user_address):
+      async with semaphore:
+        try:
+          return user_address, await ds.get_fill_summary(
+            user_address, from_ms=fromMs, to_ms=toMs, coin=coin, builder_only=builderOnly
+          )
+        except Exception as e:
+          return user_address, e
+
+    unsummarized = []
+    summaries = [asyncio.create_task(summarize(u)) for u in user_addresses]
+    try:
+      for summary in asyncio.as_completed(summaries):
+        user_address, report = await summary
+        if report is None:
+          unsummarized.append(user_address)
+        elif isinstance(report, Exception):
+          logger.warning("leaderboard metrics failed for %s: %r", user_address, report)
+          failed_users.add(user_address)
+        else:
+          await add_row(user_address, report=report)
+    finally:
+      # Past the deadline, stop the lookups still running
+      for task in summaries:
+        task.cancel()
+
+    # Step 2: fetch everyone else's fills in one call, computing each user's metrics as they arrive
+    if not unsummarized:
+      return
+    fills_many = ds.get_user_fills_many(
+      unsummarized, from_ms=fromMs, to_ms=toMs, coin=coin, concurrency=LEADERBOARD_CONCURRENCY
     )
-    
-    if user_metrics:  # Only include if user has trades
-      leaderboard_data.append(user_metrics)
+    async with aclosing(fills_many):
+      async for user_address, raw_fills in fills_many:
+        if isinstance(raw_fills, Exception):
+          logger.warning("leaderboard metrics failed for %s: %r", user_address, raw_fills)
+          failed_users.add(user_address)
+          continue
+        await add_row(user_address, raw_fills=raw_fills)
+
+  # Anything still running at the deadline is dropped and reported back
+  deadline_s = (deadlineMs or LEADERBOARD_DEADLINE_MS) / 1000
+  try:
+    await asyncio.wait_for(collect(), timeout=deadline_s)
+  except asyncio.TimeoutError:
+    pass
+  if equities is not None and not equities.done():
+    equities.cancel()
+
+  leaderboard_data = [row for row in rows.values() if row]  # Only include users with trades
+  failed = [u for u in user_addresses if u in failed_users]
+  timed_out = [u for u in user_addresses if u not in rows and u not in failed_users]
   
   # Sort by metric value (descending - higher is better)
-  leaderboard_data.sort(key=lambda x: float(x["metricValue"]), reverse=True)
+  leaderboard_data.sort(key=lambda x: float(x.metricValue), reverse=True)
   
   # Add ranks
   for rank, entry in enumerate(leaderboard_data, start=1):
-    entry["rank"] = rank
+    entry.rank = rank
   
-  return leaderboard_data
+  return TimedORJSONResponse({
+    "leaderboard": leaderboard_data,
+    "timedOut": timed_out,
+    "failed": failed,
+  })
+
+# Precomputed leaderboard for a registered cohort (see LeaderboardEngine)
+
+class CohortUpdate(BaseModel):
+  users: List[str]
+
+def get_leaderboard_engine(request: Request):
+  return request.app.state.leaderboard_engine
 
+def validate_precomputed_metric(metric, maxStartCapital):
+  if metric == "returnPct" and not maxStartCapital:
+    raise HTTPException(
+      status_code=400,
+      detail="maxStartCapital is required when metric is returnPct"
+    )
+
+@router.get("/v1/leaderboard/cohort")
+async def get_cohort(engine = Depends(get_leaderboard_engine)):
+  return {"users": list(engine.cohort), "updatedAtMs": engine.updated_at_ms}
+
+@router.post("/v1/leaderboard/cohort")
+async def add_to_cohort(update: CohortUpdate, engine = Depends(get_leaderboard_engine)):
+  users = [u.strip() for u in update.users if u.strip()]
+  if not users:
+    raise HTTPException(status_code=400, detail="No valid user addresses provided")
+  return {"added": engine.add_users(users)}
+
+@router.delete("/v1/leaderboard/cohort/{user}")
+async def remove_from_cohort(user: str, engine = Depends(get_leaderboard_engine)):
+  if not engine.remove_user(user):
+    raise HTTPException(status_code=404, detail="User is not in the cohort")
+  return {"removed": user}
+
+@router.get("/v1/leaderboard/top")
+async def get_top(
+  coin: Optional[str] = None,
+  metric: Literal["volume", "pnl", "returnPct"] = "pnl",
+  builderOnly: bool = False,
+  maxStartCapital: Optional[float] = None,
+  limit: int = Query(100, ge=1, le=1000),
+  offset: int = Query(0, ge=0),
+  engine = Depends(get_leaderboard_engine)
+):
+  validate_precomputed_metric(metric, maxStartCapital)
+  rows, total = engine.top(metric, coin, builderOnly, maxStartCapital, limit, offset)
+  return TimedORJSONResponse({
+    "leaderboard": rows,
+    "total": total,
+    "updatedAtMs": engine.updated_at_ms,
+  })
+
+@router.get("/v1/leaderboard/rank/{user}")
+async def get_rank(
+  user: str,
+  coin: Optional[str] = None,
+  metric: Literal["volume", "pnl", "returnPct"] = "pnl",
+  builderOnly: bool = False,
+  maxStartCapital: Optional[float] = None,
+  engine = Depends(get_leaderboard_engine)
+):
+  validate_precomputed_metric(metric, maxStartCapital)
+  row = engine.rank_of(user, metric, coin, builderOnly, maxStartCapital)
+  if row is None:
+    raise HTTPException(status_code=404, detail="User is not ranked on this leaderboard")
+  return TimedORJSONResponse(row)
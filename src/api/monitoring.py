@@ -0,0 +1,93 @@
+import time
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import PlainTextResponse
+from src.infrastructure.metrics import (
+  HTTP_BYTES, HTTP_SECONDS, REGISTRY, SERVER_TIMING, begin_request_timing, sample_lines, server_timing_header
+)
+
+router = APIRouter()
+
+class TimingMiddleware:
+  """
+  Records latency and response size per route and, with SERVER_TIMING=true,
+  adds a Server-Timing header with the request's per-stage breakdown
+  """
+  def __init__(self, app, server_timing=SERVER_TIMING):
+    self.app = app
+    self.server_timing = server_timing
+
+  async def __call__(self, scope, receive, send):
+    if scope["type"] != "http":
+      return await self.app(scope, receive, send)
+
+    started = time.perf_counter()
+    stages = begin_request_timing()
+    status = 500
+    body_bytes = 0
+
+    async def send_timed(message):
+      nonlocal status, body_bytes
+      if message["type"] == "http.response.start":
+        status = message["status"]
+        if self.server_timing and stages:
+          # Streamed bodies are still being produced, so this covers what ran before the first byte
+          headers = list(message.get("headers", []))
+          headers.append((b"server-timing", server_timing_header(stages).encode()))
+          message = {**message, "headers": headers}
+      elif message["type"] == "http.response.body":
+        body_bytes += len(message.get("body", b""))
+      await send(message)
+
+    try:
+      await self.app(scope, receive, send_timed)
+    finally:
+      # Label by route template so per-address paths don't explode the series count
+      route = scope.get("route")
+      label = route.path if route is not None else "unmatched"
+      HTTP_SECONDS.observe(time.perf_counter() - started, label, str(status))
+      HTTP_BYTES.observe(body_bytes, label)
+
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics(request: Request):
+  # Prometheus scrape: hot-path histograms plus point-in-time cache and limiter state
+  lines = REGISTRY.render()
+
+  cache_stats = request.app.state.cache.stats()
+  kinds = [kind for kind in cache_stats if kind != "entries"]
+  for field in ("hits", "misses", "coalesced"):
+    samples = [((kind,), cache_stats[kind][field]) for kind in kinds]
+    lines += sample_lines(f"hl_cache_{field}_total", f"Response cache {field} by kind", samples, ("kind",), "counter")
+  ratios = []
+  for kind in kinds:
+    lookups = cache_stats[kind]["hits"] + cache_stats[kind]["misses"]
+    ratios.append(((kind,), cache_stats[kind]["hits"] / lookups if lookups else 0.0))
+  lines += sample_lines("hl_cache_hit_ratio", "Response cache hit ratio by kind", ratios, ("kind",))
+  lines += sample_lines("hl_cache_entries", "Response cache entries", [((), cache_stats["entries"])])
+
+  limiter_stats = request.app.state.rate_limiter.stats()
+  lines += sample_lines("hl_rate_limiter_tokens", "Upstream weight currently available", [((), limiter_stats["tokens"])])
+  lines += sample_lines("hl_rate_limiter_queue_depth", "Upstream calls waiting for weight", [((), limiter_stats["queueDepth"])])
+  lines += sample_lines(
+    "hl_rate_limiter_retries_total", "Upstream retries after 429/5xx/transport errors",
+    [((), limiter_stats["retries"])], metric_type="counter"
+  )
+
+  return PlainTextResponse("\n".join(lines) + "\n", media_type="text/plain; version=0.0.4")
+
+@router.get("/v1/cache/stats")
+async def get_cache_stats(request: Request):
+  # Hit/miss/coalesced counts per response kind
+  return request.app.state.cache.stats()
+
+@router.get("/v1/rate-limit/stats")
+async def get_rate_limit_stats(request: Request):
+  # Queue depth and wait times for the shared upstream rate limiter
+  return request.app.state.rate_limiter.stats()
+
+@router.get("/v1/live-fills/stats")
+async def get_live_fills_stats(request: Request):
+  # Websocket connection state and ingest counters, when live ingestion is on
+  ingestor = request.app.state.live_fills
+  if ingestor is None:
+    raise HTTPException(status_code=404, detail="Live fill ingestion is disabled (set LIVE_FILLS_USERS)")
+  return ingestor.stats()
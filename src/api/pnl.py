@@ -1,15 +1,12 @@
 import os
 from dotenv import load_dotenv
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
+from src.api.responses import TimedORJSONResponse
 from typing import Optional
-from src.infrastructure.public_hl_datasource import PublicHLDataSource
 from src.core.base import BaseDataSource
-from src.services.helper_functions import (
-  determine_taint,
-  filter_by_coin,
-  aggregate_trades,
-  calculate_return_pct,
-)
+from src.infrastructure.metrics import timed
+from src.services.compute_pool import compute_pool
+from src.services.summary import pnl_summary
 
 load_dotenv()
 TARGET_BUILDER = os.getenv("TARGET_BUILDER")
@@ -17,8 +14,8 @@ TARGET_BUILDER = os.getenv("TARGET_BUILDER")
 router = APIRouter()
 
 # Dependency provider
-def get_datasource() -> BaseDataSource:
-  return PublicHLDataSource()
+def get_datasource(request: Request) -> BaseDataSource:
+  return request.app.state.datasource
 
 @router.get("/v1/pnl")
 async def get_pnl(
@@ -30,30 +27,26 @@ async def get_pnl(
   maxStartCapital: Optional[float] = None,
   ds: BaseDataSource = Depends(get_datasource)
 ):
-  # Step 1: Get base data from datasource
-  raw_fills = ds.get_user_fills(user, from_ms=fromMs, to_ms=toMs)
-
-  # filter by coin
-  if coin:
-    raw_fills = filter_by_coin(coin, raw_fills)
-
-  # Step 2: Taint for builder-only
-  processed_trades = determine_taint(raw_fills, TARGET_BUILDER)
-  is_tainted = any(pt.get('tainted', False) for pt in processed_trades)
-
-  # Step 3: Aggregate Data
-  aggregates = aggregate_trades(processed_trades, builderOnly)
-  realized_pnl, fees_paid, trade_count = aggregates.get("realized_pnl"), aggregates.get("fees_paid"), aggregates.get("trade_count")
+  # Step 1: Window totals from the pre-aggregated buckets, if the datasource keeps them
+  with timed("fetch"):
+    report = await ds.get_fill_summary(user, from_ms=fromMs, to_ms=toMs, coin=coin, builder_only=builderOnly)
+  if report is None:
+    # Step 2: Get base data from datasource (already filtered by coin)
+    with timed("fetch"):
+      raw_fills = await ds.get_user_fill_frame(user, from_ms=fromMs, to_ms=toMs, coin=coin)
+      if raw_fills is None:
+        raw_fills = await ds.get_user_fills(user, from_ms=fromMs, to_ms=toMs, coin=coin)
+      # Taint of lifecycles opened before fromMs, as the buckets count it
+      engine_state = await ds.get_position_state(user, fromMs, coin=coin) if fromMs else None
+
+    # Step 3: Taint for builder-only and aggregate together
+    report = await compute_pool.summarize_fills(
+      raw_fills, TARGET_BUILDER, builder_only=builderOnly, initial_state=engine_state
+    )
 
   # Step 4: Relative PnL
-  equity_at_start = await ds.get_equity_at_timestamp(user, fromMs) if fromMs else 1.0
-  relative_pnl = calculate_return_pct(equity_at_start, realized_pnl, maxStartCapital) 
+  with timed("fetch"):
+    equity_at_start = await ds.get_equity_at_timestamp(user, fromMs) if fromMs else 1.0
 
   # Step 5: shape the data to return
-  return {
-    "realizedPnl": realized_pnl,
-    "returnPct": relative_pnl,
-    "feesPaid": fees_paid,
-    "tradeCount": trade_count,
-    "tainted": is_tainted if builderOnly else None,
-  }
\ No newline at end of file
+  return TimedORJSONResponse(pnl_summary(report, equity_at_start, builderOnly, maxStartCapital))
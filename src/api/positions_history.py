@@ -1,60 +1,98 @@
 import os
-from fastapi import APIRouter, Depends
-from typing import Optional
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Request
+from src.api.responses import TimedORJSONResponse
+from typing import Literal, Optional
 from dotenv import load_dotenv
-from src.infrastructure.public_hl_datasource import PublicHLDataSource
 from src.core.base import BaseDataSource
-from src.services.helper_functions import (
-  process_coin_positions,
-  filter_by_coin,
-)
+from src.infrastructure.metrics import timed
+from src.services.fill_engine import process_fills, stream_processed_fills
+from src.services.compute_pool import compute_pool
+from src.api.streaming import ndjson_response, peek_pages, wants_ndjson
 
 load_dotenv()
 TARGET_BUILDER = os.getenv("TARGET_BUILDER")
 
 router = APIRouter()
 
-def get_datasource() -> BaseDataSource:
-  return PublicHLDataSource()
+def get_datasource(request: Request) -> BaseDataSource:
+  return request.app.state.datasource
+
+def parse_cursor(cursor):
+  # "<timeMs>:<tid>" of the last fill a previous response covered
+  try:
+    time_ms, tid = cursor.split(":")
+    return int(time_ms), int(tid)
+  except ValueError:
+    raise HTTPException(status_code=400, detail="Invalid cursor")
 
 @router.get("/v1/positions/history")
 async def get_positions(
+  request: Request,
   user: str,
   coin: Optional[str] = None,
   fromMs: Optional[int] = None,
   toMs: Optional[int] = None,
   builderOnly: bool = False,
+  sinceMs: Optional[int] = None,
+  cursor: Optional[str] = None,
+  format: Optional[Literal["json", "ndjson"]] = None,
   ds: BaseDataSource = Depends(get_datasource)
 ):
-  # Step 1: Get all trades
-  raw_fills = ds.get_user_fills(user, from_ms=fromMs, to_ms=toMs)
-  
-  if not raw_fills:
-    return []
-  
-  # Step 2: Filter by coin if specified
-  if coin:
-    raw_fills = filter_by_coin(coin, raw_fills)
-  
-  # Step 3: Sort by time, then by trade ID for consistency
-  raw_fills = sorted(raw_fills, key=lambda x: (x.get("time", 0), x.get("tid", 0)))
-  
-  # Step 4: Group trades by coin
-  trades_by_coin = {}
-  for fill in raw_fills:
-    coin_name = fill.get("coin")
-    if coin_name not in trades_by_coin:
-      trades_by_coin[coin_name] = []
-    trades_by_coin[coin_name].append(fill)
-  
-  # Step 5: Build position history
-  position_history = []
+  if sinceMs is not None or cursor:
+    if fromMs is not None:
+      raise HTTPException(status_code=400, detail="Use either fromMs or sinceMs/cursor")
+    # Snapshots for fills after the cursor (or from sinceMs), with positions resumed
+    # from the nearest checkpoints instead of guessed at the first fill in the window
+    after = parse_cursor(cursor) if cursor else (sinceMs, -1)
+    with timed("fetch"):
+      resume = await ds.get_position_resume(user, after, coin=coin, to_ms=toMs)
+      if resume is None:
+        resume = {}, await ds.get_user_fills(user, to_ms=toMs, coin=coin)
+    engine_state, fills = resume
+    with timed("aggregate"):
+      report = await asyncio.to_thread(
+        process_fills, fills, TARGET_BUILDER, builderOnly, coin,
+        collect_positions=True, engine_state=engine_state, after=after,
+      )
+    last = max(after, (fills[-1].time, fills[-1].tid)) if fills else after
+    return TimedORJSONResponse({"positions": report.positions, "cursor": f"{last[0]}:{last[1]}"})
+
+  if wants_ndjson(request, format):
+    # Stream snapshots page by page; builder-only history shows just the builder's fills
+    pages = ds.iter_user_fill_pages(user, from_ms=fromMs, to_ms=toMs, coin=coin)
+
+    async def rows():
+      # Positions (and taint) open at fromMs continue from the fills before it
+      first, synced_pages = await peek_pages(pages)
+      engine_state = await ds.get_position_state(user, fromMs, coin=coin) if fromMs and first else None
+      async for processed in stream_processed_fills(
+        synced_pages, TARGET_BUILDER, builder_only=builderOnly, engine_state=engine_state
+      ):
+        yield [
+          p.position_snapshot(builderOnly)
+          for p in processed
+          if not builderOnly or p.record.is_target_builder
+        ]
+
+    return ndjson_response(rows())
+
+  # Step 1: Get all trades, filtered by coin if specified (shared columns if the datasource has them)
+  with timed("fetch"):
+    raw_fills = await ds.get_user_fill_frame(user, from_ms=fromMs, to_ms=toMs, coin=coin)
+    if raw_fills is None:
+      raw_fills = await ds.get_user_fills(user, from_ms=fromMs, to_ms=toMs, coin=coin)
   
-  for coin_name, coin_trades in trades_by_coin.items():
-    position_states = process_coin_positions(coin_trades, builderOnly, TARGET_BUILDER)
-    position_history.extend(position_states)
+  if not len(raw_fills):
+    return TimedORJSONResponse([])
+
+  # Lifecycles open at fromMs continue from the fills before it, like the sinceMs path
+  with timed("fetch"):
+    engine_state = await ds.get_position_state(user, fromMs, coin=coin) if fromMs else None
   
-  # Step 6: Sort all positions by time
-  position_history = sorted(position_history, key=lambda x: x.get("timeMs", 0))
+  # Step 2: Build position history for every coin in bulk, already in time order
+  report = await compute_pool.summarize_fills(
+    raw_fills, TARGET_BUILDER, builder_only=builderOnly, collect_positions=True, initial_state=engine_state
+  )
   
-  return position_history
+  return TimedORJSONResponse(report.positions)
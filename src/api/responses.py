@@ -0,0 +1,10 @@
+from fastapi.responses import ORJSONResponse
+from src.infrastructure.metrics import timed
+
+class TimedORJSONResponse(ORJSONResponse):
+  """
+  ORJSONResponse whose rendering is recorded as the `serialize` stage
+  """
+  def render(self, content) -> bytes:
+    with timed("serialize"):
+      return super().render(content)
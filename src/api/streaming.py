@@ -0,0 +1,43 @@
+import orjson
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from src.infrastructure.metrics import timed
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+def wants_ndjson(request: Request, format: str = None) -> bool:
+  """
+  Streaming is opt-in via ?format=ndjson or an Accept: application/x-ndjson header
+  """
+  if format:
+    return format == "ndjson"
+  return NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+async def peek_pages(pages):
+  """
+  (first page or None, iterator over all pages) for work that has to wait
+  until the datasource has synced, which it does before its first page
+  """
+  first = await anext(pages, None)
+
+  async def all_pages():
+    if first is None:
+      return
+    yield first
+    async for page in pages:
+      yield page
+
+  return first, all_pages()
+
+def ndjson_response(row_batches) -> StreamingResponse:
+  """
+  Stream an async iterator of row lists as newline-delimited JSON, one chunk per batch
+  """
+  async def body():
+    async for rows in row_batches:
+      if rows:
+        with timed("serialize"):
+          chunk = b"".join(orjson.dumps(row) + b"\n" for row in rows)
+        yield chunk
+
+  return StreamingResponse(body(), media_type=NDJSON_MEDIA_TYPE)
@@ -0,0 +1,85 @@
+import os
+from fastapi import APIRouter, Depends, HTTPException, Request
+from src.api.responses import TimedORJSONResponse
+from typing import List, Literal, Optional
+from pydantic import BaseModel
+from dotenv import load_dotenv
+from src.core.base import BaseDataSource
+from src.services.summary import SUMMARY_VIEWS, run_summaries, summarize_user
+
+load_dotenv()
+TARGET_BUILDER = os.getenv("TARGET_BUILDER")
+# Max queries per /v1/batch call, and max users fetched/computed at once
+BATCH_MAX_QUERIES = int(os.getenv("BATCH_MAX_QUERIES", 100))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", 16))
+
+router = APIRouter()
+
+# Dependency provider
+def get_datasource(request: Request) -> BaseDataSource:
+  return request.app.state.datasource
+
+class SummaryQuery(BaseModel):
+  user: str
+  coin: Optional[str] = None
+  fromMs: Optional[int] = None
+  toMs: Optional[int] = None
+  builderOnly: bool = False
+  maxStartCapital: Optional[float] = None
+  include: List[Literal["trades", "positions", "pnl"]] = list(SUMMARY_VIEWS)
+
+  def key(self):
+    return (self.coin, self.fromMs, self.toMs, self.builderOnly, self.maxStartCapital, tuple(sorted(self.include)))
+
+  def echo(self):
+    return {"user": self.user, "coin": self.coin, "fromMs": self.fromMs, "toMs": self.toMs, "builderOnly": self.builderOnly}
+
+class BatchRequest(BaseModel):
+  queries: List[SummaryQuery]
+
+def parse_include(include):
+  views = [v.strip() for v in include.split(",") if v.strip()]
+  invalid = [v for v in views if v not in SUMMARY_VIEWS]
+  if invalid or not views:
+    raise HTTPException(
+      status_code=400,
+      detail=f"Invalid include. Must be a comma-separated subset of: {', '.join(SUMMARY_VIEWS)}"
+    )
+  return views
+
+@router.get("/v1/summary")
+async def get_summary(
+  user: str,
+  coin: Optional[str] = None,
+  fromMs: Optional[int] = None,
+  toMs: Optional[int] = None,
+  builderOnly: bool = False,
+  maxStartCapital: Optional[float] = None,
+  include: str = ",".join(SUMMARY_VIEWS),
+  ds: BaseDataSource = Depends(get_datasource)
+):
+  # Step 1: One fill fetch (and the start equity alongside it) feeds every requested view
+  query = SummaryQuery(
+    user=user, coin=coin, fromMs=fromMs, toMs=toMs, builderOnly=builderOnly,
+    maxStartCapital=maxStartCapital, include=parse_include(include),
+  )
+
+  # Step 2: Trades, positions and PnL from a single taint/aggregate pass
+  [result] = await summarize_user(ds, user, [query], TARGET_BUILDER)
+  return TimedORJSONResponse(result)
+
+@router.post("/v1/batch")
+async def post_batch(batch: BatchRequest, ds: BaseDataSource = Depends(get_datasource)):
+  if not batch.queries:
+    raise HTTPException(status_code=400, detail="No queries provided")
+  if len(batch.queries) > BATCH_MAX_QUERIES:
+    raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_QUERIES} queries per batch")
+  for query in batch.queries:
+    query.user = query.user.strip()
+    if not query.user or not query.include:
+      raise HTTPException(status_code=400, detail="Every query needs a user and at least one view in include")
+
+  # Each distinct user's history is fetched once, over the widest window their queries need,
+  # then sliced per query; a failed user only fails their own queries
+  results = await run_summaries(ds, batch.queries, TARGET_BUILDER, concurrency=BATCH_CONCURRENCY)
+  return TimedORJSONResponse({"results": results})
@@ -1,10 +1,13 @@
 import os
-from fastapi import APIRouter, Depends
-from typing import Optional
+from fastapi import APIRouter, Depends, Request
+from src.api.responses import TimedORJSONResponse
+from typing import Literal, Optional
 from dotenv import load_dotenv
-from src.infrastructure.public_hl_datasource import PublicHLDataSource
 from src.core.base import BaseDataSource
-from src.services.helper_functions import determine_taint
+from src.infrastructure.metrics import timed
+from src.services.fill_engine import stream_processed_fills
+from src.services.compute_pool import compute_pool
+from src.api.streaming import ndjson_response, peek_pages, wants_ndjson
 
 load_dotenv()
 TARGET_BUILDER = os.getenv("TARGET_BUILDER")
@@ -12,58 +15,48 @@ TARGET_BUILDER = os.getenv("TARGET_BUILDER")
 router = APIRouter()
 
 # Dependency provider
-def get_datasource() -> BaseDataSource:
-  return PublicHLDataSource()
+def get_datasource(request: Request) -> BaseDataSource:
+  return request.app.state.datasource
 
 @router.get("/v1/trades")
 async def get_trades(
+  request: Request,
   user: str,
   coin: Optional[str] = None,
   fromMs: Optional[int] = None,
   toMs: Optional[int] = None,
   builderOnly: bool = False,
+  format: Optional[Literal["json", "ndjson"]] = None,
   ds: BaseDataSource = Depends(get_datasource)
 ):
-  # 1. Get ALL raw fills (don't filter yet!)
-  raw_fills = ds.get_user_fills(user, from_ms=fromMs, to_ms=toMs)
-  
-  # 2. Map raw fills to the required schema
-  processed_fills = []
-  for f in raw_fills:
-    # Check builder attribution 
-    # matching address AND fee > 0
-    trade_builder = f.get("builder")
-    is_target_builder = (trade_builder == TARGET_BUILDER and float(f.get("builderFee", 0)) > 0)
-    
-    processed_fills.append({
-      "timeMs": f.get("time"),
-      "coin": f.get("coin"),
-      "side": f.get("side"),
-      "px": f.get("px"),
-      "sz": f.get("sz"),
-      "fee": f.get("fee"),
-      "closedPnl": f.get("closedPnl"),
-      "builder": trade_builder,
-      "is_target_builder": is_target_builder # Helper for step 4
-    })
+  if wants_ndjson(request, format):
+    # Stream rows page by page as the fills arrive instead of building the full list
+    pages = ds.iter_user_fill_pages(user, from_ms=fromMs, to_ms=toMs, coin=coin)
 
-  # 3. Determine Taint on the FULL list
-  # This function needs the whole history to see if a non-builder trade "tainted" the position
-  determine_taint(processed_fills, TARGET_BUILDER, sort_by='timeMs')
+    async def rows():
+      # Taint of lifecycles opened before fromMs carries into the window
+      first, synced_pages = await peek_pages(pages)
+      engine_state = await ds.get_position_state(user, fromMs, coin=coin) if fromMs and first else None
+      async for processed in stream_processed_fills(
+        synced_pages, TARGET_BUILDER, builder_only=builderOnly, engine_state=engine_state
+      ):
+        yield [p.trade_row() for p in processed if p.included]
 
-  # 4. Final Filter
-  final_results = []
-  for f in processed_fills:
-    # Filter by coin if requested
-    if coin and f["coin"] != coin:
-      continue
-        
-    if builderOnly:
-      # Rule: Only target builder AND NOT tainted 
-      if f["is_target_builder"] and not f.get("tainted"):
-          final_results.append(f)
-    else:
-      # All-trades mode: return everything [cite: 10]
-      final_results.append(f)
+    return ndjson_response(rows())
 
-  return final_results
\ No newline at end of file
+  # 1. Get raw fills for the coin (taint is tracked per coin, so other coins don't matter),
+  # as shared memory-mapped columns when the datasource has them
+  with timed("fetch"):
+    raw_fills = await ds.get_user_fill_frame(user, from_ms=fromMs, to_ms=toMs, coin=coin)
+    if raw_fills is None:
+      raw_fills = await ds.get_user_fills(user, from_ms=fromMs, to_ms=toMs, coin=coin)
+    # Lifecycles still open at fromMs keep the taint they picked up before it
+    engine_state = await ds.get_position_state(user, fromMs, coin=coin) if fromMs else None
+
+  # 2. Map to the response schema, determine taint and apply the builder-only rule
+  # (only target builder AND NOT tainted); all-trades mode returns everything
+  report = await compute_pool.summarize_fills(
+    raw_fills, TARGET_BUILDER, builder_only=builderOnly, collect_trades=True, initial_state=engine_state
+  )
+
+  return TimedORJSONResponse(report.trades)
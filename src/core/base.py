@@ -1,10 +1,120 @@
+import asyncio
 from abc import ABC, abstractmethod
 
 class BaseDataSource(ABC):
+  # Fills come back as Fill records whose is_target_builder is decided against this address
+  target_builder = None
+
+  @abstractmethod
+  async def get_deposits(self, wallet_address, from_ms=None, to_ms=None):
+    pass
+
+  @abstractmethod
+  async def get_user_fills(self, user: str, from_ms: int = None, to_ms: int = None, coin: str = None):
+    pass
+
   @abstractmethod
-  def get_deposits(self, wallet_address, from_ms=None, to_ms=None):
+  def iter_user_fill_pages(self, user: str, from_ms: int = None, to_ms: int = None, coin: str = None):
+    """
+    Async generator yielding the user's fills one page at a time, oldest first
+    """
     pass
 
+  async def get_user_fills_many(
+    self, users, from_ms: int = None, to_ms: int = None, coin: str = None, concurrency: int = 16
+  ):
+    """
+    Async iterator of (user, fills) for a whole cohort, yielded as each user's
+    fetch completes. Fills are a FillFrame over the shared columns when the
+    source has them. Repeated addresses are fetched once and at most
+    `concurrency` fetches run at a time; if a user's fetch fails, the
+    exception is yielded in place of their fills.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch(user):
+      async with semaphore:
+        try:
+          fills = await self.get_user_fill_frame(user, from_ms=from_ms, to_ms=to_ms, coin=coin)
+          if fills is None:
+            fills = await self.get_user_fills(user, from_ms=from_ms, to_ms=to_ms, coin=coin)
+          return user, fills
+        except Exception as e:
+          return user, e
+
+    tasks = [asyncio.ensure_future(fetch(user)) for user in dict.fromkeys(users)]
+    try:
+      for next_done in asyncio.as_completed(tasks):
+        yield await next_done
+    finally:
+      # The consumer stopped early (or gave up at a deadline)
+      for task in tasks:
+        task.cancel()
+
   @abstractmethod
-  def get_user_fills(self, user: str, from_ms: int = None, to_ms: int = None):
-    pass
\ No newline at end of file
+  async def get_equity_at_timestamp(self, user: str, timestamp_ms: int):
+    pass
+
+  async def get_fill_summary(
+    self, user: str, from_ms: int = None, to_ms: int = None, coin: str = None, builder_only: bool = False
+  ):
+    """
+    Pre-aggregated FillReport totals for the window, or None when this
+    source has no aggregates and the caller should reduce the raw fills
+    """
+    return None
+
+  async def get_user_fill_frame(self, user: str, from_ms: int = None, to_ms: int = None, coin: str = None):
+    """
+    The window's fills as a FillFrame read from a shared columnar cache, or
+    None when this source has none and the caller should use get_user_fills
+    """
+    return None
+
+  async def get_position_resume(self, user: str, after, coin: str = None, to_ms: int = None):
+    """
+    (per-coin FillEngine state, fills) to rebuild positions past the (time, tid)
+    key `after` from the nearest checkpoints, or None when this source keeps no
+    checkpoints and the caller should replay the full history
+    """
+    return None
+
+  async def get_position_state(self, user: str, before_ms: int, coin: str = None):
+    """
+    Per-coin FillEngine state after every fill before before_ms, rebuilt from
+    the nearest checkpoints, so a window starting there keeps the taint of
+    lifecycles opened earlier; None when this source keeps no checkpoints.
+    Call it after fetching the window's fills, which syncs the source.
+    """
+    return None
+
+  async def get_ledger_updates(self, user: str, from_ms: int = None, to_ms: int = None):
+    """
+    userNonFundingLedgerUpdates and userFunding entries for the window, oldest
+    first, or None when this source can't page through the user's ledger
+    """
+    return None
+
+  async def get_ledger_totals(self, user: str, timestamp_ms: int = None):
+    """
+    Cumulative {"deposited", "withdrawn", "funding"} over the user's ledger
+    updates before timestamp_ms (all of them if None), or None when this
+    source keeps no running ledger totals
+    """
+    return None
+
+  async def get_account_value(self, user: str):
+    """
+    Current perp account value, or None when this source can't look it up
+    """
+    return None
+
+  async def get_equity_at_timestamps(self, users, timestamp_ms: int):
+    """
+    Equity at timestamp_ms for many users at once, looked up concurrently.
+    Returns {user: equity}; users whose lookup failed are left out.
+    """
+    results = await asyncio.gather(
+      *(self.get_equity_at_timestamp(user, timestamp_ms) for user in users), return_exceptions=True
+    )
+    return {user: equity for user, equity in zip(users, results) if not isinstance(equity, Exception)}
@@ -0,0 +1,172 @@
+import sys
+from decimal import Decimal
+from dataclasses import dataclass
+from typing import Optional
+
+# Slotted response rows. orjson serializes dataclasses natively, so handlers
+# return these straight through ORJSONResponse without jsonable_encoder.
+# Decimal fields stay strings, matching the API's wire format.
+
+@dataclass(slots=True)
+class TradeRow:
+  timeMs: int
+  coin: str
+  side: str
+  px: str
+  sz: str
+  fee: str
+  closedPnl: str
+  builder: Optional[str]
+  is_target_builder: bool
+  tainted: bool
+
+@dataclass(slots=True)
+class PositionSnapshot:
+  timeMs: int
+  coin: str
+  netSize: str
+  avgEntryPx: str
+
+@dataclass(slots=True)
+class BuilderPositionSnapshot:
+  """
+  Builder-only history rows also say whether the lifecycle is tainted
+  """
+  timeMs: int
+  coin: str
+  netSize: str
+  avgEntryPx: str
+  tainted: bool
+
+@dataclass(slots=True)
+class PnlSummary:
+  realizedPnl: float
+  returnPct: float
+  feesPaid: float
+  tradeCount: int
+  tainted: Optional[bool]
+
+@dataclass(slots=True)
+class LeaderboardRow:
+  user: str
+  metricValue: str
+  tradeCount: int
+  tainted: bool
+  rank: int = 0
+
+def decimal_str(value: float) -> str:
+  """
+  A float as the API writes numbers: plain decimal, never exponent notation
+  """
+  text = repr(value)
+  if "e" in text:
+    text = format(Decimal(text), "f")
+    if "." not in text:
+      text += ".0"
+  return text
+
+# Keys Fill keeps as fields; anything else the API sends is held in `extra`
+API_FILL_KEYS = frozenset((
+  "coin", "px", "sz", "side", "time", "startPosition", "dir", "closedPnl", "hash", "oid",
+  "crossed", "fee", "tid", "feeToken", "twapId", "builder", "builderAddress", "builderFee",
+))
+
+def _float(value):
+  return float(value) if value is not None else None
+
+@dataclass(slots=True)
+class Fill:
+  """
+  One API fill, parsed once where it enters the app. Numbers are floats,
+  repeated strings (coin, direction, fee token, builder) are interned, and
+  is_target_builder is decided up front. as_dict() is the API's JSON shape.
+  """
+  time: int
+  tid: int
+  coin: str
+  side: str
+  px: float
+  sz: float
+  start_position: Optional[float]
+  closed_pnl: float
+  fee: float
+  builder: Optional[str]
+  builder_fee: Optional[float]
+  is_target_builder: bool
+  dir: Optional[str] = None
+  hash: Optional[str] = None
+  oid: Optional[int] = None
+  crossed: Optional[bool] = None
+  fee_token: Optional[str] = None
+  twap_id: Optional[int] = None
+  extra: Optional[dict] = None
+
+  @classmethod
+  def from_api(cls, fill: dict, target_builder: Optional[str]) -> "Fill":
+    get = fill.get
+    builder = get("builder") or get("builderAddress")
+    builder_fee = _float(get("builderFee"))
+    # A builder trade carries the target builder's address and, when a builder fee is reported, a non-zero one
+    is_target_builder = bool(builder) and builder == target_builder and (builder_fee is None or builder_fee > 0)
+    direction = get("dir")
+    fee_token = get("feeToken")
+    # Positional: keyword construction costs more than the parsing on this hot path
+    return cls(
+      get("time", 0),
+      get("tid", 0),
+      sys.intern(fill["coin"]),
+      sys.intern(fill["side"]),
+      float(get("px", 0)),
+      float(get("sz", 0)),
+      _float(get("startPosition")),
+      float(get("closedPnl", 0)),
+      float(get("fee", 0)),
+      sys.intern(builder) if builder else None,
+      builder_fee,
+      is_target_builder,
+      sys.intern(direction) if direction else direction,
+      get("hash"),
+      get("oid"),
+      get("crossed"),
+      sys.intern(fee_token) if fee_token else fee_token,
+      get("twapId"),
+      None if API_FILL_KEYS.issuperset(fill) else {k: v for k, v in fill.items() if k not in API_FILL_KEYS},
+    )
+
+  def as_dict(self) -> dict:
+    """
+    The fill in the API's JSON shape, numbers as decimal strings
+    """
+    fill = {
+      "coin": self.coin,
+      "px": decimal_str(self.px),
+      "sz": decimal_str(self.sz),
+      "side": self.side,
+      "time": self.time,
+    }
+    if self.start_position is not None:
+      fill["startPosition"] = decimal_str(self.start_position)
+    fill.update({
+      "dir": self.dir,
+      "closedPnl": decimal_str(self.closed_pnl),
+      "hash": self.hash,
+      "oid": self.oid,
+      "crossed": self.crossed,
+      "fee": decimal_str(self.fee),
+      "tid": self.tid,
+      "feeToken": self.fee_token,
+      "twapId": self.twap_id,
+    })
+    if self.builder is not None:
+      fill["builder"] = self.builder
+    if self.builder_fee is not None:
+      fill["builderFee"] = decimal_str(self.builder_fee)
+    if self.extra:
+      fill.update(self.extra)
+    return fill
+
+def to_fills(fills, target_builder: Optional[str]) -> list:
+  """
+  Fill records for a list that may still hold raw API dicts
+  """
+  return [f if isinstance(f, Fill) else Fill.from_api(f, target_builder) for f in fills]
@@ -0,0 +1,153 @@
+import os
+import time
+import asyncio
+from collections import OrderedDict
+from src.core.base import BaseDataSource
+
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", 1024))
+# Seconds each kind of response stays fresh
+CACHE_TTLS = {
+  "equity": float(os.getenv("CACHE_TTL_EQUITY_S", 2)),          # clearinghouseState moves every block
+  "deposits": float(os.getenv("CACHE_TTL_DEPOSITS_S", 30)),
+  "fills": float(os.getenv("CACHE_TTL_FILLS_S", 5)),            # windows still open to new fills
+  "closed_fills": float(os.getenv("CACHE_TTL_CLOSED_FILLS_S", 3600)),  # windows entirely in the past
+}
+# A window ending this long ago can no longer receive fills
+CLOSED_WINDOW_MS = 60_000
+
+class TTLCache:
+  """
+  LRU-bounded mapping whose entries also expire after their own TTL
+  """
+  def __init__(self, max_entries=CACHE_MAX_ENTRIES):
+    self.max_entries = max_entries
+    self._entries = OrderedDict()
+
+  def __len__(self):
+    return len(self._entries)
+
+  def get(self, key):
+    """
+    Returns (found, value), dropping the entry if it has expired
+    """
+    entry = self._entries.get(key)
+    if entry is None:
+      return False, None
+    expires_at, value = entry
+    if expires_at < time.monotonic():
+      del self._entries[key]
+      return False, None
+    self._entries.move_to_end(key)
+    return True, value
+
+  def set(self, key, value, ttl):
+    self._entries[key] = (time.monotonic() + ttl, value)
+    self._entries.move_to_end(key)
+    while len(self._entries) > self.max_entries:
+      self._entries.popitem(last=False)
+
+class CachedDataSource(BaseDataSource):
+  """
+  Wraps another data source with a TTL + LRU response cache.
+  Concurrent identical requests share a single upstream call.
+  With cache_fills=False fill lists aren't kept, e.g. when worker processes
+  already share the fills as memory-mapped segments.
+  """
+  def __init__(self, upstream: BaseDataSource, max_entries=CACHE_MAX_ENTRIES, ttls=None, cache_fills=True):
+    self.upstream = upstream
+    self.cache_fills = cache_fills
+    self.target_builder = upstream.target_builder
+    self.ttls = {**CACHE_TTLS, **(ttls or {})}
+    self.cache = TTLCache(max_entries)
+    self._inflight = {}
+    self.hits = {kind: 0 for kind in self.ttls}
+    self.misses = {kind: 0 for kind in self.ttls}
+    self.coalesced = {kind: 0 for kind in self.ttls}
+
+  def stats(self):
+    return {
+      kind: {
+        "hits": self.hits[kind],
+        "misses": self.misses[kind],
+        "coalesced": self.coalesced[kind],
+      }
+      for kind in self.ttls
+    } | {"entries": len(self.cache)}
+
+  async def _cached(self, kind, key, fetch):
+    found, value = self.cache.get(key)
+    if found:
+      self.hits[kind] += 1
+      return value
+
+    task = self._inflight.get(key)
+    if task is not None:
+      self.coalesced[kind] += 1
+    else:
+      self.misses[kind] += 1
+      task = asyncio.ensure_future(fetch())
+      self._inflight[key] = task
+
+      def store(done):
+        self._inflight.pop(key, None)
+        if not done.cancelled() and done.exception() is None:
+          self.cache.set(key, done.result(), self.ttls[kind])
+      task.add_done_callback(store)
+
+    # Shield so one cancelled caller doesn't cancel the fetch for everyone else
+    return await asyncio.shield(task)
+
+  async def get_deposits(self, wallet_address, from_ms=None, to_ms=None):
+    key = ("deposits", wallet_address, from_ms, to_ms)
+    return await self._cached(
+      "deposits", key, lambda: self.upstream.get_deposits(wallet_address, from_ms=from_ms, to_ms=to_ms)
+    )
+
+  async def get_user_fills(self, user: str, from_ms: int = None, to_ms: int = None, coin: str = None):
+    if not self.cache_fills:
+      return await self.upstream.get_user_fills(user, from_ms=from_ms, to_ms=to_ms, coin=coin)
+    closed = to_ms is not None and to_ms < time.time() * 1000 - CLOSED_WINDOW_MS
+    kind = "closed_fills" if closed else "fills"
+    key = ("fills", user, from_ms, to_ms, coin)
+    fills = await self._cached(
+      kind, key, lambda: self.upstream.get_user_fills(user, from_ms=from_ms, to_ms=to_ms, coin=coin)
+    )
+    # Callers may reorder their list, so never hand out the cached one
+    return list(fills)
+
+  async def get_fill_summary(
+    self, user: str, from_ms: int = None, to_ms: int = None, coin: str = None, builder_only: bool = False
+  ):
+    closed = to_ms is not None and to_ms < time.time() * 1000 - CLOSED_WINDOW_MS
+    kind = "closed_fills" if closed else "fills"
+    key = ("summary", user, from_ms, to_ms, coin, builder_only)
+    return await self._cached(
+      kind, key,
+      lambda: self.upstream.get_fill_summary(user, from_ms=from_ms, to_ms=to_ms, coin=coin, builder_only=builder_only)
+    )
+
+  def iter_user_fill_pages(self, user: str, from_ms: int = None, to_ms: int = None, coin: str = None):
+    return self.upstream.iter_user_fill_pages(user, from_ms=from_ms, to_ms=to_ms, coin=coin)
+
+  def get_user_fill_frame(self, user: str, from_ms: int = None, to_ms: int = None, coin: str = None):
+    # Not cached per process: frames are views of the memory-mapped segments every worker shares
+    return self.upstream.get_user_fill_frame(user, from_ms=from_ms, to_ms=to_ms, coin=coin)
+
+  def get_position_resume(self, user: str, after, coin: str = None, to_ms: int = None):
+    return self.upstream.get_position_resume(user, after, coin=coin, to_ms=to_ms)
+
+  def get_position_state(self, user: str, before_ms: int, coin: str = None):
+    return self.upstream.get_position_state(user, before_ms, coin=coin)
+
+  def get_ledger_updates(self, user: str, from_ms: int = None, to_ms: int = None):
+    return self.upstream.get_ledger_updates(user, from_ms=from_ms, to_ms=to_ms)
+
+  def get_ledger_totals(self, user: str, timestamp_ms: int = None):
+    return self.upstream.get_ledger_totals(user, timestamp_ms)
+
+  def get_account_value(self, user: str):
+    return self.upstream.get_account_value(user)
+
+  async def get_equity_at_timestamp(self, user: str, timestamp_ms: int):
+    key = ("equity", user, timestamp_ms)
+    return await self._cached("equity", key, lambda: self.upstream.get_equity_at_timestamp(user, timestamp_ms))
@@ -0,0 +1,175 @@
+import os
+import sys
+import json
+import datetime
+from src.core.models import Fill
+
+# Only the backfill CLI and FILL_ARCHIVE_DIR need pyarrow; the API imports this module without it
+try:
+  import pyarrow as pa
+  import pyarrow.compute as pc
+  import pyarrow.parquet as pq
+except ImportError:
+  pa = None
+
+DAY_MS = 24 * 3_600_000
+ARCHIVE_FORMATS = {"parquet": "fills.parquet", "arrow": "fills.arrow"}
+
+def _require_pyarrow():
+  if pa is None:
+    raise RuntimeError("Fill archives need pyarrow (pip install -r requirements.txt)")
+
+def fill_schema():
+  """
+  Columns of an archived fill, in Fill field order. is_target_builder is
+  left out since it depends on the reader's target builder.
+  """
+  _require_pyarrow()
+  text = pa.dictionary(pa.int32(), pa.string())
+  return pa.schema([
+    ("time", pa.int64()), ("tid", pa.int64()), ("coin", text), ("side", text),
+    ("px", pa.float64()), ("sz", pa.float64()), ("start_position", pa.float64()),
+    ("closed_pnl", pa.float64()), ("fee", pa.float64()), ("builder", text), ("builder_fee", pa.float64()),
+    ("dir", text), ("hash", pa.string()), ("oid", pa.int64()), ("crossed", pa.bool_()),
+    ("fee_token", text), ("twap_id", pa.int64()), ("extra", pa.string()),
+  ])
+
+def day_of(time_ms):
+  return datetime.datetime.fromtimestamp(time_ms // 1000, datetime.timezone.utc).strftime("%Y-%m-%d")
+
+def _day_start_ms(day):
+  date = datetime.datetime.strptime(day, "%Y-%m-%d").replace(tzinfo=datetime.timezone.utc)
+  return int(date.timestamp()) * 1000
+
+def fills_table(fills):
+  """
+  Arrow table over Fill records
+  """
+  schema = fill_schema()
+  columns = {name: [] for name in schema.names}
+  for f in fills:
+    for name in schema.names:
+      columns[name].append(getattr(f, name))
+  columns["extra"] = [json.dumps(extra) if extra else None for extra in columns["extra"]]
+  return pa.Table.from_pydict(columns, schema=schema)
+
+class FillArchive:
+  """
+  Columnar archive of fills on disk, one file per user and UTC day:
+
+    <root>/user=<address>/date=<YYYY-MM-DD>/fills.parquet (or fills.arrow)
+
+  Parquet files are compressed for storage. Arrow IPC files written without
+  compression are memory-mapped on read, so their columns are served
+  straight from the page cache without a copy.
+  """
+  def __init__(self, root, format="parquet", compression=None):
+    _require_pyarrow()
+    if format not in ARCHIVE_FORMATS:
+      raise ValueError(f"Unknown archive format {format!r}, expected one of: {', '.join(ARCHIVE_FORMATS)}")
+    self.root = root
+    self.format = format
+    # zstd-compressed Parquet by default; Arrow stays uncompressed so it can be memory-mapped
+    if compression is None:
+      compression = "zstd" if format == "parquet" else "none"
+    self.compression = None if compression == "none" else compression
+
+  def _user_dir(self, user):
+    return os.path.join(self.root, f"user={user.lower()}")
+
+  def _path(self, user, day):
+    return os.path.join(self._user_dir(user), f"date={day}", ARCHIVE_FORMATS[self.format])
+
+  def write_day(self, user, day, fills):
+    """
+    Replace the user's file for one day with `fills` (written to a temp file, then renamed)
+    """
+    path = self._path(user, day)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    table = fills_table(fills)
+    tmp = path + ".tmp"
+    if self.format == "parquet":
+      pq.write_table(table, tmp, compression=self.compression or "none")
+    else:
+      options = pa.ipc.IpcWriteOptions(compression=self.compression)
+      with pa.OSFile(tmp, "wb") as sink, pa.ipc.new_file(sink, table.schema, options=options) as writer:
+        writer.write_table(table)
+    os.replace(tmp, path)
+
+  def resume_ms(self, user):
+    """
+    Where an interrupted or incremental backfill of the user picks up, or None
+    """
+    try:
+      with open(os.path.join(self._user_dir(user), "_checkpoint.json"), encoding="utf-8") as f:
+        return json.load(f)["resume_ms"]
+    except FileNotFoundError:
+      return None
+
+  def save_checkpoint(self, user, resume_ms):
+    # Leading underscore: dataset readers skip it when scanning the partitions
+    path = os.path.join(self._user_dir(user), "_checkpoint.json")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+      json.dump({"resume_ms": resume_ms}, f)
+    os.replace(path + ".tmp", path)
+
+  def days(self, user):
+    """
+    Archived days for the user, oldest first
+    """
+    user_dir = self._user_dir(user)
+    if not os.path.isdir(user_dir):
+      return []
+    name = ARCHIVE_FORMATS[self.format]
+    return sorted(
+      entry[len("date="):] for entry in os.listdir(user_dir)
+      if entry.startswith("date=") and os.path.exists(os.path.join(user_dir, entry, name))
+    )
+
+  def _read_day(self, user, day):
+    path = self._path(user, day)
+    if self.format == "parquet":
+      return pq.read_table(path, memory_map=True)
+    return pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+
+  def read_table(self, user, from_ms=None, to_ms=None, coin=None):
+    """
+    The user's archived fills in [from_ms, to_ms] as one Arrow table, oldest first
+    """
+    days = [
+      day for day in self.days(user)
+      if (not from_ms or _day_start_ms(day) + DAY_MS > from_ms) and (not to_ms or _day_start_ms(day) <= to_ms)
+    ]
+    if not days:
+      return fill_schema().empty_table()
+    table = pa.concat_tables([self._read_day(user, day) for day in days])
+    mask = None
+    for condition in (
+      pc.greater_equal(table["time"], from_ms) if from_ms else None,
+      pc.less_equal(table["time"], to_ms) if to_ms else None,
+      pc.equal(table["coin"].cast(pa.string()), coin) if coin else None,
+    ):
+      if condition is not None:
+        mask = condition if mask is None else pc.and_(mask, condition)
+    return table if mask is None else table.filter(mask)
+
+  def read_fills(self, user, from_ms=None, to_ms=None, coin=None, target_builder=None):
+    """
+    Archived fills as Fill records, with is_target_builder decided against `target_builder`
+    """
+    table = self.read_table(user, from_ms, to_ms, coin)
+    intern = sys.intern
+    fills = []
+    for (
+      time, tid, coin_, side, px, sz, start_position, closed_pnl, fee, builder, builder_fee,
+      direction, hash_, oid, crossed, fee_token, twap_id, extra,
+    ) in zip(*(table[name].to_pylist() for name in table.schema.names)):
+      fills.append(Fill(
+        time, tid, intern(coin_), intern(side), px, sz, start_position, closed_pnl, fee,
+        intern(builder) if builder else None, builder_fee,
+        bool(builder) and builder == target_builder and (builder_fee is None or builder_fee > 0),
+        intern(direction) if direction else direction, hash_, oid, crossed,
+        intern(fee_token) if fee_token else fee_token, twap_id, json.loads(extra) if extra else None,
+      ))
+    return fills
@@ -0,0 +1,679 @@
+import os
+import sys
+import json
+import fcntl
+import hashlib
+import asyncio
+import sqlite3
+import threading
+import uuid
+from contextlib import contextmanager, nullcontext
+from src.core.base import BaseDataSource
+from src.core.models import Fill
+from src.infrastructure.ledger_series import ledger_flows, ledger_key
+
+FILL_STORE_PATH = os.getenv("FILL_STORE_PATH", "data/fills.sqlite3")
+
+# Typed per-fill columns, written once from the parsed Fill so reads don't re-parse the JSON
+FILL_COLUMNS = (
+  ("side", "TEXT"), ("px", "REAL"), ("sz", "REAL"), ("start_position", "REAL"), ("closed_pnl", "REAL"),
+  ("fee", "REAL"), ("builder", "TEXT"), ("builder_fee", "REAL"), ("dir", "TEXT"), ("hash", "TEXT"),
+  ("oid", "INTEGER"), ("crossed", "INTEGER"), ("fee_token", "TEXT"), ("twap_id", "INTEGER"), ("extra", "TEXT"),
+)
+# Fill's fields in order, with is_target_builder computed against the bound target builder
+FILL_SELECT = (
+  "time, tid, coin, side, px, sz, start_position, closed_pnl, fee, builder, builder_fee, "
+  "(builder = ? AND (builder_fee IS NULL OR builder_fee > 0)), "
+  "dir, hash, oid, crossed, fee_token, twap_id, extra"
+)
+
+def _fill_row(user, fill):
+  return (
+    user, fill.tid, fill.coin, fill.time,
+    fill.side, fill.px, fill.sz, fill.start_position, fill.closed_pnl, fill.fee, fill.builder, fill.builder_fee,
+    fill.dir, fill.hash, fill.oid, fill.crossed, fill.fee_token, fill.twap_id,
+    json.dumps(fill.extra) if fill.extra else None,
+  )
+
+def _fills_from_rows(rows):
+  intern = sys.intern
+  return [
+    Fill(
+      time, tid, intern(coin), intern(side), px, sz, start_position, closed_pnl, fee,
+      intern(builder) if builder else None, builder_fee, bool(is_target_builder),
+      intern(direction) if direction else direction, hash_, oid, None if crossed is None else bool(crossed),
+      intern(fee_token) if fee_token else fee_token, twap_id, json.loads(extra) if extra else None,
+    )
+    for (
+      time, tid, coin, side, px, sz, start_position, closed_pnl, fee, builder, builder_fee, is_target_builder,
+      direction, hash_, oid, crossed, fee_token, twap_id, extra,
+    ) in rows
+  ]
+
+# Per-update amounts of a stored ledger update, each followed by the user's running total through it
+LEDGER_FLOWS = ("deposited", "withdrawn", "funding")
+LEDGER_KEY = "time, hash, kind, coin"
+
+# Running sums kept per bucket, first for all fills, then for untainted builder fills
+BUCKET_COLUMNS = (
+  "realized_pnl", "fees", "volume", "trade_count",
+  "builder_realized_pnl", "builder_fees", "builder_volume", "builder_trade_count",
+  "tainted_count",
+)
+
+class SQLiteFillStore:
+  """
+  Local copy of every fill we've downloaded, keyed by (user, tid).
+  Historical fills never change, so rows are only ever inserted.
+  """
+  def __init__(self, path=FILL_STORE_PATH):
+    if path != ":memory:" and os.path.dirname(path):
+      os.makedirs(os.path.dirname(path), exist_ok=True)
+    self.path = path
+    self._conn = sqlite3.connect(path, check_same_thread=False)
+    self._lock = threading.Lock()
+    with self._lock, self._conn:
+      self._conn.execute("PRAGMA journal_mode=WAL")
+      self._conn.execute("PRAGMA synchronous=NORMAL")
+      self._conn.execute("""
+        CREATE TABLE IF NOT EXISTS fills (
+          user TEXT NOT NULL,
+          tid INTEGER NOT NULL,
+          coin TEXT NOT NULL,
+          time INTEGER NOT NULL,
+          data TEXT,
+          PRIMARY KEY (user, tid)
+        )
+      """)
+      # Random id for this database, so caches built from it can tell it was replaced
+      self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+      self._conn.execute("INSERT OR IGNORE INTO meta VALUES ('store_id', ?)", (uuid.uuid4().hex,))
+      self.store_id = self._conn.execute("SELECT value FROM meta WHERE key = 'store_id'").fetchone()[0]
+      self._conn.execute("CREATE INDEX IF NOT EXISTS fills_user_coin_time ON fills (user, coin, time)")
+      self._conn.execute("CREATE INDEX IF NOT EXISTS fills_user_time ON fills (user, time)")
+      self._conn.execute("""
+        CREATE TABLE IF NOT EXISTS sync_state (
+          user TEXT PRIMARY KEY,
+          high_water_ms INTEGER NOT NULL
+        )
+      """)
+      # Per-fill flags written by the bucket aggregator (NULL until aggregated)
+      columns = {row[1] for row in self._conn.execute("PRAGMA table_info(fills)")}
+      for column in ("is_builder", "tainted"):
+        if column not in columns:
+          self._conn.execute(f"ALTER TABLE fills ADD COLUMN {column} INTEGER")
+      for column, kind in FILL_COLUMNS:
+        if column not in columns:
+          self._conn.execute(f"ALTER TABLE fills ADD COLUMN {column} {kind}")
+      self._backfill_fill_columns()
+      self._drop_fill_json()
+      sums = ", ".join(f"{c} {'INTEGER' if c.endswith('count') else 'REAL'} NOT NULL" for c in BUCKET_COLUMNS)
+      self._conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS fill_buckets (
+          user TEXT NOT NULL,
+          resolution TEXT NOT NULL,
+          bucket_ms INTEGER NOT NULL,
+          coin TEXT NOT NULL,
+          {sums},
+          PRIMARY KEY (user, resolution, bucket_ms, coin)
+        )
+      """)
+      # Where each user's aggregation left off: last fill rowid and the FillEngine state
+      self._conn.execute("""
+        CREATE TABLE IF NOT EXISTS aggregate_state (
+          user TEXT PRIMARY KEY,
+          target_builder TEXT,
+          last_rowid INTEGER NOT NULL,
+          engine_state TEXT NOT NULL
+        )
+      """)
+      # A coin's FillEngine state right after the fill (time, tid), saved by the aggregator
+      has_checkpoints = self._conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'position_checkpoints'"
+      ).fetchone()
+      self._conn.execute("""
+        CREATE TABLE IF NOT EXISTS position_checkpoints (
+          user TEXT NOT NULL,
+          coin TEXT NOT NULL,
+          time INTEGER NOT NULL,
+          tid INTEGER NOT NULL,
+          state TEXT NOT NULL,
+          PRIMARY KEY (user, coin, time, tid)
+        )
+      """)
+      # Non-funding ledger updates and funding payments, ordered by LEDGER_KEY, with running
+      # totals so the sums before any timestamp are one index seek
+      flows = ", ".join(f"{c} REAL NOT NULL DEFAULT 0, total_{c} REAL NOT NULL DEFAULT 0" for c in LEDGER_FLOWS)
+      self._conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS ledger_updates (
+          user TEXT NOT NULL,
+          time INTEGER NOT NULL,
+          hash TEXT NOT NULL,
+          kind TEXT NOT NULL,
+          coin TEXT NOT NULL,
+          data TEXT NOT NULL,
+          {flows},
+          PRIMARY KEY (user, {LEDGER_KEY})
+        )
+      """)
+      self._conn.execute("""
+        CREATE TABLE IF NOT EXISTS ledger_sync_state (
+          user TEXT PRIMARY KEY,
+          high_water_ms INTEGER NOT NULL
+        )
+      """)
+      if not has_checkpoints:
+        # Histories aggregated before checkpoints existed are rebuilt so they get them too
+        self._conn.execute("DELETE FROM fill_buckets")
+        self._conn.execute("DELETE FROM aggregate_state")
+
+  def _backfill_fill_columns(self):
+    # Rows stored before the typed columns existed only have their JSON
+    rows = self._conn.execute("SELECT rowid, data FROM fills WHERE side IS NULL").fetchall()
+    if not rows:
+      return
+    updates = []
+    for rowid, data in rows:
+      _, _, _, _, *values = _fill_row(None, Fill.from_api(json.loads(data), None))
+      updates.append((*values, rowid))
+    assignments = ", ".join(f"{column} = ?" for column, _ in FILL_COLUMNS)
+    self._conn.executemany(f"UPDATE fills SET {assignments} WHERE rowid = ?", updates)
+
+  def _drop_fill_json(self):
+    # Fills are read from the typed columns, so `data` is only kept by rows stored before them.
+    # Stores that created it NOT NULL are rebuilt (keeping rowids) with it nullable and cleared
+    info = self._conn.execute("PRAGMA table_info(fills)").fetchall()
+    if not any(name == "data" and notnull for _, name, _, notnull, _, _ in info):
+      return
+    definitions = ", ".join(
+      f"{name} {kind}{' NOT NULL' if notnull and name != 'data' else ''}" for _, name, kind, notnull, _, _ in info
+    )
+    columns = ", ".join(name for _, name, _, _, _, _ in info if name != "data")
+    self._conn.execute("DROP TABLE IF EXISTS fills_rebuilt")
+    self._conn.execute(f"CREATE TABLE fills_rebuilt ({definitions}, PRIMARY KEY (user, tid))")
+    self._conn.execute(f"INSERT INTO fills_rebuilt (rowid, {columns}) SELECT rowid, {columns} FROM fills")
+    self._conn.execute("DROP TABLE fills")
+    self._conn.execute("ALTER TABLE fills_rebuilt RENAME TO fills")
+    self._conn.execute("CREATE INDEX IF NOT EXISTS fills_user_coin_time ON fills (user, coin, time)")
+    self._conn.execute("CREATE INDEX IF NOT EXISTS fills_user_time ON fills (user, time)")
+
+  def close(self):
+    with self._lock:
+      self._conn.close()
+
+  def high_water_mark(self, user):
+    """
+    Time of the newest stored fill for the user, or None if never synced
+    """
+    with self._lock:
+      row = self._conn.execute("SELECT high_water_ms FROM sync_state WHERE user = ?", (user,)).fetchone()
+    return row[0] if row else None
+
+  def insert_fills(self, user, fills, high_water_ms):
+    """
+    Store Fills (duplicates by tid are ignored) and advance the user's high-water mark
+    """
+    rows = [_fill_row(user, f) for f in fills]
+    columns = ", ".join(["user", "tid", "coin", "time"] + [column for column, _ in FILL_COLUMNS])
+    placeholders = ", ".join("?" for _ in range(4 + len(FILL_COLUMNS)))
+    with self._lock, self._conn:
+      self._conn.executemany(f"INSERT OR IGNORE INTO fills ({columns}) VALUES ({placeholders})", rows)
+      self._conn.execute(
+        "INSERT INTO sync_state VALUES (?, ?) "
+        "ON CONFLICT (user) DO UPDATE SET high_water_ms = MAX(high_water_ms, excluded.high_water_ms)",
+        (user, high_water_ms)
+      )
+
+  def _range_filter(self, user, coin, from_ms, to_ms):
+    clauses = ["user = ?"]
+    params = [user]
+    if coin:
+      clauses.append("coin = ?")
+      params.append(coin)
+    if from_ms:
+      clauses.append("time >= ?")
+      params.append(from_ms)
+    if to_ms:
+      clauses.append("time <= ?")
+      params.append(to_ms)
+    return clauses, params
+
+  def query(self, user, coin=None, from_ms=None, to_ms=None, target_builder=None):
+    """
+    Indexed range scan over (user, coin, time), oldest first, as Fills
+    """
+    clauses, params = self._range_filter(user, coin, from_ms, to_ms)
+    sql = f"SELECT {FILL_SELECT} FROM fills WHERE {' AND '.join(clauses)} ORDER BY time, tid"
+    with self._lock:
+      rows = self._conn.execute(sql, [target_builder] + params).fetchall()
+    return _fills_from_rows(rows)
+
+  def query_page(self, user, coin=None, from_ms=None, to_ms=None, after=None, limit=2000, target_builder=None):
+    """
+    One page of the range scan, continuing after the (time, tid) key `after`
+    """
+    clauses, params = self._range_filter(user, coin, from_ms, to_ms)
+    if after:
+      clauses.append("(time, tid) > (?, ?)")
+      params.extend(after)
+    sql = f"SELECT {FILL_SELECT} FROM fills WHERE {' AND '.join(clauses)} ORDER BY time, tid LIMIT ?"
+    with self._lock:
+      rows = self._conn.execute(sql, [target_builder] + params + [limit]).fetchall()
+    return _fills_from_rows(rows)
+
+  # Ledger (deposits, withdrawals, transfers and funding)
+
+  def ledger_high_water_mark(self, user):
+    """
+    Time of the newest stored ledger update for the user, or None if never synced
+    """
+    with self._lock:
+      row = self._conn.execute("SELECT high_water_ms FROM ledger_sync_state WHERE user = ?", (user,)).fetchone()
+    return row[0] if row else None
+
+  def insert_ledger_updates(self, user, updates, high_water_ms):
+    """
+    Store ledger updates (duplicates by ledger_key are ignored), bring the
+    running totals up to date and advance the user's ledger high-water mark
+    """
+    columns = ", ".join(["user", *LEDGER_KEY.split(", "), "data", *LEDGER_FLOWS])
+    placeholders = ", ".join("?" for _ in range(6 + len(LEDGER_FLOWS)))
+    with self._lock, self._conn:
+      first_new = None
+      for update in updates:
+        key = ledger_key(update)
+        inserted = self._conn.execute(
+          f"INSERT OR IGNORE INTO ledger_updates ({columns}) VALUES ({placeholders})",
+          (user, *key, json.dumps(update), *ledger_flows(update, user))
+        ).rowcount
+        if inserted and (first_new is None or key < first_new):
+          first_new = key
+      if first_new is not None:
+        self._roll_ledger_totals(user, first_new)
+      self._conn.execute(
+        "INSERT INTO ledger_sync_state VALUES (?, ?) "
+        "ON CONFLICT (user) DO UPDATE SET high_water_ms = MAX(high_water_ms, excluded.high_water_ms)",
+        (user, high_water_ms)
+      )
+
+  def _roll_ledger_totals(self, user, first_key):
+    # Totals run in key order, so recompute them from the earliest new update on (normally just the new tail)
+    totals = self._conn.execute(
+      f"SELECT {', '.join(f'total_{c}' for c in LEDGER_FLOWS)} FROM ledger_updates "
+      f"WHERE user = ? AND ({LEDGER_KEY}) < (?, ?, ?, ?) "
+      "ORDER BY time DESC, hash DESC, kind DESC, coin DESC LIMIT 1",
+      (user, *first_key)
+    ).fetchone() or (0.0,) * len(LEDGER_FLOWS)
+    rows = self._conn.execute(
+      f"SELECT rowid, {', '.join(LEDGER_FLOWS)} FROM ledger_updates "
+      f"WHERE user = ? AND ({LEDGER_KEY}) >= (?, ?, ?, ?) ORDER BY {LEDGER_KEY}",
+      (user, *first_key)
+    ).fetchall()
+    updates = []
+    for rowid, *amounts in rows:
+      totals = tuple(total + amount for total, amount in zip(totals, amounts))
+      updates.append((*totals, rowid))
+    assignments = ", ".join(f"total_{c} = ?" for c in LEDGER_FLOWS)
+    self._conn.executemany(f"UPDATE ledger_updates SET {assignments} WHERE rowid = ?", updates)
+
+  def _ledger_totals(self, user, before_ms=None):
+    sql = f"SELECT {', '.join(f'total_{c}' for c in LEDGER_FLOWS)} FROM ledger_updates WHERE user = ?"
+    params = [user]
+    if before_ms is not None:
+      sql += " AND time < ?"
+      params.append(before_ms)
+    sql += " ORDER BY time DESC, hash DESC, kind DESC, coin DESC LIMIT 1"
+    return self._conn.execute(sql, params).fetchone() or (0.0,) * len(LEDGER_FLOWS)
+
+  def ledger_totals(self, user, before_ms=None):
+    """
+    {"deposited", "withdrawn", "funding"} summed over the user's updates
+    before before_ms, or over all of them; one index seek either way
+    """
+    with self._lock:
+      return dict(zip(LEDGER_FLOWS, self._ledger_totals(user, before_ms)))
+
+  def ledger_change_since(self, user, timestamp_ms):
+    """
+    Net change in the perp account value from ledger updates at or after timestamp_ms
+    """
+    with self._lock:
+      now, before = self._ledger_totals(user), self._ledger_totals(user, timestamp_ms)
+    deposited, withdrawn, funding = (total - earlier for total, earlier in zip(now, before))
+    return deposited - withdrawn + funding
+
+  def ledger_updates(self, user, from_ms=None, to_ms=None, kind=None):
+    """
+    Stored ledger updates in [from_ms, to_ms] in the API's JSON shape, oldest
+    first; only those whose delta type is `kind`, if given
+    """
+    clauses, params = self._range_filter(user, None, from_ms, to_ms)
+    if kind:
+      clauses.append("kind = ?")
+      params.append(kind)
+    sql = f"SELECT data FROM ledger_updates WHERE {' AND '.join(clauses)} ORDER BY {LEDGER_KEY}"
+    with self._lock:
+      rows = self._conn.execute(sql, params).fetchall()
+    return [json.loads(data) for data, in rows]
+
+  # Bucket pre-aggregation
+
+  @contextmanager
+  def _user_file_lock(self, user):
+    lock_dir = self.path + ".locks"
+    os.makedirs(lock_dir, exist_ok=True)
+    # Addresses come from requests, so they're hashed rather than used as file names
+    name = hashlib.sha1(user.lower().encode()).hexdigest()
+    with open(os.path.join(lock_dir, name), "w") as lock:
+      fcntl.flock(lock, fcntl.LOCK_EX)
+      yield
+
+  def aggregation_lock(self, user):
+    """
+    Exclusive lock on aggregating one user, held across processes sharing
+    the database file (an in-memory database has no other processes)
+    """
+    return nullcontext() if self.path == ":memory:" else self._user_file_lock(user)
+
+  def aggregate_state(self, user, target_builder):
+    """
+    (last aggregated rowid, engine state) for the user; starts over from
+    scratch if the aggregates were built for a different target builder
+    """
+    with self._lock:
+      row = self._conn.execute(
+        "SELECT target_builder, last_rowid, engine_state FROM aggregate_state WHERE user = ?", (user,)
+      ).fetchone()
+      if row is None or row[0] == target_builder:
+        return (row[1], json.loads(row[2])) if row else (0, {})
+      with self._conn:
+        self._conn.execute("DELETE FROM fill_buckets WHERE user = ?", (user,))
+        self._conn.execute("DELETE FROM aggregate_state WHERE user = ?", (user,))
+        self._conn.execute("DELETE FROM position_checkpoints WHERE user = ?", (user,))
+    return 0, {}
+
+  def unaggregated_fills(self, user, after_rowid, target_builder=None):
+    """
+    (rowid, Fill) for every fill stored since the last aggregation, oldest first
+    """
+    with self._lock:
+      rows = self._conn.execute(
+        f"SELECT rowid, {FILL_SELECT} FROM fills WHERE user = ? AND rowid > ? ORDER BY time, tid",
+        (target_builder, user, after_rowid)
+      ).fetchall()
+    return list(zip((row[0] for row in rows), _fills_from_rows(row[1:] for row in rows)))
+
+  def apply_aggregates(
+    self, user, target_builder, after_rowid, last_rowid, engine_state, flags, buckets, checkpoints=()
+  ):
+    """
+    Atomically move the user's cursor from after_rowid to last_rowid, add bucket deltas and
+    record per-fill flags and checkpoints. Returns False, changing nothing, if the cursor is
+    no longer at after_rowid (another writer already applied these fills).
+    `flags` holds (is_builder, tainted, rowid); `buckets` maps
+    (resolution, bucket_ms, coin) to sums in BUCKET_COLUMNS order;
+    `checkpoints` holds (coin, time, tid, coin state).
+    """
+    placeholders = ", ".join("?" for _ in BUCKET_COLUMNS)
+    updates = ", ".join(f"{c} = {c} + excluded.{c}" for c in BUCKET_COLUMNS)
+    with self._lock, self._conn:
+      # Compare-and-set the cursor first, so the transaction holds the write lock from here on
+      if after_rowid:
+        moved = self._conn.execute(
+          "UPDATE aggregate_state SET target_builder = ?, last_rowid = ?, engine_state = ? "
+          "WHERE user = ? AND last_rowid = ?",
+          (target_builder, last_rowid, json.dumps(engine_state), user, after_rowid)
+        ).rowcount
+      else:
+        moved = self._conn.execute(
+          "INSERT OR IGNORE INTO aggregate_state VALUES (?, ?, ?, ?)",
+          (user, target_builder, last_rowid, json.dumps(engine_state))
+        ).rowcount
+      if not moved:
+        return False
+      self._conn.executemany("UPDATE fills SET is_builder = ?, tainted = ? WHERE rowid = ?", flags)
+      self._conn.executemany(
+        f"INSERT INTO fill_buckets VALUES (?, ?, ?, ?, {placeholders}) "
+        f"ON CONFLICT (user, resolution, bucket_ms, coin) DO UPDATE SET {updates}",
+        [(user, *key, *sums) for key, sums in buckets.items()]
+      )
+      self._conn.executemany(
+        "INSERT OR REPLACE INTO position_checkpoints VALUES (?, ?, ?, ?, ?)",
+        [(user, coin, time, tid, json.dumps(state)) for coin, time, tid, state in checkpoints]
+      )
+    return True
+
+  def position_resume(self, user, after, coin=None, to_ms=None, target_builder=None):
+    """
+    (per-coin FillEngine state, Fills oldest first) to rebuild positions past
+    the (time, tid) key `after`. Each coin resumes from its latest checkpoint
+    at or before `after`, or from its first fill if it has none, so only the
+    fills since that checkpoint are replayed.
+    """
+    checkpoint_sql = (
+      "SELECT coin, time, tid, state FROM ("
+      "  SELECT coin, time, tid, state, ROW_NUMBER() OVER (PARTITION BY coin ORDER BY time DESC, tid DESC) AS rank"
+      "  FROM position_checkpoints WHERE user = ? AND time <= ? AND (time, tid) <= (?, ?)"
+      ") WHERE rank = 1"
+    )
+    with self._lock:
+      row = self._conn.execute("SELECT engine_state FROM aggregate_state WHERE user = ?", (user,)).fetchone()
+      coins = [c for c in (json.loads(row[0]) if row else {}) if not coin or c == coin]
+      checkpoints = {
+        c: (time, tid, json.loads(state))
+        for c, time, tid, state in self._conn.execute(checkpoint_sql, (user, after[0], *after)).fetchall()
+      }
+      replay = []
+      for c in coins:
+        clauses = ["user = ?", "coin = ?", "time <= ?", "(time, tid) <= (?, ?)"]
+        params = [user, c, after[0], *after]
+        if c in checkpoints:
+          time, tid, _ = checkpoints[c]
+          clauses.append("time >= ? AND (time, tid) > (?, ?)")
+          params.extend([time, time, tid])
+        replay.extend(self._conn.execute(
+          f"SELECT {FILL_SELECT} FROM fills WHERE {' AND '.join(clauses)}", [target_builder] + params
+        ).fetchall())
+      clauses, params = self._range_filter(user, coin, after[0], to_ms)
+      clauses.append("(time, tid) > (?, ?)")
+      params.extend(after)
+      rows = self._conn.execute(
+        f"SELECT {FILL_SELECT} FROM fills WHERE {' AND '.join(clauses)} ORDER BY time, tid", [target_builder] + params
+      ).fetchall()
+    replay.sort(key=lambda r: (r[0], r[1]))
+    states = {c: state for c, (_, _, state) in checkpoints.items() if c in coins}
+    return states, _fills_from_rows(replay + rows)
+
+  def bucket_sums(self, user, coin, resolution, start_ms, end_ms):
+    """
+    BUCKET_COLUMNS summed over buckets starting in [start_ms, end_ms)
+    """
+    sql = (
+      f"SELECT {', '.join(f'COALESCE(SUM({c}), 0)' for c in BUCKET_COLUMNS)} FROM fill_buckets "
+      "WHERE user = ? AND resolution = ? AND bucket_ms >= ? AND bucket_ms < ?"
+    )
+    params = [user, resolution, start_ms, end_ms]
+    if coin:
+      sql += " AND coin = ?"
+      params.append(coin)
+    with self._lock:
+      return self._conn.execute(sql, params).fetchone()
+
+  def fill_sums(self, user, coin, start_ms, end_ms):
+    """
+    BUCKET_COLUMNS computed straight from the aggregated fills in [start_ms, end_ms),
+    for the partial buckets at a window's edges
+    """
+    pnl = "closed_pnl"
+    fee = "fee"
+    notional = "px * sz"
+    included = "(is_builder = 1 AND tainted = 0)"
+    sql = (
+      f"SELECT COALESCE(SUM({pnl}), 0), COALESCE(SUM({fee}), 0), COALESCE(SUM({notional}), 0), COUNT(*), "
+      f"COALESCE(SUM(CASE WHEN {included} THEN {pnl} END), 0), "
+      f"COALESCE(SUM(CASE WHEN {included} THEN {fee} END), 0), "
+      f"COALESCE(SUM(CASE WHEN {included} THEN {notional} END), 0), "
+      f"COALESCE(SUM({included}), 0), COALESCE(SUM(tainted), 0) "
+      "FROM fills WHERE user = ? AND time >= ? AND time < ?"
+    )
+    params = [user, start_ms, end_ms]
+    if coin:
+      sql += " AND coin = ?"
+      params.append(coin)
+    with self._lock:
+      return self._conn.execute(sql, params).fetchone()
+
+class StoredFillDataSource(BaseDataSource):
+  """
+  Serves fills from a SQLiteFillStore, only asking `upstream` for fills
+  at or after each user's high-water mark before answering. With a
+  BucketAggregator, new fills are also folded into the time buckets, and
+  with a SegmentCache they are appended to the shared columnar segments.
+  Ledger updates and funding payments are stored the same way, behind
+  their own high-water mark, for deposits and start-equity lookups.
+  With a FillArchive (written by backfill.py), a user's first sync loads
+  their archived fills and only asks upstream for what came after.
+  Fills are read back with is_target_builder decided against the upstream's target builder.
+  """
+  def __init__(self, upstream: BaseDataSource, store: SQLiteFillStore, aggregator=None, segments=None, archive=None):
+    self.upstream = upstream
+    self.store = store
+    self.target_builder = upstream.target_builder
+    self.aggregator = aggregator
+    self.segments = segments
+    self.archive = archive
+    self._sync_locks = {}
+    self._ledger_locks = {}
+
+  async def sync(self, user: str):
+    """
+    Pull fills newer than the stored high-water mark into the store
+    """
+    lock = self._sync_locks.setdefault(user, asyncio.Lock())
+    async with lock:
+      high_water_ms = await asyncio.to_thread(self.store.high_water_mark, user)
+      if high_water_ms is None and self.archive is not None:
+        high_water_ms = await asyncio.to_thread(self._load_archive, user)
+      # Re-request the high-water millisecond itself; tids already stored are ignored
+      new_fills = await self.upstream.get_user_fills(user, from_ms=high_water_ms or None)
+      if new_fills:
+        newest = max(f.time for f in new_fills)
+        await asyncio.to_thread(self.store.insert_fills, user, new_fills, newest)
+      await self._derive(user)
+
+  def _load_archive(self, user):
+    # Archived fills, memory-mapped from their day files, seed a user we've never synced
+    fills = self.archive.read_fills(user, target_builder=self.target_builder)
+    if not fills:
+      return None
+    newest = fills[-1].time
+    self.store.insert_fills(user, fills, newest)
+    return newest
+
+  async def ingest(self, user: str, fills):
+    """
+    Store fills pushed to us (e.g. over a websocket) without asking upstream
+    """
+    fills = [Fill.from_api(f, self.target_builder) for f in fills]
+    lock = self._sync_locks.setdefault(user, asyncio.Lock())
+    async with lock:
+      if fills:
+        newest = max(f.time for f in fills)
+        await asyncio.to_thread(self.store.insert_fills, user, fills, newest)
+      await self._derive(user)
+
+  async def _derive(self, user):
+    # Bring the buckets and segments up to date with the stored fills
+    if self.aggregator is not None:
+      await asyncio.to_thread(self.aggregator.update, user)
+    if self.segments is not None:
+      await asyncio.to_thread(self.segments.catch_up, user, self.store)
+
+  async def get_position_state(self, user: str, before_ms: int, coin: str = None):
+    # Checkpoints are written by the aggregator. No sync of its own: callers ask
+    # right after fetching the window's fills, which brought the store up to date
+    if self.aggregator is None:
+      return None
+    return await asyncio.to_thread(self.aggregator.position_state, user, before_ms, coin)
+
+  async def sync_ledger(self, user: str):
+    """
+    Pull ledger updates and funding payments newer than the stored ledger
+    high-water mark into the store. Returns False if upstream can't page
+    through ledgers, so there is nothing stored to answer from.
+    """
+    lock = self._ledger_locks.setdefault(user, asyncio.Lock())
+    async with lock:
+      high_water_ms = await asyncio.to_thread(self.store.ledger_high_water_mark, user)
+      # Re-request the high-water millisecond itself; updates already stored are ignored
+      updates = await self.upstream.get_ledger_updates(user, from_ms=high_water_ms or None)
+      if updates is None:
+        return False
+      if updates:
+        newest = max(u.get("time", 0) for u in updates)
+        await asyncio.to_thread(self.store.insert_ledger_updates, user, updates, newest)
+      return True
+
+  async def get_deposits(self, wallet_address, from_ms=None, to_ms=None):
+    if not await self.sync_ledger(wallet_address):
+      return await self.upstream.get_deposits(wallet_address, from_ms=from_ms, to_ms=to_ms)
+    return await asyncio.to_thread(self.store.ledger_updates, wallet_address, from_ms, to_ms, "deposit")
+
+  async def get_ledger_updates(self, user: str, from_ms: int = None, to_ms: int = None):
+    if not await self.sync_ledger(user):
+      return None
+    return await asyncio.to_thread(self.store.ledger_updates, user, from_ms, to_ms)
+
+  async def get_ledger_totals(self, user: str, timestamp_ms: int = None):
+    if not await self.sync_ledger(user):
+      return await self.upstream.get_ledger_totals(user, timestamp_ms)
+    return await asyncio.to_thread(self.store.ledger_totals, user, timestamp_ms)
+
+  async def get_account_value(self, user: str):
+    return await self.upstream.get_account_value(user)
+
+  async def get_user_fills(self, user: str, from_ms: int = None, to_ms: int = None, coin: str = None):
+    await self.sync(user)
+    return await asyncio.to_thread(self.store.query, user, coin, from_ms, to_ms, self.target_builder)
+
+  async def get_user_fill_frame(self, user: str, from_ms: int = None, to_ms: int = None, coin: str = None):
+    if self.segments is None:
+      return None
+    await self.sync(user)
+    return await asyncio.to_thread(self.segments.frame, user, self.target_builder, from_ms, to_ms, coin)
+
+  async def iter_user_fill_pages(self, user: str, from_ms: int = None, to_ms: int = None, coin: str = None):
+    await self.sync(user)
+    after = None
+    while True:
+      page = await asyncio.to_thread(
+        self.store.query_page, user, coin, from_ms, to_ms, after, target_builder=self.target_builder
+      )
+      if not page:
+        return
+      yield page
+      after = (page[-1].time, page[-1].tid)
+
+  async def get_fill_summary(
+    self, user: str, from_ms: int = None, to_ms: int = None, coin: str = None, builder_only: bool = False
+  ):
+    if self.aggregator is None:
+      return None
+    await self.sync(user)
+    return await asyncio.to_thread(self.aggregator.window, user, coin, from_ms, to_ms, builder_only)
+
+  async def get_position_resume(self, user: str, after, coin: str = None, to_ms: int = None):
+    # Checkpoints are written by the aggregator
+    if self.aggregator is None:
+      return None
+    await self.sync(user)
+    return await asyncio.to_thread(self.store.position_resume, user, after, coin, to_ms, self.target_builder)
+
+  async def get_equity_at_timestamp(self, user: str, timestamp_ms: int):
+    # Current account value minus every deposit, withdrawal, transfer and funding payment since
+    # timestamp_ms, read from the stored running totals
+    account_value, synced = await asyncio.gather(self.upstream.get_account_value(user), self.sync_ledger(user))
+    if account_value is None or not synced:
+      return await self.upstream.get_equity_at_timestamp(user, timestamp_ms)
+    change = await asyncio.to_thread(self.store.ledger_change_since, user, timestamp_ms)
+    return max(account_value - change, 0.0)
@@ -0,0 +1,110 @@
+import os
+import json
+import random
+import logging
+import threading
+import websocket
+from hyperliquid.utils import constants
+from hyperliquid.websocket_manager import WebsocketManager
+
+HL_WS_BASE_URL = os.getenv("HL_WS_BASE_URL", constants.MAINNET_API_URL)
+# Hyperliquid drops connections that stay silent for a minute
+HL_WS_PING_INTERVAL_S = float(os.getenv("HL_WS_PING_INTERVAL_S", 50))
+HL_WS_RECONNECT_BASE_S = float(os.getenv("HL_WS_RECONNECT_BASE_S", 1.0))
+HL_WS_RECONNECT_MAX_S = float(os.getenv("HL_WS_RECONNECT_MAX_S", 30.0))
+
+logger = logging.getLogger(__name__)
+
+class UserFillsWebsocketManager(WebsocketManager):
+  """
+  SDK WebsocketManager that subscribes to `userFills` for a set of users
+  and reconnects (re-subscribing all of them) whenever the connection drops.
+
+  Callbacks run on the websocket thread:
+    on_fills(user, fills, is_snapshot) for every userFills message; the first
+      message after each (re)subscribe is a snapshot of recent fills
+    on_connect() after every successful (re)connect
+  """
+  def __init__(self, base_url, on_fills, on_connect=None):
+    super().__init__(base_url)
+    self.daemon = True
+    self.ping_sender.daemon = True
+    self.ws_url = self.ws.url
+    self.on_fills = on_fills
+    self.on_connect = on_connect
+    self.users = set()
+    self.connects = 0
+    self._users_lock = threading.Lock()
+    self._stopped = threading.Event()
+
+  def run(self):
+    self.ping_sender.start()
+    attempt = 0
+    while not self._stopped.is_set():
+      connects = self.connects
+      self.ws = websocket.WebSocketApp(
+        self.ws_url, on_message=self.on_message, on_open=self.on_open, on_error=self.on_error
+      )
+      self.ws.run_forever()
+      self.ws_ready = False
+      if self._stopped.is_set():
+        break
+      attempt = 0 if self.connects > connects else attempt + 1
+      delay = random.uniform(0, min(HL_WS_RECONNECT_MAX_S, HL_WS_RECONNECT_BASE_S * 2 ** attempt))
+      logger.warning("websocket disconnected, reconnecting in %.1fs", delay)
+      self._stopped.wait(delay)
+
+  def stop(self):
+    self._stopped.set()
+    self.ws.close()
+
+  def send_ping(self):
+    while not self._stopped.wait(HL_WS_PING_INTERVAL_S):
+      if self.ws_ready:
+        self._send({"method": "ping"})
+
+  def _send(self, message):
+    try:
+      self.ws.send(json.dumps(message))
+    except (websocket.WebSocketException, OSError) as e:
+      # The run loop notices the broken connection and reconnects
+      logger.debug("websocket send failed: %r", e)
+
+  def on_open(self, _ws):
+    self.ws_ready = True
+    self.connects += 1
+    with self._users_lock:
+      users = list(self.users)
+    for user in users:
+      self._send({"method": "subscribe", "subscription": {"type": "userFills", "user": user}})
+    if self.on_connect is not None:
+      self.on_connect()
+
+  def on_error(self, _ws, error):
+    logger.warning("websocket error: %r", error)
+
+  def on_message(self, _ws, message):
+    if message == "Websocket connection established.":
+      return
+    ws_msg = json.loads(message)
+    if ws_msg.get("channel") != "userFills":
+      # pong, subscriptionResponse, ...
+      return
+    data = ws_msg["data"]
+    self.on_fills(data["user"], data.get("fills", []), bool(data.get("isSnapshot")))
+
+  def track(self, user):
+    with self._users_lock:
+      if user in self.users:
+        return
+      self.users.add(user)
+    if self.ws_ready:
+      self._send({"method": "subscribe", "subscription": {"type": "userFills", "user": user}})
+
+  def untrack(self, user):
+    with self._users_lock:
+      if user not in self.users:
+        return
+      self.users.discard(user)
+    if self.ws_ready:
+      self._send({"method": "unsubscribe", "subscription": {"type": "userFills", "user": user}})
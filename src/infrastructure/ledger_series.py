@@ -0,0 +1,109 @@
+from bisect import bisect_left
+from itertools import accumulate
+
+def _amount(delta, key):
+  return float(delta.get(key) or 0)
+
+def ledger_key(update):
+  """
+  (time, hash, type, coin) identifying one ledger update. Funding payments
+  for several coins share a time and a zero hash, so the coin is part of it.
+  """
+  delta = update.get("delta")
+  if not isinstance(delta, dict):
+    delta = {}
+  return update.get("time", 0), update.get("hash") or "", delta.get("type") or "", delta.get("coin") or ""
+
+def ledger_delta_usdc(update, user):
+  """
+  Change in the user's perp account value caused by one
+  userNonFundingLedgerUpdates or userFunding entry (its `delta` is an object keyed by type)
+  """
+  delta = update.get("delta", 0)
+  if not isinstance(delta, dict):
+    return float(delta or 0)
+
+  kind = delta.get("type")
+  if kind == "funding":
+    # Signed: negative when the user paid funding
+    return _amount(delta, "usdc")
+  if kind == "deposit":
+    return _amount(delta, "usdc")
+  if kind == "withdraw":
+    return -(_amount(delta, "usdc") + _amount(delta, "fee"))
+  if kind in ("internalTransfer", "subAccountTransfer"):
+    if delta.get("destination", "").lower() == user.lower():
+      return _amount(delta, "usdc")
+    return -(_amount(delta, "usdc") + _amount(delta, "fee"))
+  if kind == "accountClassTransfer":
+    # Moves between the user's own spot and perp balances
+    return _amount(delta, "usdc") if delta.get("toPerp") else -_amount(delta, "usdc")
+  if kind == "vaultDeposit":
+    return -_amount(delta, "usdc")
+  if kind == "vaultWithdraw":
+    return _amount(delta, "netWithdrawnUsd")
+  # Spot-only transfers, liquidations etc. don't move cash in or out of the perp account
+  return 0.0
+
+def ledger_flows(update, user):
+  """
+  (deposited, withdrawn, funding) for one update: cash moved into or out of
+  the perp account, or the funding it received (negative if paid)
+  """
+  amount = ledger_delta_usdc(update, user)
+  if ledger_key(update)[2] == "funding":
+    return 0.0, 0.0, amount
+  return max(amount, 0.0), max(-amount, 0.0), 0.0
+
+def ledger_change(before, after):
+  """
+  Net change in the perp account value between two get_ledger_totals results
+  """
+  return (
+    (after["deposited"] - before["deposited"]) - (after["withdrawn"] - before["withdrawn"])
+    + (after["funding"] - before["funding"])
+  )
+
+class LedgerSeries:
+  """
+  One user's ledger deltas in time order with running sums, so the net
+  change since any timestamp is a binary search instead of a re-sum.
+  Covers every update at or after `start_ms` that has been merged in.
+  """
+  __slots__ = ("start_ms", "times", "cumulative", "_keys", "_entries")
+
+  def __init__(self, start_ms):
+    self.start_ms = start_ms
+    self.times = []
+    self.cumulative = []
+    self._keys = set()
+    self._entries = []
+
+  @property
+  def last_ms(self):
+    return self.times[-1] if self.times else self.start_ms
+
+  def merge(self, updates, user):
+    """
+    Add fetched updates; ones already held (same ledger_key) are ignored
+    """
+    new = []
+    for update in updates:
+      key = ledger_key(update)
+      if key not in self._keys:
+        self._keys.add(key)
+        new.append((key[0], ledger_delta_usdc(update, user)))
+    if not new:
+      return
+    self._entries = sorted(self._entries + new, key=lambda entry: entry[0])
+    self.times = [t for t, _ in self._entries]
+    self.cumulative = list(accumulate(d for _, d in self._entries))
+
+  def change_since(self, timestamp_ms):
+    """
+    Net ledger change from timestamp_ms (inclusive) to the newest update
+    """
+    if not self.cumulative:
+      return 0.0
+    i = bisect_left(self.times, timestamp_ms)
+    return self.cumulative[-1] - (self.cumulative[i - 1] if i else 0.0)
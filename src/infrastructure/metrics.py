@@ -0,0 +1,142 @@
+import os
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Add a Server-Timing header with the per-stage breakdown to every response
+SERVER_TIMING = os.getenv("SERVER_TIMING", "false").lower() == "true"
+
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+BYTES_BUCKETS = tuple(256 * 4 ** i for i in range(10))  # 256B .. 64MiB
+COUNT_BUCKETS = (0, 10, 100, 1_000, 10_000, 100_000, 1_000_000)
+
+def _labels(names, values):
+  if not names:
+    return ""
+  escaped = (str(v).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n") for v in values)
+  return "{" + ",".join(f'{n}="{v}"' for n, v in zip(names, escaped)) + "}"
+
+class MetricsRegistry:
+  def __init__(self):
+    self.metrics = []
+
+  def register(self, metric):
+    self.metrics.append(metric)
+    return metric
+
+  def render(self):
+    """
+    Exposition lines (Prometheus text format) for every registered metric
+    """
+    lines = []
+    for metric in self.metrics:
+      lines.extend(metric.render())
+    return lines
+
+REGISTRY = MetricsRegistry()
+
+class Counter:
+  def __init__(self, name, help, labelnames=(), registry=REGISTRY):
+    self.name = name
+    self.help = help
+    self.labelnames = labelnames
+    self.values = {}
+    self._lock = threading.Lock()
+    registry.register(self)
+
+  def inc(self, *labels, amount=1):
+    with self._lock:
+      self.values[labels] = self.values.get(labels, 0) + amount
+
+  def render(self):
+    lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+    with self._lock:
+      for labels, value in self.values.items():
+        lines.append(f"{self.name}{_labels(self.labelnames, labels)} {value}")
+    return lines
+
+class Histogram:
+  def __init__(self, name, help, labelnames=(), buckets=SECONDS_BUCKETS, registry=REGISTRY):
+    self.name = name
+    self.help = help
+    self.labelnames = labelnames
+    self.buckets = buckets
+    self.series = {}  # labels -> [per-bucket counts (+Inf last), sum, count]
+    self._lock = threading.Lock()
+    registry.register(self)
+
+  def observe(self, value, *labels):
+    i = bisect_left(self.buckets, value)
+    with self._lock:
+      series = self.series.get(labels)
+      if series is None:
+        series = self.series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+      series[0][i] += 1
+      series[1] += value
+      series[2] += 1
+
+  def render(self):
+    lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+    names = self.labelnames + ("le",)
+    with self._lock:
+      for labels, (counts, total, count) in self.series.items():
+        cumulative = 0
+        for bound, n in zip(self.buckets + ("+Inf",), counts):
+          cumulative += n
+          lines.append(f"{self.name}_bucket{_labels(names, labels + (bound,))} {cumulative}")
+        lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {total}")
+        lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {count}")
+    return lines
+
+def sample_lines(name, help, samples, labelnames=(), metric_type="gauge"):
+  """
+  Exposition lines for a metric read at scrape time from (labels, value) pairs
+  """
+  lines = [f"# HELP {name} {help}", f"# TYPE {name} {metric_type}"]
+  lines.extend(f"{name}{_labels(labelnames, labels)} {value}" for labels, value in samples)
+  return lines
+
+# Hot-path metrics
+
+STAGE_SECONDS = Histogram(
+  "hl_stage_seconds", "Time spent per processing stage (fetch, parse, taint, aggregate, serialize, ...)", ("stage",)
+)
+UPSTREAM_REQUESTS = Counter("hl_upstream_requests_total", "Hyperliquid /info requests by type and status", ("type", "status"))
+UPSTREAM_SECONDS = Histogram("hl_upstream_request_seconds", "Hyperliquid /info latency by request type", ("type",))
+UPSTREAM_BYTES = Histogram(
+  "hl_upstream_response_bytes", "Hyperliquid /info response size by request type", ("type",), BYTES_BUCKETS
+)
+FILLS_PER_REQUEST = Histogram("hl_fills_per_request", "Fills processed per summarized request", buckets=COUNT_BUCKETS)
+HTTP_SECONDS = Histogram("http_request_seconds", "API request latency by route and status", ("route", "status"))
+HTTP_BYTES = Histogram("http_response_bytes", "API response body size by route", ("route",), BYTES_BUCKETS)
+
+# Per-request stage totals for Server-Timing; None outside a request
+_request_stages: ContextVar = ContextVar("request_stages", default=None)
+
+def begin_request_timing():
+  """
+  Start collecting stage totals for the current request; returns the dict they land in
+  """
+  stages = {}
+  _request_stages.set(stages)
+  return stages
+
+@contextmanager
+def timed(stage):
+  """
+  Time a block into hl_stage_seconds and the current request's Server-Timing totals
+  """
+  start = time.perf_counter()
+  try:
+    yield
+  finally:
+    elapsed = time.perf_counter() - start
+    STAGE_SECONDS.observe(elapsed, stage)
+    stages = _request_stages.get()
+    if stages is not None:
+      stages[stage] = stages.get(stage, 0.0) + elapsed
+
+def server_timing_header(stages):
+  return ", ".join(f"{stage};dur={seconds * 1000:.2f}" for stage, seconds in stages.items())
@@ -1,67 +1,332 @@
-import requests
+import os
+import time
+import random
+import asyncio
+import logging
+import httpx
+from collections import OrderedDict
+from dotenv import load_dotenv
 # from hyperliquid.info import Info
 # from hyperliquid.utils import constants
 from src.core.base import BaseDataSource
+from src.core.models import Fill
+from src.infrastructure.ledger_series import LedgerSeries, ledger_key
+from src.infrastructure.metrics import UPSTREAM_BYTES, UPSTREAM_REQUESTS, UPSTREAM_SECONDS
+from src.infrastructure.rate_limiter import TokenBucketRateLimiter, request_weight, response_weight
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+HL_INFO_URL = os.getenv("HL_INFO_URL", "https://api.hyperliquid.xyz/info")
+TARGET_BUILDER = os.getenv("TARGET_BUILDER")
+# userFills / userFillsByTime never return more than this many fills per response
+FILLS_PAGE_LIMIT = 2000
+# Most updates each ledger stream returns per response
+LEDGER_PAGE_LIMITS = {"userNonFundingLedgerUpdates": 2000, "userFunding": 500}
+# Ledger streams that move the perp account value, both paginated by time
+LEDGER_STREAMS = ("userNonFundingLedgerUpdates", "userFunding")
+# Number of disjoint time slices fetched in parallel by get_user_fills
+HL_FILL_SLICES = int(os.getenv("HL_FILL_SLICES", 1))
+# Retry policy for throttled (429) and failed (5xx / transport) requests
+HL_MAX_RETRIES = int(os.getenv("HL_MAX_RETRIES", 4))
+HL_BACKOFF_BASE_S = float(os.getenv("HL_BACKOFF_BASE_S", 0.5))
+HL_BACKOFF_MAX_S = float(os.getenv("HL_BACKOFF_MAX_S", 10.0))
+# Users whose ledger series are kept in memory for equity lookups
+LEDGER_CACHE_USERS = int(os.getenv("LEDGER_CACHE_USERS", 4096))
+
+def _http2_available():
+  try:
+    import h2  # noqa: F401
+  except ImportError:
+    return False
+  return True
+
+def create_http_client(
+  max_connections: int = None,
+  max_keepalive_connections: int = None,
+  keepalive_expiry: float = None,
+  timeout: float = None,
+  connect_timeout: float = None,
+  pool_timeout: float = None,
+  http2: bool = None,
+) -> httpx.AsyncClient:
+  """
+  Build the shared, long-lived client used for every /info call.
+  Anything not passed in falls back to the HL_* environment variables.
+  """
+  limits = httpx.Limits(
+    max_connections=max_connections or int(os.getenv("HL_MAX_CONNECTIONS", 100)),
+    max_keepalive_connections=max_keepalive_connections or int(os.getenv("HL_MAX_KEEPALIVE_CONNECTIONS", 20)),
+    keepalive_expiry=keepalive_expiry or float(os.getenv("HL_KEEPALIVE_EXPIRY", 30.0)),
+  )
+  timeouts = httpx.Timeout(
+    timeout or float(os.getenv("HL_TIMEOUT", 15.0)),
+    connect=connect_timeout or float(os.getenv("HL_CONNECT_TIMEOUT", 5.0)),
+    pool=pool_timeout or float(os.getenv("HL_POOL_TIMEOUT", 5.0)),
+  )
+
+  # HTTP/2 needs the optional `h2` package, fall back to HTTP/1.1 keep-alive without it
+  if http2 is None:
+    http2 = os.getenv("HL_HTTP2", "true").lower() != "false"
+  http2 = http2 and _http2_available()
+
+  return httpx.AsyncClient(limits=limits, timeout=timeouts, http2=http2)
+
+def _backoff_delay(attempt, retry_after=None):
+  # Full jitter keeps a burst of throttled callers from retrying in lockstep
+  delay = random.uniform(0, min(HL_BACKOFF_MAX_S, HL_BACKOFF_BASE_S * 2 ** attempt))
+  if retry_after:
+    try:
+      delay = max(delay, float(retry_after))
+    except ValueError:
+      pass
+  return delay
 
 class PublicHLDataSource(BaseDataSource):
-  def __init__(self, api_url="https://api.hyperliquid.xyz/info"):
+  def __init__(
+    self,
+    api_url=HL_INFO_URL,
+    client: httpx.AsyncClient = None,
+    rate_limiter: TokenBucketRateLimiter = None,
+    target_builder: str = TARGET_BUILDER,
+  ):
     self.url = api_url
+    self.target_builder = target_builder
+    # A client handed in (e.g. by the app lifespan) is shared and closed by its owner
+    self._owns_client = client is None
+    self.client = client or create_http_client()
+    self.rate_limiter = rate_limiter or TokenBucketRateLimiter()
+    self._ledgers = OrderedDict()  # user -> LedgerSeries, least recently used first
+    self._ledger_locks = {}
+
+  async def aclose(self):
+    if self._owns_client:
+      await self.client.aclose()
+
+  async def _post(self, payload: dict):
+    """
+    Rate-limited POST to /info, retrying 429/5xx and transport errors with backoff
+    """
+    request_type = payload.get("type")
+    for attempt in range(HL_MAX_RETRIES + 1):
+      await self.rate_limiter.acquire(request_weight(payload))
+      started = time.perf_counter()
+      try:
+        response = await self.client.post(self.url, json=payload)
+      except httpx.TransportError:
+        UPSTREAM_REQUESTS.inc(request_type, "error")
+        if attempt == HL_MAX_RETRIES:
+          raise
+        self.rate_limiter.retries += 1
+        await asyncio.sleep(_backoff_delay(attempt))
+        continue
+      UPSTREAM_SECONDS.observe(time.perf_counter() - started, request_type)
+      UPSTREAM_REQUESTS.inc(request_type, str(response.status_code))
+      UPSTREAM_BYTES.observe(len(response.content), request_type)
+
+      if (response.status_code == 429 or response.status_code >= 500) and attempt < HL_MAX_RETRIES:
+        self.rate_limiter.retries += 1
+        await asyncio.sleep(_backoff_delay(attempt, response.headers.get("Retry-After")))
+        continue
+
+      response.raise_for_status()
+      data = response.json()
+      self.rate_limiter.charge(response_weight(payload, data))
+      return data
 
   async def get_deposits(self, wallet_address, from_ms=None, to_ms=None):
     """
-    Fetch deposit history. 
-    Uses 'userNonFundingLedgerUpdates' for comprehensive history.
+    Fetch deposit history.
+    Pages through 'userNonFundingLedgerUpdates' and keeps the deposits.
+    """
+    updates = await self._collect_ledger_pages(wallet_address, "userNonFundingLedgerUpdates", from_ms, to_ms)
+    return [u for u in updates if ledger_key(u)[2] == "deposit"]
+
+  async def iter_ledger_pages(self, user: str, request_type: str, from_ms: int = None, to_ms: int = None):
+    """
+    Walk one of LEDGER_STREAMS forward from `from_ms`, yielding each page of
+    new updates (oldest first) as it arrives. Like iter_user_fill_pages,
+    every request restarts at the last returned update's timestamp and the
+    repeats are dropped by ledger_key.
     """
-    # For now, return empty or implement a placeholder to satisfy the ABC
-    return []
+    start_time = from_ms or 0
+    boundary_keys = set()
+
+    while True:
+      payload = {"type": request_type, "user": user, "startTime": start_time}
+      if to_ms:
+        payload["endTime"] = to_ms
+
+      page = await self._post(payload)
+      if not page:
+        return
+
+      page.sort(key=lambda u: u.get("time", 0))
+      new_updates = [u for u in page if ledger_key(u) not in boundary_keys]
+      if new_updates:
+        yield new_updates
+
+      if len(page) < LEDGER_PAGE_LIMITS[request_type]:
+        return
+
+      last_time = page[-1].get("time", 0)
+      if last_time <= start_time and not new_updates:
+        # A full page inside one millisecond, step past it rather than loop forever
+        logger.warning(
+          "more than %d fills for %s at %d ms; the rest of that millisecond is missing",
+          FILLS_PAGE_LIMIT, user, start_time,
+        )
+        last_time = start_time + 1
+        boundary_keys = set()
+      else:
+        boundary_keys = {ledger_key(u) for u in page if u.get("time") == last_time}
+      start_time = last_time
+
+  async def _collect_ledger_pages(self, user, request_type, from_ms, to_ms):
+    updates = []
+    async for page in self.iter_ledger_pages(user, request_type, from_ms=from_ms, to_ms=to_ms):
+      updates.extend(page)
+    return updates
+
+  async def get_ledger_updates(self, user: str, from_ms: int = None, to_ms: int = None):
+    # Both streams are paged through concurrently, then merged by time
+    streams = await asyncio.gather(
+      *(self._collect_ledger_pages(user, request_type, from_ms, to_ms) for request_type in LEDGER_STREAMS)
+    )
+    return sorted((u for updates in streams for u in updates), key=lambda u: u.get("time", 0))
+
+  async def get_account_value(self, user: str):
+    state_resp = await self._post({"type": "clearinghouseState", "user": user})
+    # Current equity is the 'marginSummary' account value
+    return float(state_resp.get('marginSummary', {}).get('accountValue', 0))
   
-  def get_user_fills(self, user: str, from_ms: int = None, to_ms: int = None):
-    # Use userFillsByTime if timestamps are provided
-    if from_ms:
+  async def iter_user_fill_pages(self, user: str, from_ms: int = None, to_ms: int = None, coin: str = None):
+    """
+    Walk userFillsByTime forward from `from_ms`, yielding each page of new
+    fills (sorted by time, then tid) as Fill records as soon as it arrives.
+
+    Every request restarts at the last returned fill's timestamp, so fills
+    sharing that millisecond come back twice and are dropped by (tid, hash).
+    The API can't page inside one millisecond: past a full page of fills
+    there, the rest of that millisecond is skipped with a warning.
+    """
+    start_time = from_ms or 0
+    boundary_keys = set()
+
+    while True:
       payload = {
         "type": "userFillsByTime",
         "user": user,
-        "startTime": from_ms
+        "startTime": start_time
       }
       if to_ms:
         payload["endTime"] = to_ms
-    else:
-      payload = {"type": "userFills", "user": user}
 
-    response = requests.post(self.url, json=payload)
-    return response.json()
+      page = await self._post(payload)
+      if not page:
+        return
+
+      page.sort(key=lambda f: (f.get("time", 0), f.get("tid", 0)))
+      new_fills = [f for f in page if (f.get("tid"), f.get("hash")) not in boundary_keys]
+      # The API can't filter by coin, so do it page by page
+      wanted = [f for f in new_fills if f.get("coin") == coin] if coin else new_fills
+      if wanted:
+        yield [Fill.from_api(f, self.target_builder) for f in wanted]
+
+      # A short page means we've reached the end of the window
+      if len(page) < FILLS_PAGE_LIMIT:
+        return
+
+      last_time = page[-1].get("time", 0)
+      if last_time <= start_time and not new_fills:
+        # A full page inside one millisecond, step past it rather than loop forever
+        logger.warning(
+          "more than %d fills for %s at %d ms; the rest of that millisecond is missing",
+          FILLS_PAGE_LIMIT, user, start_time,
+        )
+        last_time = start_time + 1
+        boundary_keys = set()
+      else:
+        boundary_keys = {(f.get("tid"), f.get("hash")) for f in page if f.get("time") == last_time}
+      start_time = last_time
+
+  async def _collect_fill_pages(self, user, from_ms, to_ms, coin=None):
+    fills = []
+    async for page in self.iter_user_fill_pages(user, from_ms=from_ms, to_ms=to_ms, coin=coin):
+      fills.extend(page)
+    return fills
+
+  async def get_user_fills(
+    self, user: str, from_ms: int = None, to_ms: int = None, coin: str = None, slices: int = None
+  ):
+    """
+    Full (paginated) fill history for the window, oldest first.
+    With `slices` > 1 the window is cut into disjoint ranges fetched in parallel.
+    """
+    slices = slices or HL_FILL_SLICES
+    if slices <= 1 or not from_ms:
+      return await self._collect_fill_pages(user, from_ms, to_ms, coin)
+
+    end_ms = to_ms or int(time.time() * 1000)
+    step = max((end_ms - from_ms) // slices, 1)
+    bounds = []
+    slice_start = from_ms
+    while slice_start <= end_ms:
+      slice_end = min(slice_start + step - 1, end_ms)
+      bounds.append((slice_start, slice_end))
+      slice_start = slice_end + 1
+
+    pages = await asyncio.gather(*(self._collect_fill_pages(user, s, e, coin) for s, e in bounds))
+    return [f for page in pages for f in page]
   
+  async def _ledger_series(self, user, from_ms):
+    """
+    The user's cached ledger series, extended to cover `from_ms` and topped
+    up with any updates since the newest one we have
+    """
+    lock = self._ledger_locks.setdefault(user, asyncio.Lock())
+    async with lock:
+      series = self._ledgers.get(user)
+      if series is None:
+        series = LedgerSeries(from_ms)
+        fetches = [(from_ms, None)]
+      else:
+        # Re-request the newest update's millisecond; updates already held are ignored
+        fetches = [(series.last_ms, None)]
+        if from_ms < series.start_ms:
+          fetches.append((from_ms, series.start_ms - 1))
+
+      for updates in await asyncio.gather(*(self.get_ledger_updates(user, start, end) for start, end in fetches)):
+        series.merge(updates, user)
+      series.start_ms = min(series.start_ms, from_ms)
+
+      self._ledgers[user] = series
+      self._ledgers.move_to_end(user)
+      while len(self._ledgers) > LEDGER_CACHE_USERS:
+        evicted, _ = self._ledgers.popitem(last=False)
+        self._ledger_locks.pop(evicted, None)
+      return series
+
   async def get_equity_at_timestamp(self, user: str, timestamp_ms: int):
     """
     Calculates historical equity by taking current state and reversing
     all ledger updates back to the target timestamp
     """
-    # 1. Get Current Equity (Margin Summary)
-    state_payload = {"type": "clearinghouseState", "user": user}
-    state_resp = requests.post(self.url, json=state_payload).json()
-    
-    # Current equity is the 'marginSummary' account value
-    current_equity = float(state_resp.get('marginSummary', {}).get('accountValue', 0))
-
-    # 2. Get Ledger Updates from timestamp_ms to now
-    # userNonFundingLedgerUpdates includes deposits, withdrawals, and transfers
-    ledger_payload = {
-      "type": "userNonFundingLedgerUpdates",
-      "user": user,
-      "startTime": timestamp_ms
-    }
-    ledger_resp = requests.post(self.url, json=ledger_payload).json()
-
-    # 3. Reverse the changes
-    # If someone deposited AFTER the timestamp, subtract it from current equity
-    # to find out what they had at the start.
-    delta = 0.0
-    for update in ledger_resp:
-      # The 'delta' field in the ledger update represents the change in account value
-      delta += float(update.get('delta', 0))
-
-    # 4. Final Calculation
+    # 1. Current equity (margin summary) and the ledger since timestamp_ms, fetched together.
+    # userNonFundingLedgerUpdates includes deposits, withdrawals, and transfers; userFunding the funding payments
+    current_equity, ledger = await asyncio.gather(
+      self.get_account_value(user),
+      self._ledger_series(user, timestamp_ms),
+    )
+
+    # 2. Reverse the changes
+    # If someone deposited (or was paid funding) AFTER the timestamp, subtract it
+    # from current equity to find out what they had at the start.
+    delta = ledger.change_since(timestamp_ms)
+
+    # 3. Final Calculation
     # Equity_Start = Equity_Now - Change_Since_Start
     equity_at_start = current_equity - delta
     
-    return max(equity_at_start, 0.0)
\ No newline at end of file
+    return max(equity_at_start, 0.0)
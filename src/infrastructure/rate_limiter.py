@@ -0,0 +1,107 @@
+import os
+import time
+import asyncio
+
+# Hyperliquid allows 1200 weight per minute per IP across all REST requests
+HL_WEIGHT_PER_MINUTE = int(os.getenv("HL_WEIGHT_PER_MINUTE", 1200))
+
+# Base weight per /info request type, anything not listed costs 20
+INFO_REQUEST_WEIGHTS = {
+  "clearinghouseState": 2,
+  "spotClearinghouseState": 2,
+  "allMids": 2,
+  "l2Book": 2,
+  "orderStatus": 2,
+  "exchangeStatus": 2,
+  "userRole": 60,
+}
+DEFAULT_INFO_WEIGHT = 20
+
+# List responses cost 1 extra weight per this many items returned
+ITEMS_PER_EXTRA_WEIGHT = {
+  "userFills": 20,
+  "userFillsByTime": 20,
+  "userFunding": 20,
+  "userNonFundingLedgerUpdates": 20,
+  "historicalOrders": 20,
+  "fundingHistory": 20,
+  "recentTrades": 20,
+  "candleSnapshot": 60,
+}
+
+def request_weight(payload: dict) -> int:
+  return INFO_REQUEST_WEIGHTS.get(payload.get("type"), DEFAULT_INFO_WEIGHT)
+
+def response_weight(payload: dict, response) -> int:
+  """
+  Extra weight charged after the fact for list-returning request types
+  """
+  per_item = ITEMS_PER_EXTRA_WEIGHT.get(payload.get("type"))
+  if not per_item or not isinstance(response, list):
+    return 0
+  return len(response) // per_item
+
+class TokenBucketRateLimiter:
+  """
+  Weighted token bucket shared by every upstream call.
+  Callers queue in FIFO order rather than failing when the bucket is empty.
+  """
+  def __init__(self, weight_per_minute=HL_WEIGHT_PER_MINUTE, capacity=None):
+    self.rate = weight_per_minute / 60.0
+    self.capacity = capacity or weight_per_minute
+    self.tokens = float(self.capacity)
+    self._updated = time.monotonic()
+    # asyncio.Lock wakes waiters in arrival order, which keeps the queue fair
+    self._lock = asyncio.Lock()
+
+    self.queue_depth = 0
+    self.max_queue_depth = 0
+    self.acquired = 0
+    self.total_wait_s = 0.0
+    self.max_wait_s = 0.0
+    self.retries = 0
+
+  def _refill(self):
+    now = time.monotonic()
+    self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+    self._updated = now
+
+  async def acquire(self, weight: int = 1):
+    weight = min(weight, self.capacity)
+    started = time.monotonic()
+    self.queue_depth += 1
+    self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+    try:
+      async with self._lock:
+        self._refill()
+        while self.tokens < weight:
+          await asyncio.sleep((weight - self.tokens) / self.rate)
+          self._refill()
+        self.tokens -= weight
+    finally:
+      self.queue_depth -= 1
+
+    waited = time.monotonic() - started
+    self.acquired += 1
+    self.total_wait_s += waited
+    self.max_wait_s = max(self.max_wait_s, waited)
+
+  def charge(self, weight: int):
+    """
+    Debit weight that is only known after the response arrives.
+    The bucket may go negative, which delays the next callers.
+    """
+    if weight > 0:
+      self._refill()
+      self.tokens -= weight
+
+  def stats(self):
+    return {
+      "queueDepth": self.queue_depth,
+      "maxQueueDepth": self.max_queue_depth,
+      "acquired": self.acquired,
+      "avgWaitMs": (self.total_wait_s / self.acquired * 1000) if self.acquired else 0.0,
+      "maxWaitMs": self.max_wait_s * 1000,
+      "tokens": self.tokens,
+      "retries": self.retries,
+    }
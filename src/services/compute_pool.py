@@ -0,0 +1,155 @@
+import os
+import heapq
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from src.core.models import to_fills
+from src.infrastructure.metrics import FILLS_PER_REQUEST, timed
+from src.services.fill_engine import FillReport
+from src.services.fill_frame import (
+  FillFrame, fill_report, report_rows, segment_lifecycles, summarize_fills, summarize_frame,
+)
+
+# Worker processes for metric computation (0 keeps everything on the event loop)
+COMPUTE_WORKERS = int(os.getenv("COMPUTE_WORKERS", min(4, os.cpu_count() or 1)))
+# Smaller fill sets are cheaper to compute inline than to ship to a worker
+COMPUTE_OFFLOAD_MIN_FILLS = int(os.getenv("COMPUTE_OFFLOAD_MIN_FILLS", 10000))
+
+def _pack_rows(rows, tids):
+  """
+  Response rows as (row class, (tid, *fields) tuples); tuples pickle far faster than
+  slotted dataclasses, and the fill's tid orders rows sharing a millisecond when merging
+  """
+  if not rows:
+    return None, []
+  row_cls = type(rows[0])
+  return row_cls, [
+    (tid, *(getattr(row, name) for name in row_cls.__slots__)) for tid, row in zip(tids.tolist(), rows)
+  ]
+
+def _summarize_batch(frame, builder_only, collect_trades, collect_positions, initial_state=None):
+  """
+  Worker entry point: one batch of coins as a FillFrame (and the state
+  they continue from) in, the report's totals plus packed trade and position rows out
+  """
+  report = FillReport()
+  lifecycles = segment_lifecycles(frame, initial_state)
+  fill_report(report, frame, lifecycles, builder_only, collect_trades, collect_positions)
+  included, position_rows = report_rows(frame, lifecycles, builder_only)
+  totals = (report.realized_pnl, report.fees_paid, report.volume, report.trade_count, report.tainted)
+  return totals, _pack_rows(report.trades, frame.tid[included]), _pack_rows(report.positions, frame.tid[position_rows])
+
+def _coin_batches(frame, n_batches):
+  """
+  Spread the frame's coins over at most n_batches sub-frames of similar
+  size (largest coin first)
+  """
+  counts = np.bincount(frame.coin_codes, minlength=len(frame.coins))
+  codes = [code for code in np.argsort(-counts, kind="stable").tolist() if counts[code]]
+  batches = [[] for _ in range(min(n_batches, len(codes)))]
+  sizes = [0] * len(batches)
+  for code in codes:
+    smallest = sizes.index(min(sizes))
+    batches[smallest].append(code)
+    sizes[smallest] += counts[code]
+  return [frame.select(np.isin(frame.coin_codes, batch)) for batch in batches]
+
+def _merge_rows(packed):
+  """
+  Merge each batch's packed rows (already in (time, tid) order) and rebuild
+  them, in the same (timeMs, tid) order as computing all coins in one pass
+  """
+  row_cls = next((cls for cls, _ in packed if cls is not None), None)
+  if row_cls is None:
+    return []
+  merged = heapq.merge(*(rows for _, rows in packed), key=lambda row: (row[1], row[0]))
+  return [row_cls(*row[1:]) for row in merged]
+
+def _merge_reports(results):
+  """
+  Combine per-coin results; coins are independent, so totals simply add up
+  """
+  merged = FillReport()
+  for (realized_pnl, fees_paid, volume, trade_count, tainted), _, _ in results:
+    merged.realized_pnl += realized_pnl
+    merged.fees_paid += fees_paid
+    merged.volume += volume
+    merged.trade_count += trade_count
+    merged.tainted = merged.tainted or tainted
+  merged.trades = _merge_rows([trades for _, trades, _ in results])
+  merged.positions = _merge_rows([positions for _, _, positions in results])
+  return merged
+
+class ComputePool:
+  """
+  Runs summarize_fills for large fill sets in a process pool so one big
+  account doesn't block the event loop. Position lifecycles and taint are
+  per coin, so a user's coins are split into batches computed in parallel.
+  Batches cross the process boundary as FillFrames, whose NumPy columns
+  pickle as flat buffers.
+  """
+  def __init__(self, workers=COMPUTE_WORKERS, min_fills=COMPUTE_OFFLOAD_MIN_FILLS):
+    self.workers = workers
+    self.min_fills = min_fills
+    self._executor = None
+
+  def start(self):
+    if self.workers > 0 and self._executor is None:
+      # Spawned workers don't inherit the server's threads, sockets or SQLite handles
+      self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+  def shutdown(self):
+    if self._executor is not None:
+      self._executor.shutdown(wait=False, cancel_futures=True)
+      self._executor = None
+
+  async def summarize_fills(
+    self,
+    fills,
+    target_builder,
+    builder_only=False,
+    coin=None,
+    collect_trades=False,
+    collect_positions=False,
+    initial_state=None,
+  ):
+    """
+    Same result as fill_frame.summarize_fills, computed off the event loop when it's worth it.
+    `fills` may also be a FillFrame, e.g. from the shared segment cache.
+    """
+    if isinstance(fills, FillFrame):
+      frame = fills.select(fills.coin_mask(coin)) if coin else fills
+      FILLS_PER_REQUEST.observe(len(frame))
+      if self._executor is None or len(frame) < self.min_fills:
+        return summarize_frame(frame, builder_only, collect_trades, collect_positions, initial_state)
+      return await self._offload(frame, builder_only, collect_trades, collect_positions, initial_state)
+
+    fills = to_fills(fills, target_builder)
+    if coin:
+      fills = [f for f in fills if f.coin == coin]
+    FILLS_PER_REQUEST.observe(len(fills))
+    if self._executor is None or len(fills) < self.min_fills:
+      return summarize_fills(
+        fills, target_builder, builder_only,
+        collect_trades=collect_trades, collect_positions=collect_positions, initial_state=initial_state,
+      )
+
+    with timed("parse"):
+      frame = FillFrame.from_fills(fills, target_builder)
+    return await self._offload(frame, builder_only, collect_trades, collect_positions, initial_state)
+
+  async def _offload(self, frame, builder_only, collect_trades, collect_positions, initial_state=None):
+    # Stages inside the workers aren't visible here, so the whole round trip is one stage
+    with timed("offload"):
+      loop = asyncio.get_running_loop()
+      futures = [
+        loop.run_in_executor(
+          self._executor, _summarize_batch, batch, builder_only, collect_trades, collect_positions, initial_state,
+        )
+        for batch in _coin_batches(frame, self.workers)
+      ]
+      return _merge_reports(await asyncio.gather(*futures))
+
+# Process-wide pool, started and shut down by the app lifespan
+compute_pool = ComputePool()
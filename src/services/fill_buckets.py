@@ -0,0 +1,143 @@
+import os
+from src.infrastructure.fill_store import BUCKET_COLUMNS
+from src.services.fill_engine import FillEngine, FillReport
+
+HOUR_MS = 3_600_000
+DAY_MS = 24 * HOUR_MS
+# Coarsest first: a window is covered by whole days, then whole hours, then raw fills
+BUCKET_RESOLUTIONS = (("day", DAY_MS), ("hour", HOUR_MS))
+# Exclusive end used for windows without toMs
+OPEN_END_MS = 2 ** 62
+# Save each coin's position state at every lifecycle close and at least every this many of its fills
+POSITION_CHECKPOINT_EVERY = int(os.getenv("POSITION_CHECKPOINT_EVERY", 1000))
+
+def split_window(from_ms=None, to_ms=None):
+  """
+  Cover the inclusive [from_ms, to_ms] window with as few whole buckets as
+  possible. Returns (resolution, start_ms, end_ms) segments with an exclusive
+  end; resolution is None for the partial edges that need a raw fill scan.
+  """
+  segments = []
+
+  def cover(lo, hi, levels):
+    if lo >= hi:
+      return
+    if not levels:
+      segments.append((None, lo, hi))
+      return
+    (resolution, size), finer = levels[0], levels[1:]
+    first = -(-lo // size) * size
+    last = hi // size * size
+    if first >= last:
+      cover(lo, hi, finer)
+      return
+    cover(lo, first, finer)
+    segments.append((resolution, first, last))
+    cover(last, hi, finer)
+
+  cover(from_ms or 0, to_ms + 1 if to_ms else OPEN_END_MS, BUCKET_RESOLUTIONS)
+  return segments
+
+class BucketAggregator:
+  """
+  Maintains per-user, per-coin hourly and daily sums of realized PnL, fees,
+  volume and trade count (all fills and untainted builder fills) in the fill
+  store, so a window query sums a handful of buckets instead of every fill.
+
+  Taint is decided by streaming each user's full stored history through a
+  FillEngine, whose state is persisted so later syncs only process new fills.
+  The same pass checkpoints each coin's position state, so positions history
+  from a point in time replays a bounded number of fills.
+  """
+  def __init__(self, store, target_builder, checkpoint_every=POSITION_CHECKPOINT_EVERY):
+    self.store = store
+    self.target_builder = target_builder
+    self.checkpoint_every = checkpoint_every
+
+  def update(self, user):
+    """
+    Fold fills stored since the last call into the buckets (blocking; run in a thread).
+    Workers sharing the store take turns per user, so each fill is added once.
+    """
+    with self.store.aggregation_lock(user):
+      self._update(user)
+
+  def _update(self, user):
+    last_rowid, engine_state = self.store.aggregate_state(user, self.target_builder)
+    pending = self.store.unaggregated_fills(user, last_rowid, self.target_builder)
+    if not pending:
+      return
+
+    engine = FillEngine(self.target_builder)
+    engine.restore_state(engine_state)
+    flags = []
+    buckets = {}
+    checkpoints = []
+    for rowid, fill in pending:
+      processed = engine.feed(fill)
+      record = processed.record
+      included = record.is_target_builder and not processed.tainted
+      flags.append((int(record.is_target_builder), int(processed.tainted), rowid))
+      if processed.net_size == 0 or engine.states[record.coin].fill_count % self.checkpoint_every == 0:
+        checkpoints.append((record.coin, record.time, record.tid, engine.coin_state(record.coin)))
+
+      notional = record.px * record.sz
+      delta = (
+        record.closed_pnl, record.fee, notional, 1,
+        record.closed_pnl if included else 0.0,
+        record.fee if included else 0.0,
+        notional if included else 0.0,
+        int(included),
+        int(processed.tainted),
+      )
+      for resolution, size in BUCKET_RESOLUTIONS:
+        key = (resolution, record.time // size * size, record.coin)
+        sums = buckets.get(key)
+        if sums is None:
+          buckets[key] = list(delta)
+        else:
+          for i, value in enumerate(delta):
+            sums[i] += value
+
+    # Under the lock the cursor can't have moved; if it somehow did, the other writer's sums stand
+    self.store.apply_aggregates(
+      user, self.target_builder, last_rowid, max(rowid for rowid, _ in pending), engine.export_state(),
+      flags, buckets, checkpoints,
+    )
+
+  def position_state(self, user, before_ms, coin=None):
+    """
+    Per-coin FillEngine state after every stored fill before before_ms:
+    the latest checkpoints plus the fills since them
+    """
+    states, fills = self.store.position_resume(user, (before_ms, -1), coin, before_ms - 1, self.target_builder)
+    engine = FillEngine(self.target_builder)
+    engine.restore_state(states)
+    for fill in fills:
+      if fill.time < before_ms:
+        engine.feed(fill)
+    return engine.export_state()
+
+  def window(self, user, coin=None, from_ms=None, to_ms=None, builder_only=False):
+    """
+    FillReport aggregates for the window, built from whole buckets plus edge scans
+    """
+    totals = [0] * len(BUCKET_COLUMNS)
+    for resolution, start_ms, end_ms in split_window(from_ms, to_ms):
+      if resolution is None:
+        sums = self.store.fill_sums(user, coin, start_ms, end_ms)
+      else:
+        sums = self.store.bucket_sums(user, coin, resolution, start_ms, end_ms)
+      for i, value in enumerate(sums):
+        totals[i] += value
+
+    (pnl, fees, volume, count, builder_pnl, builder_fees, builder_volume, builder_count, tainted) = totals
+    if builder_only:
+      pnl, fees, volume, count = builder_pnl, builder_fees, builder_volume, builder_count
+    return FillReport(
+      realized_pnl=float(pnl),
+      fees_paid=float(fees),
+      volume=float(volume),
+      trade_count=int(count),
+      tainted=tainted > 0,
+    )
@@ -0,0 +1,236 @@
+from dataclasses import asdict, dataclass, field
+from typing import Optional
+from src.core.models import BuilderPositionSnapshot, Fill, PositionSnapshot, TradeRow, decimal_str, to_fills
+
+def trade_row(fill, tainted):
+  """
+  /v1/trades row from a Fill
+  """
+  return TradeRow(
+    timeMs=fill.time,
+    coin=fill.coin,
+    side=fill.side,
+    px=decimal_str(fill.px),
+    sz=decimal_str(fill.sz),
+    fee=decimal_str(fill.fee),
+    closedPnl=decimal_str(fill.closed_pnl),
+    builder=fill.builder,
+    is_target_builder=fill.is_target_builder,
+    tainted=tainted,
+  )
+
+def position_snapshot(time_ms, coin, net_size, avg_entry_px, builder_only, tainted):
+  """
+  /v1/positions/history row
+  """
+  avg_entry = str(avg_entry_px) if net_size != 0 else "0"
+  if builder_only:
+    return BuilderPositionSnapshot(time_ms, coin, str(net_size), avg_entry, tainted)
+  return PositionSnapshot(time_ms, coin, str(net_size), avg_entry)
+
+def starts_lifecycle(prev_position, start, end):
+  """
+  Whether a fill taking a coin from `start` to `end` opens a new lifecycle,
+  given where the coin's previous fill left it (0 before its first fill).
+  Works elementwise on NumPy arrays too, so FillFrame applies the same rule
+  """
+  return (prev_position == 0) | (start == 0) | (start * end < 0)
+
+@dataclass(slots=True)
+class ProcessedFill:
+  """
+  One fill plus the position/taint state right after it
+  """
+  record: Fill
+  net_size: float
+  avg_entry_px: float
+  lifecycle_id: int
+  tainted: bool
+  included: bool  # counts towards the aggregates in the requested mode
+
+  def trade_row(self):
+    return trade_row(self.record, self.tainted)
+
+  def position_snapshot(self, builder_only):
+    return position_snapshot(
+      self.record.time, self.record.coin, self.net_size, self.avg_entry_px, builder_only, self.tainted
+    )
+
+@dataclass(slots=True)
+class _CoinState:
+  position: Optional[float] = None  # None until the coin's first fill
+  lifecycle_id: int = 0
+  has_builder: bool = False
+  has_non_builder: bool = False
+  total_cost: float = 0.0
+  avg_entry_px: float = 0.0
+  fill_count: int = 0
+
+class FillEngine:
+  """
+  Streams a user's fills (oldest first) through per-coin position state,
+  computing taint, position snapshots and running aggregates in one pass.
+
+  A position lifecycle starts when a coin's position opens from zero (or
+  flips sign) and ends when it returns to zero. A lifecycle is tainted from
+  the first moment it has seen both target-builder and other fills.
+  """
+  def __init__(self, target_builder, builder_only=False, coin=None):
+    self.target_builder = target_builder
+    self.builder_only = builder_only
+    self.coin = coin
+    self.states = {}
+    self.reset_totals()
+
+  def reset_totals(self):
+    """
+    Zero the running aggregates, keeping the position state
+    """
+    self.realized_pnl = 0.0
+    self.fees_paid = 0.0
+    self.volume = 0.0
+    self.trade_count = 0
+    self.tainted = False
+
+  def export_state(self):
+    """
+    Per-coin position/taint state as plain dicts, so a later engine can resume
+    """
+    return {coin: asdict(state) for coin, state in self.states.items()}
+
+  def coin_state(self, coin):
+    return asdict(self.states[coin])
+
+  def restore_state(self, states):
+    self.states = {coin: _CoinState(**state) for coin, state in states.items()}
+
+  def feed(self, fill) -> Optional[ProcessedFill]:
+    """
+    Process one fill (a Fill or a raw API dict), returning None if it is for another coin
+    """
+    record = fill if isinstance(fill, Fill) else Fill.from_api(fill, self.target_builder)
+    if self.coin and record.coin != self.coin:
+      return None
+
+    state = self.states.get(record.coin)
+    if state is None:
+      state = self.states[record.coin] = _CoinState()
+
+    # startPosition from the API is authoritative, else continue our running position
+    start = record.start_position
+    if start is None:
+      start = state.position or 0.0
+    end = start + record.sz if record.side == "B" else start - record.sz
+
+    if starts_lifecycle(state.position or 0.0, start, end):
+      # Opening, flipping, or joining a position mid-lifecycle: entry is this fill's price
+      state.lifecycle_id += 1
+      state.has_builder = False
+      state.has_non_builder = False
+      state.total_cost = record.px * abs(end)
+      state.avg_entry_px = record.px
+    elif abs(end) > abs(start):
+      # Adding to position
+      state.total_cost += record.px * record.sz
+      state.avg_entry_px = state.total_cost / abs(end)
+    else:
+      # Reducing: average entry stays the same
+      state.total_cost = state.avg_entry_px * abs(end)
+    state.position = end
+    state.fill_count += 1
+
+    if record.is_target_builder:
+      state.has_builder = True
+    else:
+      state.has_non_builder = True
+    tainted = state.has_builder and state.has_non_builder
+    self.tainted = self.tainted or tainted
+
+    included = not self.builder_only or (record.is_target_builder and not tainted)
+    if included:
+      self.realized_pnl += record.closed_pnl
+      self.fees_paid += record.fee
+      self.volume += record.px * record.sz
+      self.trade_count += 1
+
+    return ProcessedFill(
+      record=record,
+      net_size=end,
+      avg_entry_px=state.avg_entry_px if end != 0 else 0.0,
+      lifecycle_id=state.lifecycle_id,
+      tainted=tainted,
+      included=included,
+    )
+
+@dataclass(slots=True)
+class FillReport:
+  realized_pnl: float = 0.0
+  fees_paid: float = 0.0
+  volume: float = 0.0
+  trade_count: int = 0
+  tainted: bool = False
+  trades: list = field(default_factory=list)
+  positions: list = field(default_factory=list)
+
+def sort_fills(fills):
+  return sorted(fills, key=lambda f: (f.time, f.tid))
+
+def process_fills(
+  fills,
+  target_builder,
+  builder_only=False,
+  coin=None,
+  collect_trades=False,
+  collect_positions=False,
+  engine_state=None,
+  after=None,
+):
+  """
+  Run a user's fills through a FillEngine once and gather everything the
+  endpoints need: aggregates, trade rows and/or position snapshots.
+
+  To resume, pass the engine_state the fills continue from; fills up to the
+  (time, tid) key `after` then only bring that state forward.
+  """
+  engine = FillEngine(target_builder, builder_only, coin)
+  if engine_state:
+    engine.restore_state(engine_state)
+  report = FillReport()
+
+  records = sort_fills(to_fills(fills, target_builder))
+  start = 0
+  if after is not None:
+    while start < len(records) and (records[start].time, records[start].tid) <= after:
+      engine.feed(records[start])
+      start += 1
+    engine.reset_totals()
+
+  for fill in records[start:]:
+    processed = engine.feed(fill)
+    if processed is None:
+      continue
+    if collect_trades and processed.included:
+      report.trades.append(processed.trade_row())
+    # Builder-only history shows the builder's fills, flagged if their lifecycle is tainted
+    if collect_positions and (not builder_only or processed.record.is_target_builder):
+      report.positions.append(processed.position_snapshot(builder_only))
+
+  report.realized_pnl = engine.realized_pnl
+  report.fees_paid = engine.fees_paid
+  report.volume = engine.volume
+  report.trade_count = engine.trade_count
+  report.tainted = engine.tainted
+  return report
+
+async def stream_processed_fills(pages, target_builder, builder_only=False, coin=None, engine_state=None):
+  """
+  Feed an async iterator of fill pages (oldest first) through a FillEngine,
+  optionally resumed from engine_state, yielding each page's ProcessedFills
+  so memory stays bounded by the page size
+  """
+  engine = FillEngine(target_builder, builder_only, coin)
+  if engine_state:
+    engine.restore_state(engine_state)
+  async for page in pages:
+    processed = [engine.feed(fill) for fill in page]
+    yield [p for p in processed if p is not None]
@@ -0,0 +1,398 @@
+import numpy as np
+from dataclasses import dataclass
+from src.infrastructure.metrics import timed
+from src.core.models import TradeRow, decimal_str, to_fills
+from src.services.fill_engine import FillReport, position_snapshot, starts_lifecycle
+
+SIDE_BUY = 1
+SIDE_SELL = -1
+
+class FillFrame:
+  """
+  Columnar (NumPy) view of a user's fills, sorted by (time, tid), so
+  metrics run as vectorized reductions instead of per-fill loops
+  """
+  __slots__ = (
+    "time", "tid", "px", "sz", "fee", "closed_pnl", "start_position",
+    "side", "coin_codes", "coins", "is_builder", "builders",
+  )
+
+  def __init__(
+    self, time, tid, px, sz, fee, closed_pnl, start_position, side, coin_codes, coins, is_builder, builders
+  ):
+    self.time = time
+    self.tid = tid
+    self.px = px
+    self.sz = sz
+    self.fee = fee
+    self.closed_pnl = closed_pnl
+    self.start_position = start_position  # NaN where the API didn't send one
+    self.side = side  # int8, +1 buy / -1 sell
+    self.coin_codes = coin_codes  # index into `coins`
+    self.coins = coins  # categorical labels
+    self.is_builder = is_builder
+    self.builders = builders  # object array of builder addresses (or None), for trade rows
+
+  @classmethod
+  def from_fills(cls, fills, target_builder):
+    """
+    Frame over Fill records; raw API dicts are parsed first, using
+    `target_builder` for their builder flag
+    """
+    fills = sorted(to_fills(fills, target_builder), key=lambda f: (f.time, f.tid))
+    n = len(fills)
+
+    coin_index = {}
+    coin_codes = np.empty(n, dtype=np.int32)
+    for i, f in enumerate(fills):
+      coin_codes[i] = coin_index.setdefault(f.coin, len(coin_index))
+
+    def column(name):
+      return np.fromiter((getattr(f, name) for f in fills), dtype=np.float64, count=n)
+
+    builders = np.empty(n, dtype=object)
+    builders[:] = [f.builder for f in fills]
+
+    nan = float("nan")
+    return cls(
+      time=np.fromiter((f.time for f in fills), dtype=np.int64, count=n),
+      tid=np.fromiter((f.tid for f in fills), dtype=np.int64, count=n),
+      px=column("px"),
+      sz=column("sz"),
+      fee=column("fee"),
+      closed_pnl=column("closed_pnl"),
+      start_position=np.fromiter(
+        (f.start_position if f.start_position is not None else nan for f in fills), dtype=np.float64, count=n
+      ),
+      side=np.fromiter((SIDE_BUY if f.side == "B" else SIDE_SELL for f in fills), dtype=np.int8, count=n),
+      coin_codes=coin_codes,
+      coins=list(coin_index),
+      is_builder=np.fromiter((f.is_target_builder for f in fills), dtype=bool, count=n),
+      builders=builders,
+    )
+
+  def __len__(self):
+    return len(self.time)
+
+  def select(self, mask):
+    """
+    New frame holding only the rows where `mask` is True
+    """
+    return FillFrame(
+      self.time[mask], self.tid[mask], self.px[mask], self.sz[mask], self.fee[mask],
+      self.closed_pnl[mask], self.start_position[mask], self.side[mask],
+      self.coin_codes[mask], self.coins, self.is_builder[mask], self.builders[mask],
+    )
+
+  def window(self, from_ms=None, to_ms=None):
+    """
+    Rows with time in [from_ms, to_ms], as views of this frame's columns
+    """
+    start = int(np.searchsorted(self.time, from_ms, "left")) if from_ms else 0
+    end = int(np.searchsorted(self.time, to_ms, "right")) if to_ms else len(self)
+    return self.select(slice(start, end))
+
+  def coin_mask(self, coin):
+    if coin not in self.coins:
+      return np.zeros(len(self), dtype=bool)
+    return self.coin_codes == self.coins.index(coin)
+
+  # Reductions, each optionally restricted to a boolean mask
+
+  def notional(self):
+    return self.px * self.sz
+
+  def volume(self, mask=None):
+    return float(self.notional().sum() if mask is None else self.notional()[mask].sum())
+
+  def realized_pnl(self, mask=None):
+    return float(self.closed_pnl.sum() if mask is None else self.closed_pnl[mask].sum())
+
+  def fees(self, mask=None):
+    return float(self.fee.sum() if mask is None else self.fee[mask].sum())
+
+  def per_coin(self, values, mask=None):
+    """
+    Sum `values` per coin with a single bincount
+    """
+    codes = self.coin_codes if mask is None else self.coin_codes[mask]
+    weights = values if mask is None else values[mask]
+    sums = np.bincount(codes, weights=weights, minlength=len(self.coins))
+    return {coin: float(sums[i]) for i, coin in enumerate(self.coins)}
+
+  def trade_counts_per_coin(self):
+    counts = np.bincount(self.coin_codes, minlength=len(self.coins))
+    return {coin: int(counts[i]) for i, coin in enumerate(self.coins)}
+
+  # Positions
+
+  def signed_size(self):
+    return self.side * self.sz
+
+  def cumulative_position(self):
+    """
+    Running position per coin from the signed sizes alone
+    """
+    signed = self.signed_size()
+    running = np.empty_like(signed)
+    # One cumsum per coin (coins are few) keeps the float sums sequential, like a Python loop
+    for code in range(len(self.coins)):
+      mask = self.coin_codes == code
+      running[mask] = np.cumsum(signed[mask])
+    return running
+
+  def end_position(self):
+    """
+    Position after each fill: startPosition + signed size, continuing the
+    coin's running position where the API didn't send startPosition
+    """
+    order = np.argsort(self.coin_codes, kind="stable")
+    end = np.empty(len(self))
+    end[order] = _end_positions(
+      self.coin_codes[order], self.start_position[order], self.signed_size()[order], np.zeros(len(self.coins))
+    )
+    return end
+
+def _end_positions(codes, start, signed, seed_position):
+  """
+  Position after each fill of coin-grouped columns, summed the way
+  FillEngine.feed does: from startPosition when the API sent it, else from
+  the previous fill's end (the coin's seed position for its first fill).
+  Runs without startPosition are summed in order, so the floats match the engine's
+  """
+  n = len(codes)
+  first_of_coin = np.r_[True, codes[1:] != codes[:-1]] if n else np.zeros(0, dtype=bool)
+  missing = np.isnan(start)
+  base = np.where(missing, 0.0, start)
+  base[first_of_coin & missing] = seed_position[codes[first_of_coin & missing]]
+  end = base + signed
+  # Fills continuing from the fill before them
+  chained = missing & ~first_of_coin
+  if chained.any():
+    run_starts = np.flatnonzero(chained & ~np.r_[False, chained[:-1]])
+    run_ends = np.flatnonzero(chained & ~np.r_[chained[1:], False]) + 1
+    for a, b in zip(run_starts.tolist(), run_ends.tolist()):
+      end[a - 1:b] = np.cumsum(np.r_[end[a - 1], signed[a:b]])
+  return end
+
+@dataclass(slots=True)
+class LifecycleColumns:
+  """
+  Per-fill position lifecycle state, aligned with the frame's rows
+  """
+  net_size: np.ndarray
+  avg_entry_px: np.ndarray
+  lifecycle_id: np.ndarray  # 1-based, counted per coin
+  tainted: np.ndarray
+
+def _seed_columns(frame, initial_state):
+  """
+  Per-coin-code arrays of FillEngine state (export_state dicts) the frame's fills continue from
+  """
+  n_coins = len(frame.coins)
+  seed = {
+    "position": np.zeros(n_coins), "lifecycle_id": np.zeros(n_coins, dtype=np.int64),
+    "has_builder": np.zeros(n_coins, dtype=bool), "has_non_builder": np.zeros(n_coins, dtype=bool),
+    "total_cost": np.zeros(n_coins), "avg_entry_px": np.zeros(n_coins),
+  }
+  for code, coin in enumerate(frame.coins):
+    state = (initial_state or {}).get(coin)
+    if state is None:
+      continue
+    for name, column in seed.items():
+      column[code] = state[name] or 0
+  return seed
+
+def segment_lifecycles(frame: FillFrame, initial_state=None) -> LifecycleColumns:
+  """
+  Split every coin's fills into position lifecycles and derive each fill's
+  net size, average entry price and taint in bulk.
+
+  Same rules as FillEngine: a lifecycle starts at a coin's first fill, after
+  the position returns to zero, or when it flips sign; it is tainted from the
+  first fill by which it has seen both target-builder and other fills.
+  With `initial_state` (per-coin FillEngine state from earlier fills), each
+  coin continues its open lifecycle instead of starting a new one.
+  """
+  n = len(frame)
+  seed = _seed_columns(frame, initial_state)
+  # Group each coin's fills together, keeping time order inside a coin
+  order = np.argsort(frame.coin_codes, kind="stable")
+  codes = frame.coin_codes[order]
+  start = frame.start_position[order]
+  end = _end_positions(codes, start, frame.signed_size()[order], seed["position"])
+  px = frame.px[order]
+  sz = frame.sz[order]
+  is_builder = frame.is_builder[order]
+
+  first_of_coin = np.r_[True, codes[1:] != codes[:-1]] if n else np.zeros(0, dtype=bool)
+  prev_end = np.r_[0.0, end[:-1]] if n else end
+  prev_end[first_of_coin] = seed["position"][codes[first_of_coin]]
+  # Without startPosition from the API, a fill starts where the coin's previous one ended
+  start = np.where(np.isnan(start), prev_end, start)
+  new_lifecycle = starts_lifecycle(prev_end, start, end)
+  # A coin's first fill continuing a seeded lifecycle
+  continued = first_of_coin & ~new_lifecycle
+
+  idx = np.arange(n)
+  lifecycle_start = np.maximum.accumulate(np.where(new_lifecycle | first_of_coin, idx, 0)) if n else idx
+
+  # Lifecycle ids are counted per coin, after the seeded ones
+  running_id = np.cumsum(new_lifecycle)
+  coin_start = np.maximum.accumulate(np.where(first_of_coin, idx, 0)) if n else idx
+  lifecycle_id = seed["lifecycle_id"][codes] + running_id - running_id[coin_start] + new_lifecycle[coin_start]
+
+  # Tainted once both kinds of fill have appeared since the lifecycle began (seeded flags included)
+  in_seeded = continued[lifecycle_start] if n else continued
+  last_builder = np.maximum.accumulate(np.where(is_builder, idx, -1)) if n else idx
+  last_other = np.maximum.accumulate(np.where(~is_builder, idx, -1)) if n else idx
+  tainted = (
+    ((last_builder >= lifecycle_start) | (in_seeded & seed["has_builder"][codes]))
+    & ((last_other >= lifecycle_start) | (in_seeded & seed["has_non_builder"][codes]))
+  )
+
+  abs_end = np.abs(end)
+  is_add = ~new_lifecycle & (abs_end > np.abs(start))
+  avg_entry_px = _entry_prices(
+    new_lifecycle, is_add, continued, px, sz, abs_end,
+    seed["total_cost"][codes], seed["avg_entry_px"][codes],
+  )
+  avg_entry_px[end == 0] = 0.0
+
+  # Scatter back from coin-grouped order to the frame's time order
+  result = LifecycleColumns(
+    net_size=np.empty(n), avg_entry_px=np.empty(n), lifecycle_id=np.empty(n, dtype=np.int64),
+    tainted=np.empty(n, dtype=bool),
+  )
+  result.net_size[order] = end
+  result.avg_entry_px[order] = avg_entry_px
+  result.lifecycle_id[order] = lifecycle_id
+  result.tainted[order] = tainted
+  return result
+
+def _entry_prices(new_lifecycle, is_add, continued, px, sz, abs_end, seed_cost, seed_px):
+  """
+  Average entry price per fill (coin-grouped order).
+
+  The price only moves when a lifecycle starts or the position grows, and
+  each move depends on the previous one, so only those fills are walked;
+  reductions carry the last price forward with a vectorized fill. Doing the
+  recurrence in the same float order as FillEngine keeps results identical.
+  A `continued` fill picks up the seeded cost basis first.
+  """
+  n = len(px)
+  moved = new_lifecycle | is_add | continued
+  moves = np.flatnonzero(moved)
+  move_px = np.empty(n)
+
+  starts = new_lifecycle[moves].tolist()
+  adds = is_add[moves].tolist()
+  seeds = continued[moves].tolist()
+  seed_cost_l, seed_px_l = seed_cost[moves].tolist(), seed_px[moves].tolist()
+  px_l, sz_l, end_l = px[moves].tolist(), sz[moves].tolist(), abs_end[moves].tolist()
+  # Position size just before each move, needed when a reduction preceded it
+  prev_end_l = abs_end[np.maximum(moves - 1, 0)].tolist()
+  moves_l = moves.tolist()
+
+  total_cost = 0.0
+  avg = 0.0
+  last = -2
+  for k, i in enumerate(moves_l):
+    if starts[k]:
+      total_cost = px_l[k] * end_l[k]
+      avg = px_l[k]
+    else:
+      if seeds[k]:
+        total_cost = seed_cost_l[k]
+        avg = seed_px_l[k]
+      elif last != i - 1:
+        # Reductions since the last move rescaled the cost basis at the same price
+        total_cost = avg * prev_end_l[k]
+      if adds[k]:
+        total_cost += px_l[k] * sz_l[k]
+        avg = total_cost / end_l[k]
+      else:
+        # A continued fill that reduces keeps the seeded price
+        total_cost = avg * end_l[k]
+    move_px[i] = avg
+    last = i
+
+  idx = np.arange(n)
+  source = np.maximum.accumulate(np.where(moved, idx, 0)) if n else idx
+  return move_px[source]
+
+def summarize_fills(
+  fills,
+  target_builder,
+  builder_only=False,
+  coin=None,
+  collect_trades=False,
+  collect_positions=False,
+  initial_state=None,
+):
+  """
+  Vectorized counterpart of fill_engine.process_fills (with `initial_state`
+  as its engine_state), returning the same FillReport
+  """
+  with timed("parse"):
+    frame = FillFrame.from_fills(fills, target_builder)
+  if coin:
+    frame = frame.select(frame.coin_mask(coin))
+  return summarize_frame(frame, builder_only, collect_trades, collect_positions, initial_state)
+
+def summarize_frame(frame, builder_only=False, collect_trades=False, collect_positions=False, initial_state=None):
+  report = FillReport()
+  if len(frame) == 0:
+    return report
+
+  with timed("taint"):
+    lifecycles = segment_lifecycles(frame, initial_state)
+  with timed("aggregate"):
+    fill_report(report, frame, lifecycles, builder_only, collect_trades, collect_positions)
+  return report
+
+def report_rows(frame, lifecycles, builder_only):
+  """
+  Which frame rows count towards the aggregates (and become trade rows), and
+  the indices of the rows that get a position snapshot
+  """
+  included = frame.is_builder & ~lifecycles.tainted if builder_only else np.ones(len(frame), dtype=bool)
+  # Builder-only history shows the builder's fills, flagged if their lifecycle is tainted
+  position_rows = np.flatnonzero(frame.is_builder) if builder_only else np.arange(len(frame))
+  return included, position_rows
+
+def fill_report(report, frame, lifecycles, builder_only, collect_trades, collect_positions):
+  """
+  Aggregates and response rows from the frame and its lifecycle columns
+  """
+  included, position_rows = report_rows(frame, lifecycles, builder_only)
+
+  report.realized_pnl = frame.realized_pnl(included)
+  report.fees_paid = frame.fees(included)
+  report.volume = frame.volume(included)
+  report.trade_count = int(included.sum())
+  report.tainted = bool(lifecycles.tainted.any())
+
+  if collect_trades:
+    rows = np.flatnonzero(included)
+    columns = zip(
+      frame.time[rows].tolist(), frame.coin_codes[rows].tolist(), frame.side[rows].tolist(),
+      frame.px[rows].tolist(), frame.sz[rows].tolist(), frame.fee[rows].tolist(), frame.closed_pnl[rows].tolist(),
+      frame.builders[rows].tolist(), frame.is_builder[rows].tolist(), lifecycles.tainted[rows].tolist(),
+    )
+    for time_ms, code, side, px, sz, fee, closed_pnl, builder, is_builder, tainted in columns:
+      report.trades.append(TradeRow(
+        time_ms, frame.coins[code], "B" if side == SIDE_BUY else "A", decimal_str(px), decimal_str(sz),
+        decimal_str(fee), decimal_str(closed_pnl), builder, is_builder, tainted,
+      ))
+
+  if collect_positions:
+    time_ms = frame.time.tolist()
+    net_size = lifecycles.net_size.tolist()
+    avg_entry_px = lifecycles.avg_entry_px.tolist()
+    tainted = lifecycles.tainted.tolist()
+    for i in position_rows.tolist():
+      report.positions.append(position_snapshot(
+        time_ms[i], frame.coins[frame.coin_codes[i]], net_size[i], avg_entry_px[i], builder_only, tainted[i]
+      ))
+
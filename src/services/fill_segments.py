@@ -0,0 +1,239 @@
+import os
+import json
+import shutil
+import fcntl
+import threading
+from collections import OrderedDict
+import numpy as np
+from src.infrastructure.fill_store import FILL_STORE_PATH
+from src.services.fill_frame import FillFrame, SIDE_BUY, SIDE_SELL
+
+# Kept next to the fill store by default, since segments are built from it
+FILL_SEGMENT_DIR = os.getenv("FILL_SEGMENT_DIR", FILL_STORE_PATH + ".segments")
+
+# Segments per user before the newest ones are merged
+SEGMENT_MAX_COUNT = int(os.getenv("FILL_SEGMENT_MAX_COUNT", 16))
+# Segments kept open (memory-mapped) per process
+SEGMENT_OPEN_MAX = int(os.getenv("FILL_SEGMENT_OPEN_MAX", 512))
+
+# One .npy file per column; NaN marks a missing start_position / builder_fee, -1 a missing builder
+SEGMENT_COLUMNS = (
+  ("time", np.int64), ("tid", np.int64), ("px", np.float64), ("sz", np.float64), ("fee", np.float64),
+  ("closed_pnl", np.float64), ("start_position", np.float64), ("builder_fee", np.float64),
+  ("side", np.int8), ("coin_code", np.int32), ("builder_code", np.int32),
+)
+
+def _write_json(path, data):
+  with open(path + ".tmp", "w", encoding="utf-8") as f:
+    json.dump(data, f)
+  os.replace(path + ".tmp", path)
+
+class SegmentCache:
+  """
+  Cross-process cache of each user's stored fills as append-only columnar
+  segments on disk, shared by every worker process through memory maps:
+
+    <root>/<user>/manifest.json
+    <root>/<user>/seg-<n>/<column>.npy
+
+  Segments never change once written. A writer (one per user at a time,
+  under a file lock) adds a segment for fills stored since its last run,
+  then atomically replaces the manifest. Readers take no locks: they read
+  the manifest and map the segments it lists, so every process serves
+  the same page-cache copy of the columns instead of its own.
+  """
+  def __init__(self, root=FILL_SEGMENT_DIR, max_segments=SEGMENT_MAX_COUNT, open_max=SEGMENT_OPEN_MAX):
+    self.root = root
+    self.max_segments = max_segments
+    self.open_max = open_max
+    self._open = OrderedDict()  # segment path -> {column: memory-mapped array}, least recently used first
+    self._open_lock = threading.Lock()
+    os.makedirs(root, exist_ok=True)
+
+  def _user_dir(self, user):
+    return os.path.join(self.root, user.lower())
+
+  def manifest(self, user):
+    try:
+      with open(os.path.join(self._user_dir(user), "manifest.json"), encoding="utf-8") as f:
+        return json.load(f)
+    except FileNotFoundError:
+      return None
+
+  # Writer
+
+  def catch_up(self, user, store):
+    """
+    Append fills stored since the last run as a new segment (blocking; run in a thread)
+    """
+    user_dir = self._user_dir(user)
+    os.makedirs(user_dir, exist_ok=True)
+    with open(os.path.join(user_dir, ".lock"), "w") as lock:
+      fcntl.flock(lock, fcntl.LOCK_EX)
+      manifest = self.manifest(user)
+      if manifest is not None and manifest["store_id"] != store.store_id:
+        # Built from another fill store (e.g. the database was replaced)
+        manifest = None
+      last_rowid = manifest["last_rowid"] if manifest else 0
+      pending = store.unaggregated_fills(user, last_rowid)
+      if not pending:
+        return
+
+      fills = [fill for _, fill in pending]
+      last_rowid = max(rowid for rowid, _ in pending)
+      if manifest and (fills[0].time, fills[0].tid) <= tuple(manifest["last_key"]):
+        # Older than what's cached: segments must stay in time order, so rebuild
+        manifest = None
+        fills = store.query(user)
+      replaced = []
+      if manifest is None:
+        # Old segments go once the new manifest is in place; names are never reused,
+        # since other processes may still have them mapped
+        replaced = sorted(entry for entry in os.listdir(user_dir) if entry.startswith("seg-"))
+        next_segment = int(replaced[-1][len("seg-"):].split(".")[0]) + 1 if replaced else 0
+        manifest = {
+          "store_id": store.store_id, "segments": [], "coins": [], "builders": [], "next_segment": next_segment,
+        }
+
+      segment = self._write_segment(user_dir, manifest, self._columns(fills, manifest))
+      manifest["segments"].append(segment)
+      manifest["last_rowid"] = last_rowid
+      manifest["last_key"] = [fills[-1].time, fills[-1].tid]
+      if len(manifest["segments"]) > self.max_segments:
+        self._compact(user_dir, manifest)
+      else:
+        _write_json(os.path.join(user_dir, "manifest.json"), manifest)
+      for entry in replaced:
+        shutil.rmtree(os.path.join(user_dir, entry), ignore_errors=True)
+
+  def _columns(self, fills, manifest):
+    # Coin and builder codes index the user's manifest-wide lists, so segments concatenate as is
+    coin_index = {coin: i for i, coin in enumerate(manifest["coins"])}
+    builder_index = {builder: i for i, builder in enumerate(manifest["builders"])}
+    n = len(fills)
+    nan = float("nan")
+
+    def code(index, names, value):
+      if value not in index:
+        index[value] = len(names)
+        names.append(value)
+      return index[value]
+
+    return {
+      "time": np.fromiter((f.time for f in fills), np.int64, n),
+      "tid": np.fromiter((f.tid for f in fills), np.int64, n),
+      "px": np.fromiter((f.px for f in fills), np.float64, n),
+      "sz": np.fromiter((f.sz for f in fills), np.float64, n),
+      "fee": np.fromiter((f.fee for f in fills), np.float64, n),
+      "closed_pnl": np.fromiter((f.closed_pnl for f in fills), np.float64, n),
+      "start_position": np.fromiter(
+        (f.start_position if f.start_position is not None else nan for f in fills), np.float64, n
+      ),
+      "builder_fee": np.fromiter((f.builder_fee if f.builder_fee is not None else nan for f in fills), np.float64, n),
+      "side": np.fromiter((SIDE_BUY if f.side == "B" else SIDE_SELL for f in fills), np.int8, n),
+      "coin_code": np.fromiter((code(coin_index, manifest["coins"], f.coin) for f in fills), np.int32, n),
+      "builder_code": np.fromiter(
+        (code(builder_index, manifest["builders"], f.builder) if f.builder else -1 for f in fills), np.int32, n
+      ),
+    }
+
+  def _write_segment(self, user_dir, manifest, columns):
+    name = f"seg-{manifest['next_segment']:08d}"
+    manifest["next_segment"] += 1
+    tmp = os.path.join(user_dir, name + ".tmp")
+    os.makedirs(tmp, exist_ok=True)
+    for column, dtype in SEGMENT_COLUMNS:
+      np.save(os.path.join(tmp, f"{column}.npy"), columns[column].astype(dtype, copy=False))
+    os.replace(tmp, os.path.join(user_dir, name))
+    time = columns["time"]
+    return {"name": name, "rows": len(time), "first_time": int(time[0]), "last_time": int(time[-1])}
+
+  def _compact(self, user_dir, manifest):
+    """
+    Merge the small appended segments into one, and into the oldest one as
+    well once together they outgrow it, then drop the merged segments
+    """
+    segments = manifest["segments"]
+    start = 1 if sum(s["rows"] for s in segments[1:]) < segments[0]["rows"] else 0
+    merged = segments[start:]
+    parts = [self._load(os.path.join(user_dir, s["name"])) for s in merged]
+    columns = {column: np.concatenate([part[column] for part in parts]) for column, _ in SEGMENT_COLUMNS}
+    manifest["segments"] = segments[:start] + [self._write_segment(user_dir, manifest, columns)]
+    _write_json(os.path.join(user_dir, "manifest.json"), manifest)
+    # Processes still mapping the old files keep their data until they let go of it
+    for segment in merged:
+      shutil.rmtree(os.path.join(user_dir, segment["name"]), ignore_errors=True)
+
+  # Readers
+
+  def _load(self, path):
+    with self._open_lock:
+      columns = self._open.get(path)
+      if columns is not None:
+        self._open.move_to_end(path)
+        return columns
+    columns = {column: np.load(os.path.join(path, f"{column}.npy"), mmap_mode="r") for column, _ in SEGMENT_COLUMNS}
+    with self._open_lock:
+      self._open[path] = columns
+      while len(self._open) > self.open_max:
+        self._open.popitem(last=False)
+    return columns
+
+  def frame(self, user, target_builder, from_ms=None, to_ms=None, coin=None):
+    """
+    The user's cached fills in [from_ms, to_ms] as a FillFrame, or None if
+    the user has no segments yet. A window inside one segment is served as
+    views of the mapped files; spanning segments concatenates them.
+    """
+    for _ in range(3):
+      manifest = self.manifest(user)
+      if manifest is None:
+        return None
+      try:
+        parts = []
+        for segment in manifest["segments"]:
+          if (from_ms and segment["last_time"] < from_ms) or (to_ms and segment["first_time"] > to_ms):
+            continue
+          columns = self._load(os.path.join(self._user_dir(user), segment["name"]))
+          time = columns["time"]
+          start = int(np.searchsorted(time, from_ms, "left")) if from_ms else 0
+          end = int(np.searchsorted(time, to_ms, "right")) if to_ms else len(time)
+          parts.append({column: array[start:end] for column, array in columns.items()})
+        break
+      except FileNotFoundError:
+        # Compacted away between reading the manifest and opening it; the new manifest lists its replacement
+        continue
+    else:
+      return None
+
+    if len(parts) == 1:
+      columns = parts[0]
+    else:
+      columns = {
+        column: np.concatenate([part[column] for part in parts]) if parts else np.empty(0, dtype)
+        for column, dtype in SEGMENT_COLUMNS
+      }
+    builders = manifest["builders"]
+    builder_code = columns["builder_code"]
+    if target_builder in builders:
+      # NaN (no builder fee reported) compares False, so it counts as a builder fill like in Fill.from_api
+      is_builder = (builder_code == builders.index(target_builder)) & ~(columns["builder_fee"] <= 0)
+    else:
+      is_builder = np.zeros(len(builder_code), dtype=bool)
+    frame = FillFrame(
+      time=columns["time"],
+      tid=columns["tid"],
+      px=columns["px"],
+      sz=columns["sz"],
+      fee=columns["fee"],
+      closed_pnl=columns["closed_pnl"],
+      start_position=columns["start_position"],
+      side=columns["side"],
+      coin_codes=columns["coin_code"],
+      coins=list(manifest["coins"]),
+      is_builder=is_builder,
+      builders=np.array(builders + [None], dtype=object)[builder_code],
+    )
+    if coin:
+      frame = frame.select(frame.coin_mask(coin))
+    return frame
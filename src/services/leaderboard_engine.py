@@ -0,0 +1,350 @@
+import os
+import time
+import asyncio
+import logging
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from dataclasses import dataclass
+from src.core.models import LeaderboardRow
+from src.infrastructure.ledger_series import ledger_change
+from src.services.fill_engine import FillEngine
+from src.services.helper_functions import leaderboard_metric
+
+LEADERBOARD_REFRESH_S = float(os.getenv("LEADERBOARD_REFRESH_S", 10))
+LEADERBOARD_CONCURRENCY = int(os.getenv("LEADERBOARD_CONCURRENCY", 16))
+# Fills before this time are ignored by the precomputed board (e.g. competition start)
+LEADERBOARD_FROM_MS = int(os.getenv("LEADERBOARD_FROM_MS", 0)) or None
+
+# returnPct is indexed separately for each maxStartCapital, since the cap changes the order
+INDEXED_METRICS = ("volume", "pnl")
+# returnPct indexes kept (one per coin, builderOnly and maxStartCapital), least recently read dropped first
+LEADERBOARD_RETURN_INDEXES = int(os.getenv("LEADERBOARD_RETURN_INDEXES", 8))
+
+logger = logging.getLogger(__name__)
+
+@dataclass(slots=True)
+class _Aggregate:
+  volume: float = 0.0
+  pnl: float = 0.0
+  trade_count: int = 0
+  tainted: bool = False
+
+class _SortedIndex:
+  """
+  Users ordered by descending metric value, ties broken by address
+  """
+  __slots__ = ("keys", "by_user")
+
+  def __init__(self, values=()):
+    self.by_user = {user: (-value, user) for user, value in values}
+    self.keys = sorted(self.by_user.values())
+
+  def __len__(self):
+    return len(self.keys)
+
+  def update(self, user, value):
+    self.remove(user)
+    key = (-value, user)
+    insort(self.keys, key)
+    self.by_user[user] = key
+
+  def remove(self, user):
+    key = self.by_user.pop(user, None)
+    if key is not None:
+      del self.keys[bisect_left(self.keys, key)]
+
+  def rank(self, user):
+    key = self.by_user.get(user)
+    return bisect_left(self.keys, key) + 1 if key is not None else None
+
+class _UserState:
+  __slots__ = ("engine", "high_water_ms", "boundary_tids", "seeded", "equity_at_start")
+
+  def __init__(self, target_builder, from_ms):
+    self.engine = FillEngine(target_builder)
+    self.high_water_ms = from_ms
+    self.boundary_tids = set()  # tids already seen at high_water_ms
+    # Whether the engine has picked up the positions open at from_ms
+    self.seeded = from_ms is None
+    # Account value at from_ms for returnPct, looked up once (None until then)
+    self.equity_at_start = None
+
+class LeaderboardEngine:
+  """
+  Keeps a registered cohort's leaderboard precomputed.
+
+  A background loop pulls only fills newer than each user's high-water mark,
+  streams them through that user's FillEngine, and maintains running
+  (user, coin, builderOnly) aggregates plus one sorted index per
+  (metric, coin, builderOnly), so reads are a slice or a bisect.
+  coin=None aggregates cover every coin. returnPct is PnL over each user's
+  equity at `from_ms`, capped by maxStartCapital; its indexes are built on
+  first read for a maxStartCapital and kept up to date from then on.
+  """
+  def __init__(
+    self, ds, target_builder, refresh_s=LEADERBOARD_REFRESH_S, concurrency=LEADERBOARD_CONCURRENCY,
+    from_ms=LEADERBOARD_FROM_MS
+  ):
+    self.ds = ds
+    self.target_builder = target_builder
+    self.refresh_s = refresh_s
+    self.concurrency = concurrency
+    self.from_ms = from_ms
+
+    self.cohort = {}  # user -> _UserState
+    self.aggregates = {}  # (user, coin, builder_only) -> _Aggregate
+    self.indexes = {}  # (metric, coin, builder_only) -> _SortedIndex
+    self.return_indexes = OrderedDict()  # (coin, builder_only, max_start_capital) -> _SortedIndex
+    self.updated_at_ms = None
+    self._wake = asyncio.Event()
+
+  # Cohort management
+
+  def add_users(self, users):
+    added = [u for u in dict.fromkeys(users) if u not in self.cohort]
+    for user in added:
+      self.cohort[user] = _UserState(self.target_builder, self.from_ms)
+    if added:
+      self._wake.set()
+    return added
+
+  def remove_user(self, user):
+    if self.cohort.pop(user, None) is None:
+      return False
+    for key in [k for k in self.aggregates if k[0] == user]:
+      del self.aggregates[key]
+    for index in (*self.indexes.values(), *self.return_indexes.values()):
+      index.remove(user)
+    return True
+
+  # Ingestion
+
+  async def run(self):
+    """
+    Refresh forever: every `refresh_s` seconds, or right away when users are added
+    """
+    while True:
+      try:
+        await self.refresh()
+      except Exception:
+        logger.exception("leaderboard refresh failed")
+      self._wake.clear()
+      try:
+        await asyncio.wait_for(self._wake.wait(), timeout=self.refresh_s)
+      except asyncio.TimeoutError:
+        pass
+
+  async def refresh(self):
+    semaphore = asyncio.Semaphore(self.concurrency)
+
+    async def refresh_user(user, state):
+      async with semaphore:
+        try:
+          fills = await self.ds.get_user_fills(user, from_ms=state.high_water_ms)
+          if not state.seeded:
+            # Lifecycles opened before the board's start keep their taint, as in /v1/pnl
+            engine_state = await self.ds.get_position_state(user, self.from_ms)
+            if engine_state:
+              state.engine.restore_state(engine_state)
+            state.seeded = True
+        except Exception as e:
+          # One bad address should not stall the board
+          logger.warning("leaderboard ingest failed for %s: %r", user, e)
+          return
+      # The user may have been removed while we were fetching
+      if self.cohort.get(user) is state:
+        self.ingest(user, state, fills)
+
+    await asyncio.gather(
+      *(refresh_user(u, s) for u, s in list(self.cohort.items())),
+      self._refresh_start_equities(),
+    )
+    self.updated_at_ms = int(time.time() * 1000)
+
+  async def _refresh_start_equities(self):
+    # Users whose lookup failed are retried on the next refresh
+    if self.from_ms is None:
+      return
+    pending = {u: s for u, s in self.cohort.items() if s.equity_at_start is None}
+    if not pending:
+      return
+    semaphore = asyncio.Semaphore(self.concurrency)
+
+    async def from_ledger_totals(user):
+      # Current account value less the stored ledger's net change since from_ms, one index seek each
+      async with semaphore:
+        try:
+          before, now = await asyncio.gather(
+            self.ds.get_ledger_totals(user, self.from_ms), self.ds.get_ledger_totals(user)
+          )
+          if before is None or now is None:
+            return None
+          account_value = await self.ds.get_account_value(user)
+        except Exception as e:
+          logger.warning("leaderboard start equity failed for %s: %r", user, e)
+          return None
+      if account_value is None:
+        return None
+      return max(account_value - ledger_change(before, now), 0.0)
+
+    results = await asyncio.gather(*(from_ledger_totals(u) for u in pending))
+    equities = {user: equity for user, equity in zip(pending, results) if equity is not None}
+    # Sources without stored ledger totals replay the ledger instead
+    missing = [u for u in pending if u not in equities]
+    if missing:
+      equities.update(await self.ds.get_equity_at_timestamps(missing, self.from_ms))
+    for user, equity in equities.items():
+      state = pending[user]
+      if self.cohort.get(user) is not state:
+        continue
+      state.equity_at_start = equity
+      for (coin, builder_only, max_start_capital), index in self.return_indexes.items():
+        self._update_return(index, user, coin, builder_only, max_start_capital)
+
+  def high_water_ms(self, user):
+    """
+    Time of the newest fill applied for the user (None before any)
+    """
+    state = self.cohort.get(user)
+    return state.high_water_ms if state is not None else None
+
+  def apply(self, user, fills):
+    """
+    Apply fills that arrived between refreshes (e.g. live). They must run from
+    high_water_ms(user) on, oldest first. Users not on the board yet wait for
+    their first refresh, which also seeds their open positions.
+    """
+    state = self.cohort.get(user)
+    if state is None or not state.seeded:
+      return
+    self.ingest(user, state, fills)
+    self.updated_at_ms = int(time.time() * 1000)
+
+  def ingest(self, user, state, fills):
+    """
+    Apply fills (oldest first) that are newer than the user's high-water mark
+    """
+    touched = set()
+    for fill in fills:
+      fill_time = fill.time
+      if state.high_water_ms is not None:
+        if fill_time < state.high_water_ms:
+          continue
+        if fill_time == state.high_water_ms and fill.tid in state.boundary_tids:
+          continue
+      if state.high_water_ms is None or fill_time > state.high_water_ms:
+        state.high_water_ms = fill_time
+        state.boundary_tids = set()
+      state.boundary_tids.add(fill.tid)
+
+      processed = state.engine.feed(fill)
+      record = processed.record
+      for coin in (record.coin, None):
+        touched.add(coin)
+        self._accumulate(user, coin, False, record, processed.tainted, True)
+        self._accumulate(
+          user, coin, True, record, processed.tainted, record.is_target_builder and not processed.tainted
+        )
+
+    for coin in touched:
+      for builder_only in (False, True):
+        aggregate = self.aggregates.get((user, coin, builder_only))
+        if aggregate is None or aggregate.trade_count == 0:
+          continue
+        for metric in INDEXED_METRICS:
+          index = self.indexes.setdefault((metric, coin, builder_only), _SortedIndex())
+          index.update(user, aggregate.volume if metric == "volume" else aggregate.pnl)
+        for (index_coin, index_builder_only, max_start_capital), index in self.return_indexes.items():
+          if (index_coin, index_builder_only) == (coin, builder_only):
+            self._update_return(index, user, coin, builder_only, max_start_capital)
+
+  def _accumulate(self, user, coin, builder_only, record, tainted, included):
+    key = (user, coin, builder_only)
+    aggregate = self.aggregates.get(key)
+    if aggregate is None:
+      aggregate = self.aggregates[key] = _Aggregate()
+    if builder_only and tainted:
+      aggregate.tainted = True
+    if included:
+      aggregate.volume += record.px * record.sz
+      aggregate.pnl += record.closed_pnl
+      aggregate.trade_count += 1
+
+  # returnPct
+
+  def _return_pct(self, user, aggregate, max_start_capital):
+    """
+    The user's returnPct, or None while their start equity is unknown
+    """
+    equity_at_start = self.cohort[user].equity_at_start
+    if self.from_ms is not None and equity_at_start is None:
+      return None
+    return leaderboard_metric("returnPct", aggregate.pnl, aggregate.volume, equity_at_start, max_start_capital)
+
+  def _update_return(self, index, user, coin, builder_only, max_start_capital):
+    aggregate = self.aggregates.get((user, coin, builder_only))
+    value = self._return_pct(user, aggregate, max_start_capital) if aggregate and aggregate.trade_count else None
+    if value is None:
+      index.remove(user)
+    else:
+      index.update(user, value)
+
+  def _return_index(self, coin, builder_only, max_start_capital):
+    key = (coin, builder_only, max_start_capital)
+    index = self.return_indexes.get(key)
+    if index is not None:
+      self.return_indexes.move_to_end(key)
+      return index
+    values = []
+    for (user, aggregate_coin, aggregate_builder_only), aggregate in self.aggregates.items():
+      if (aggregate_coin, aggregate_builder_only) != (coin, builder_only) or aggregate.trade_count == 0:
+        continue
+      value = self._return_pct(user, aggregate, max_start_capital)
+      if value is not None:
+        values.append((user, value))
+    index = self.return_indexes[key] = _SortedIndex(values)
+    while len(self.return_indexes) > LEADERBOARD_RETURN_INDEXES:
+      self.return_indexes.popitem(last=False)
+    return index
+
+  # Reads
+
+  def _row(self, user, coin, metric, builder_only, max_start_capital, rank):
+    aggregate = self.aggregates[(user, coin, builder_only)]
+    if metric == "returnPct":
+      value = self._return_pct(user, aggregate, max_start_capital)
+    else:
+      value = leaderboard_metric(metric, aggregate.pnl, aggregate.volume, None, max_start_capital)
+    return LeaderboardRow(
+      user=user,
+      metricValue=str(value),
+      tradeCount=aggregate.trade_count,
+      tainted=aggregate.tainted if builder_only else False,
+      rank=rank,
+    )
+
+  def _index(self, metric, coin, builder_only, max_start_capital):
+    if metric == "returnPct":
+      return self._return_index(coin, builder_only, max_start_capital)
+    return self.indexes.get((metric, coin, builder_only))
+
+  def top(self, metric="pnl", coin=None, builder_only=False, max_start_capital=None, limit=100, offset=0):
+    """
+    Returns (rows, total) for one page of the ranking
+    """
+    index = self._index(metric, coin, builder_only, max_start_capital)
+    if index is None:
+      return [], 0
+    page = index.keys[offset:offset + limit]
+    rows = [
+      self._row(user, coin, metric, builder_only, max_start_capital, rank)
+      for rank, (_, user) in enumerate(page, start=offset + 1)
+    ]
+    return rows, len(index)
+
+  def rank_of(self, user, metric="pnl", coin=None, builder_only=False, max_start_capital=None):
+    index = self._index(metric, coin, builder_only, max_start_capital)
+    rank = index.rank(user) if index is not None else None
+    if rank is None:
+      return None
+    return self._row(user, coin, metric, builder_only, max_start_capital, rank)
@@ -0,0 +1,103 @@
+import asyncio
+import logging
+from src.infrastructure.hl_websocket import HL_WS_BASE_URL, UserFillsWebsocketManager
+
+logger = logging.getLogger(__name__)
+
+class LiveFillIngestor:
+  """
+  Keeps tracked users' stored fills (and the aggregates built on them) current
+  from the `userFills` websocket feed instead of waiting for the next request.
+
+  Messages are handed from the websocket thread to the event loop and applied
+  in order. Every (re)subscribe starts with a snapshot of recent fills; when
+  the snapshot doesn't reach back to the stored high-water mark, fills may
+  have been missed while disconnected, so the gap is backfilled over REST.
+  With a LeaderboardEngine, cohort users' new fills reach the precomputed
+  board right away instead of on its next refresh.
+  """
+  def __init__(self, stored, base_url=HL_WS_BASE_URL, engine=None):
+    self.stored = stored
+    self.base_url = base_url
+    self.engine = engine
+    self.manager = None
+    self.tracked = {}  # lowercased address -> address as the store keys it
+
+    self.fills_received = 0
+    self.snapshots = 0
+    self.backfills = 0
+    self._queue = None
+    self._consumer = None
+
+  async def start(self):
+    loop = asyncio.get_running_loop()
+    self._queue = asyncio.Queue()
+
+    def on_fills(user, fills, is_snapshot):
+      loop.call_soon_threadsafe(self._queue.put_nowait, (user, fills, is_snapshot))
+
+    self.manager = UserFillsWebsocketManager(self.base_url, on_fills)
+    for user in self.tracked.values():
+      self.manager.track(user)
+    self.manager.start()
+    self._consumer = asyncio.create_task(self._consume())
+
+  async def stop(self):
+    if self.manager is not None:
+      self.manager.stop()
+    if self._consumer is not None:
+      self._consumer.cancel()
+      try:
+        await self._consumer
+      except asyncio.CancelledError:
+        pass
+      self._consumer = None
+
+  def track(self, users):
+    for user in users:
+      self.tracked[user.lower()] = user
+      if self.manager is not None:
+        self.manager.track(user)
+
+  def untrack(self, user):
+    if self.tracked.pop(user.lower(), None) is not None and self.manager is not None:
+      self.manager.untrack(user)
+
+  async def _consume(self):
+    while True:
+      user, fills, is_snapshot = await self._queue.get()
+      user = self.tracked.get(user.lower())
+      if user is None:
+        continue  # untracked while the message was in flight
+      try:
+        await self.apply(user, fills, is_snapshot)
+      except Exception:
+        logger.exception("live fill ingest failed for %s", user)
+
+  async def apply(self, user, fills, is_snapshot):
+    if is_snapshot:
+      self.snapshots += 1
+      high_water_ms = await asyncio.to_thread(self.stored.store.high_water_mark, user)
+      oldest = min((f["time"] for f in fills), default=None)
+      if high_water_ms is None or oldest is None or oldest > high_water_ms:
+        self.backfills += 1
+        await self.stored.sync(user)
+    await self.stored.ingest(user, fills)
+    self.fills_received += len(fills)
+    if self.engine is not None and user in self.engine.cohort:
+      # Read back from the board's own high-water mark, so fills the store got over REST since are included
+      new_fills = await asyncio.to_thread(
+        self.stored.store.query, user, None, self.engine.high_water_ms(user), None, self.stored.target_builder
+      )
+      self.engine.apply(user, new_fills)
+
+  def stats(self):
+    return {
+      "connected": bool(self.manager and self.manager.ws_ready),
+      "connects": self.manager.connects if self.manager else 0,
+      "tracked": len(self.tracked),
+      "fillsReceived": self.fills_received,
+      "snapshots": self.snapshots,
+      "backfills": self.backfills,
+      "queueDepth": self._queue.qsize() if self._queue else 0,
+    }
@@ -0,0 +1,126 @@
+import asyncio
+from bisect import bisect_left, bisect_right
+from src.core.models import PnlSummary
+from src.infrastructure.metrics import timed
+from src.services.compute_pool import compute_pool
+from src.services.fill_frame import FillFrame
+from src.services.helper_functions import calculate_return_pct
+
+SUMMARY_VIEWS = ("trades", "positions", "pnl")
+
+def pnl_summary(report, equity_at_start, builder_only, max_start_capital):
+  """
+  /v1/pnl response from a FillReport and the user's equity at the window start
+  """
+  return PnlSummary(
+    realizedPnl=report.realized_pnl,
+    returnPct=calculate_return_pct(equity_at_start, report.realized_pnl, max_start_capital),
+    feesPaid=report.fees_paid,
+    tradeCount=report.trade_count,
+    tainted=report.tainted if builder_only else None,
+  )
+
+def _union(values):
+  # Widest bound covering every query; None (unbounded) wins
+  return None if any(v is None for v in values) else values
+
+def fetch_window(queries):
+  """
+  (from_ms, to_ms, coin) covering all of one user's queries, so their fills come from a single fetch
+  """
+  starts = _union([q.fromMs for q in queries])
+  ends = _union([q.toMs for q in queries])
+  coins = {q.coin for q in queries}
+  return (
+    min(starts) if starts else None,
+    max(ends) if ends else None,
+    coins.pop() if len(coins) == 1 else None,
+  )
+
+def window_slice(fills, times, from_ms, to_ms):
+  """
+  Fills (oldest first, with their `times`) inside [from_ms, to_ms]
+  """
+  if isinstance(fills, FillFrame):
+    return fills.window(from_ms, to_ms)
+  start = bisect_left(times, from_ms) if from_ms else 0
+  end = bisect_right(times, to_ms) if to_ms else len(fills)
+  return fills[start:end]
+
+async def summarize_user(ds, user, queries, target_builder):
+  """
+  Every view requested by one user's queries, from one fill fetch.
+  Returns one result dict per query, in order; identical queries share a result.
+  """
+  from_ms, to_ms, coin = fetch_window(queries)
+  # Start equity for returnPct, looked up while the fills download
+  equity_starts = sorted({q.fromMs for q in queries if "pnl" in q.include and q.fromMs})
+  async def fetch_fills():
+    # Shared memory-mapped columns when the datasource has them
+    frame = await ds.get_user_fill_frame(user, from_ms=from_ms, to_ms=to_ms, coin=coin)
+    if frame is not None:
+      return frame
+    return await ds.get_user_fills(user, from_ms=from_ms, to_ms=to_ms, coin=coin)
+
+  with timed("fetch"):
+    fills, *equities = await asyncio.gather(
+      fetch_fills(),
+      *(ds.get_equity_at_timestamp(user, ts) for ts in equity_starts),
+    )
+  equity_at = dict(zip(equity_starts, equities))
+  times = None if isinstance(fills, FillFrame) else [f.time for f in fills]
+
+  # Each window continues the positions (and taint) open at its start
+  window_starts = sorted({(q.fromMs, q.coin) for q in queries if q.fromMs})
+  with timed("fetch"):
+    states = await asyncio.gather(
+      *(ds.get_position_state(user, start, coin=c) for start, c in window_starts)
+    )
+  state_at = dict(zip(window_starts, states))
+
+  results = {}
+  for query in queries:
+    key = query.key()
+    if key in results:
+      continue
+    report = await compute_pool.summarize_fills(
+      window_slice(fills, times, query.fromMs, query.toMs), target_builder,
+      builder_only=query.builderOnly, coin=query.coin,
+      collect_trades="trades" in query.include, collect_positions="positions" in query.include,
+      initial_state=state_at.get((query.fromMs, query.coin)),
+    )
+    result = query.echo()
+    if "trades" in query.include:
+      result["trades"] = report.trades
+    if "positions" in query.include:
+      result["positions"] = report.positions
+    if "pnl" in query.include:
+      equity_at_start = equity_at[query.fromMs] if query.fromMs else 1.0
+      result["pnl"] = pnl_summary(report, equity_at_start, query.builderOnly, query.maxStartCapital)
+    results[key] = result
+  return [results[q.key()] for q in queries]
+
+async def run_summaries(ds, queries, target_builder, concurrency):
+  """
+  Results for a batch of queries in request order. Each distinct user is
+  fetched once, at most `concurrency` users at a time; a user whose fetch
+  fails gets an error result for each of their queries.
+  """
+  by_user = {}
+  for index, query in enumerate(queries):
+    by_user.setdefault(query.user, []).append(index)
+  semaphore = asyncio.Semaphore(concurrency)
+  results = [None] * len(queries)
+
+  async def run(user, indexes):
+    async with semaphore:
+      user_queries = [queries[i] for i in indexes]
+      try:
+        user_results = await summarize_user(ds, user, user_queries, target_builder)
+      except Exception as e:
+        user_results = [{**q.echo(), "error": repr(e)} for q in user_queries]
+    for i, result in zip(indexes, user_results):
+      results[i] = result
+
+  await asyncio.gather(*(run(user, indexes) for user, indexes in by_user.items()))
+  return results
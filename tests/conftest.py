@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Routers read TARGET_BUILDER at import time
+os.environ.setdefault("TARGET_BUILDER", "0xbuilder")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
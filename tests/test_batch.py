@@ -0,0 +1,91 @@
+import os
+import json
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from src.api import summary
+from src.api.summary import router as summary_router
+from src.infrastructure.public_hl_datasource import PublicHLDataSource
+from src.infrastructure.rate_limiter import TokenBucketRateLimiter
+
+BUILDER = os.environ["TARGET_BUILDER"]
+GOOD = "0xgood"
+BAD = "0xbad"
+
+def api_fill(tid, coin):
+  is_open = tid % 2 == 0
+  return {
+    "coin": coin, "px": str(100.0 + tid), "sz": "1.0", "side": "B" if is_open else "A",
+    "time": 1_700_000_000_000 + tid * 1000, "startPosition": "0.0" if is_open else "1.0",
+    "closedPnl": "0.0" if is_open else "1.5", "fee": "0.1", "tid": tid, "hash": f"0x{tid:x}",
+    "builder": BUILDER if tid % 4 < 2 else None,
+  }
+
+FILLS = [api_fill(tid, "BTC" if tid % 8 < 4 else "ETH") for tid in range(16)]
+
+@pytest.fixture
+def requests():
+  return []
+
+@pytest.fixture
+def client(requests):
+  def handler(request):
+    payload = json.loads(request.content)
+    requests.append(payload)
+    if payload.get("user") == BAD:
+      return httpx.Response(422, json={"error": "bad user"})
+    if payload["type"] == "userFillsByTime":
+      start, end = payload.get("startTime", 0), payload.get("endTime", 1 << 62)
+      return httpx.Response(200, json=[f for f in FILLS if start <= f["time"] <= end])
+    if payload["type"] == "clearinghouseState":
+      return httpx.Response(200, json={"marginSummary": {"accountValue": "1000.0"}})
+    return httpx.Response(200, json=[])
+
+  app = FastAPI()
+  app.include_router(summary_router)
+  app.state.datasource = PublicHLDataSource(
+    client=httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+    rate_limiter=TokenBucketRateLimiter(10**9),
+  )
+  with TestClient(app) as c:
+    yield c
+
+def test_batch_shares_fetches_and_isolates_failures(client, requests):
+  window = {"fromMs": FILLS[4]["time"], "toMs": FILLS[13]["time"]}
+  queries = [
+    {"user": GOOD, "include": ["pnl", "trades"], **window},
+    {"user": BAD},
+    {"user": GOOD, "include": ["trades", "pnl"], **window},
+    {"user": GOOD, "coin": "ETH", "builderOnly": True},
+  ]
+  response = client.post("/v1/batch", json={"queries": queries})
+  assert response.status_code == 200
+  results = response.json()["results"]
+
+  # Results come back in request order; the same query (views in any order) gets the same result
+  assert results[0] == results[2]
+  assert results[0]["trades"] and results[0]["pnl"]["tradeCount"] == len(results[0]["trades"])
+  # ...and the same as asking /v1/summary on its own
+  single = client.get(f"/v1/summary?user={GOOD}&fromMs={window['fromMs']}&toMs={window['toMs']}").json()
+  assert results[0] == {k: v for k, v in single.items() if k != "positions"}
+  assert results[3] == client.get(f"/v1/summary?user={GOOD}&coin=ETH&builderOnly=true").json()
+
+  # A failing user only fails their own query, which echoes it with the error
+  assert results[1]["user"] == BAD and "error" in results[1]
+  assert "trades" not in results[1]
+
+def test_batch_fetches_each_user_once(client, requests):
+  queries = [{"user": GOOD, "fromMs": FILLS[t]["time"]} for t in (2, 6, 6)] + [{"user": GOOD, "coin": "BTC"}]
+  assert client.post("/v1/batch", json={"queries": queries}).status_code == 200
+  # One fill fetch over the widest window, unbounded here because of the last query
+  fill_requests = [r for r in requests if r["type"] == "userFillsByTime"]
+  assert len(fill_requests) == 1
+  assert fill_requests[0]["startTime"] == 0
+
+def test_batch_rejects_invalid_batches(client, monkeypatch):
+  assert client.post("/v1/batch", json={"queries": []}).status_code == 400
+  assert client.post("/v1/batch", json={"queries": [{"user": " "}]}).status_code == 400
+  assert client.post("/v1/batch", json={"queries": [{"user": GOOD, "include": []}]}).status_code == 400
+  monkeypatch.setattr(summary, "BATCH_MAX_QUERIES", 2)
+  assert client.post("/v1/batch", json={"queries": [{"user": GOOD}] * 3}).status_code == 400
@@ -0,0 +1,110 @@
+import os
+import json
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from src.api.pnl import router as pnl_router
+from src.api.summary import router as summary_router
+from src.api.trades import router as trades_router
+from src.api.leaderboard import router as leaderboard_router
+from src.infrastructure.fill_store import SQLiteFillStore, StoredFillDataSource
+from src.infrastructure.public_hl_datasource import PublicHLDataSource
+from src.infrastructure.rate_limiter import TokenBucketRateLimiter
+from src.services.fill_buckets import BucketAggregator
+from src.services.fill_segments import SegmentCache
+
+BUILDER = os.environ["TARGET_BUILDER"]
+HOUR_MS = 3_600_000
+USER = "0xuser"
+
+def fill(hour, tid, side, sz, start, closed_pnl, builder=None):
+  f = {
+    "coin": "BTC", "px": "100.0", "sz": str(sz), "side": side, "time": hour * HOUR_MS, "startPosition": str(start),
+    "dir": "x", "closedPnl": str(closed_pnl), "hash": f"0x{tid:x}", "oid": tid, "crossed": True, "fee": "0.0",
+    "tid": tid, "feeToken": "USDC",
+  }
+  if builder:
+    f["builder"] = builder
+    f["builderFee"] = "0.01"
+  return f
+
+# A lifecycle opened without the builder before the window, then added to and closed with it inside
+FILLS = [
+  fill(1, 1, "B", 1.0, 0.0, 0.0),
+  fill(5, 2, "B", 1.0, 1.0, 0.0, BUILDER),
+  fill(6, 3, "A", 2.0, 2.0, 2.0, BUILDER),
+]
+
+def handler(request):
+  payload = json.loads(request.content)
+  if payload["type"] == "userFillsByTime":
+    start, end = payload.get("startTime", 0), payload.get("endTime", 1 << 62)
+    return httpx.Response(200, json=[f for f in FILLS if start <= f["time"] <= end])
+  if payload["type"] == "clearinghouseState":
+    return httpx.Response(200, json={"marginSummary": {"accountValue": "1000.0"}})
+  return httpx.Response(200, json=[])
+
+@pytest.fixture(params=["store", "segments"])
+def client(request, tmp_path):
+  upstream = PublicHLDataSource(
+    client=httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+    rate_limiter=TokenBucketRateLimiter(10**9),
+  )
+  store = SQLiteFillStore(str(tmp_path / "fills.sqlite3"))
+  segments = SegmentCache(str(tmp_path / "segments")) if request.param == "segments" else None
+  app = FastAPI()
+  for router in (pnl_router, summary_router, trades_router, leaderboard_router):
+    app.include_router(router)
+  app.state.datasource = StoredFillDataSource(upstream, store, BucketAggregator(store, BUILDER), segments)
+  with TestClient(app) as c:
+    yield c
+  store.close()
+
+def test_builder_only_window_agrees_across_endpoints(client):
+  window = f"fromMs={4 * HOUR_MS}&builderOnly=true"
+  pnl = client.get(f"/v1/pnl?user={USER}&{window}").json()
+  trades = client.get(f"/v1/trades?user={USER}&{window}").json()
+  summary = client.get(f"/v1/summary?user={USER}&{window}").json()
+  leaderboard = client.get(f"/v1/leaderboard?users={USER}&metric=pnl&{window}").json()
+
+  # The lifecycle saw a non-builder fill before fromMs, so its builder fills stay tainted
+  assert pnl["tradeCount"] == 0 and pnl["realizedPnl"] == 0.0 and pnl["tainted"] is True
+  assert trades == []
+  assert summary["trades"] == []
+  assert summary["pnl"] == pnl
+  assert leaderboard["leaderboard"] == []
+
+def test_all_trades_window_agrees_across_endpoints(client):
+  window = f"fromMs={4 * HOUR_MS}"
+  pnl = client.get(f"/v1/pnl?user={USER}&{window}").json()
+  trades = client.get(f"/v1/trades?user={USER}&{window}").json()
+  streamed = client.get(f"/v1/trades?user={USER}&{window}&format=ndjson").text.splitlines()
+  summary = client.get(f"/v1/summary?user={USER}&{window}").json()
+
+  assert pnl["tradeCount"] == len(trades) == 2
+  assert [json.loads(line) for line in streamed] == trades
+  assert pnl["realizedPnl"] == 2.0
+  assert [t["tainted"] for t in trades] == [True, True]
+  assert summary["trades"] == trades
+  assert summary["pnl"] == pnl
+
+def test_leaderboard_reads_bucket_summaries(client):
+  ds = client.app.state.datasource
+  fetched = []
+  get_user_fills_many = ds.get_user_fills_many
+
+  def recording(users, **kwargs):
+    fetched.extend(users)
+    return get_user_fills_many(users, **kwargs)
+
+  ds.get_user_fills_many = recording
+  window = f"fromMs={4 * HOUR_MS}"
+  pnl = client.get(f"/v1/pnl?user={USER}&{window}").json()
+  leaderboard = client.get(f"/v1/leaderboard?users={USER}&metric=pnl&{window}").json()
+
+  assert [(row["metricValue"], row["tradeCount"]) for row in leaderboard["leaderboard"]] == [
+    (str(pnl["realizedPnl"]), pnl["tradeCount"])
+  ]
+  # Every user was answered from the buckets, so no fills were fetched
+  assert fetched == []
@@ -0,0 +1,109 @@
+import time
+import asyncio
+from types import SimpleNamespace
+import pytest
+from src.core.base import BaseDataSource
+from src.infrastructure import cached_datasource
+from src.infrastructure.cached_datasource import CachedDataSource, TTLCache
+
+class Clock:
+  def __init__(self):
+    self.now = 1_000.0
+
+  def __call__(self):
+    return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+  clock = Clock()
+  # Only the cache's clock; the event loop keeps the real one
+  monkeypatch.setattr(cached_datasource, "time", SimpleNamespace(monotonic=clock, time=time.time))
+  return clock
+
+class Source(BaseDataSource):
+  """
+  Counts upstream calls; every get_equity_at_timestamp call waits on `release`
+  """
+  target_builder = "0xbuilder"
+
+  def __init__(self):
+    self.calls = 0
+    self.release = asyncio.Event()
+    self.fail = False
+
+  async def get_deposits(self, wallet_address, from_ms=None, to_ms=None):
+    return []
+
+  async def get_user_fills(self, user, from_ms=None, to_ms=None, coin=None):
+    return []
+
+  async def iter_user_fill_pages(self, user, from_ms=None, to_ms=None, coin=None):
+    yield []
+
+  async def get_equity_at_timestamp(self, user, timestamp_ms):
+    self.calls += 1
+    await self.release.wait()
+    if self.fail:
+      raise RuntimeError("upstream down")
+    return 100.0 + self.calls
+
+def test_entries_expire_after_their_ttl(clock):
+  cache = TTLCache()
+  cache.set("short", 1, ttl=2)
+  cache.set("long", 2, ttl=10)
+  clock.now += 5
+  assert cache.get("short") == (False, None)
+  assert cache.get("long") == (True, 2)
+  assert len(cache) == 1
+
+def test_least_recently_used_entry_is_evicted(clock):
+  cache = TTLCache(max_entries=2)
+  cache.set("a", 1, ttl=60)
+  cache.set("b", 2, ttl=60)
+  # Reading "a" makes "b" the least recently used
+  assert cache.get("a") == (True, 1)
+  cache.set("c", 3, ttl=60)
+  assert cache.get("b") == (False, None)
+  assert cache.get("a") == (True, 1)
+  assert cache.get("c") == (True, 3)
+
+def test_concurrent_misses_share_one_upstream_call(clock):
+  async def run():
+    source = Source()
+    ds = CachedDataSource(source, ttls={"equity": 2})
+    callers = [asyncio.create_task(ds.get_equity_at_timestamp("0xuser", 1)) for _ in range(5)]
+    await asyncio.sleep(0)
+    source.release.set()
+    assert await asyncio.gather(*callers) == [101.0] * 5
+    assert source.calls == 1
+    assert ds.stats()["equity"] == {"hits": 0, "misses": 1, "coalesced": 4}
+
+    # Served from the cache until the TTL runs out
+    assert await ds.get_equity_at_timestamp("0xuser", 1) == 101.0
+    clock.now += 3
+    assert await ds.get_equity_at_timestamp("0xuser", 1) == 102.0
+    assert source.calls == 2
+    assert ds.stats()["equity"]["hits"] == 1
+
+  asyncio.run(run())
+
+def test_cancelled_caller_and_failures_are_not_shared(clock):
+  async def run():
+    source = Source()
+    ds = CachedDataSource(source)
+    first = asyncio.create_task(ds.get_equity_at_timestamp("0xuser", 1))
+    second = asyncio.create_task(ds.get_equity_at_timestamp("0xuser", 1))
+    await asyncio.sleep(0)
+    # One caller giving up doesn't cancel the fetch the other is waiting on
+    first.cancel()
+    source.release.set()
+    assert await second == 101.0
+
+    # Errors reach every waiter but aren't cached
+    source.fail = True
+    with pytest.raises(RuntimeError):
+      await ds.get_equity_at_timestamp("0xuser", 2)
+    source.fail = False
+    assert await ds.get_equity_at_timestamp("0xuser", 2) == 103.0
+
+  asyncio.run(run())
@@ -0,0 +1,23 @@
+from src.core.models import Fill
+from src.services.compute_pool import _coin_batches, _merge_reports, _summarize_batch
+from src.services.fill_frame import FillFrame, summarize_frame
+
+BUILDER = "0xbuilder"
+
+def test_batches_merge_in_time_and_tid_order():
+  # Coins trading in the same milliseconds, with tids interleaved across coins
+  fills = [
+    Fill.from_api({
+      "coin": coin, "px": "100.0", "sz": "1.0", "side": "B" if tid % 4 < 2 else "A", "time": 1_000 + tid // 6,
+      "closedPnl": "0.0", "fee": "0.1", "tid": tid, "hash": f"0x{tid:x}", "builder": BUILDER if tid % 3 else None,
+    }, BUILDER)
+    for tid, coin in zip(range(60), ["ETH", "BTC", "SOL"] * 20)
+  ]
+  frame = FillFrame.from_fills(fills, BUILDER)
+  for builder_only in (False, True):
+    expected = summarize_frame(frame, builder_only, collect_trades=True, collect_positions=True)
+    batches = _coin_batches(frame, 3)
+    assert len(batches) == 3
+    merged = _merge_reports([_summarize_batch(batch, builder_only, True, True) for batch in batches])
+    assert merged.trades == expected.trades
+    assert merged.positions == expected.positions
@@ -0,0 +1,57 @@
+import asyncio
+import pytest
+from src.core.models import Fill
+from src.infrastructure.fill_store import SQLiteFillStore, StoredFillDataSource
+
+pytest.importorskip("pyarrow")
+from backfill import backfill_user
+from src.infrastructure.fill_archive import DAY_MS, FillArchive, day_of
+
+BUILDER = "0xbuilder"
+USER = "0xuser"
+DAY = 20_000 * DAY_MS
+HOUR_MS = 3_600_000
+
+def fills(times):
+  return [
+    Fill.from_api({
+      "coin": "BTC", "px": "100.0", "sz": "1.0", "side": "B", "time": time, "startPosition": "0.0",
+      "closedPnl": "0.0", "fee": "0.1", "tid": tid, "hash": f"0x{tid:x}",
+    }, BUILDER)
+    for tid, time in enumerate(times)
+  ]
+
+class Upstream:
+  target_builder = BUILDER
+
+  def __init__(self, fills):
+    self.fills = fills
+    self.requests = []
+
+  async def iter_user_fill_pages(self, user, from_ms=None, to_ms=None, coin=None):
+    self.requests.append(from_ms)
+    yield [f for f in self.fills if (not from_ms or f.time >= from_ms) and (not to_ms or f.time <= to_ms)]
+
+  async def get_user_fills(self, user, from_ms=None, to_ms=None, coin=None):
+    self.requests.append(from_ms)
+    return [f for f in self.fills if not from_ms or f.time >= from_ms]
+
+def test_mid_day_from_ms_keeps_whole_day(tmp_path):
+  archive = FillArchive(str(tmp_path))
+  upstream = Upstream(fills([DAY + HOUR_MS, DAY + 5 * HOUR_MS, DAY + DAY_MS + HOUR_MS]))
+  asyncio.run(backfill_user(upstream, archive, USER))
+  asyncio.run(backfill_user(upstream, archive, USER, from_ms=DAY + 3 * HOUR_MS, fresh=True))
+  assert upstream.requests[-1] == DAY
+  assert [f.time for f in archive.read_fills(USER, target_builder=BUILDER)] == [f.time for f in upstream.fills]
+  assert archive.days(USER) == [day_of(DAY), day_of(DAY + DAY_MS)]
+
+def test_first_sync_loads_archive(tmp_path):
+  archive = FillArchive(str(tmp_path / "archive"))
+  history = fills([DAY + HOUR_MS, DAY + 2 * HOUR_MS, DAY + DAY_MS])
+  archive.write_day(USER, day_of(DAY), history[:2])
+  upstream = Upstream(history)
+  ds = StoredFillDataSource(upstream, SQLiteFillStore(":memory:"), archive=archive)
+  stored = asyncio.run(ds.get_user_fills(USER))
+  # Upstream is only asked for fills from the newest archived one on
+  assert upstream.requests == [DAY + 2 * HOUR_MS]
+  assert [f.tid for f in stored] == [0, 1, 2]
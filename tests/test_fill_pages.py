@@ -0,0 +1,41 @@
+import json
+import asyncio
+import logging
+import httpx
+from src.infrastructure import public_hl_datasource
+from src.infrastructure.public_hl_datasource import PublicHLDataSource
+from src.infrastructure.rate_limiter import TokenBucketRateLimiter
+
+USER = "0xuser"
+
+def api_fill(tid, time):
+  return {
+    "coin": "BTC", "px": "100.0", "sz": "1.0", "side": "B", "time": time, "startPosition": "0.0",
+    "closedPnl": "0.0", "fee": "0.1", "tid": tid, "hash": f"0x{tid:x}",
+  }
+
+def upstream(fills, page_limit):
+  def handler(request):
+    payload = json.loads(request.content)
+    page = [f for f in fills if f["time"] >= payload["startTime"]]
+    return httpx.Response(200, json=page[:page_limit])
+
+  return PublicHLDataSource(
+    client=httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+    rate_limiter=TokenBucketRateLimiter(10**9),
+  )
+
+def test_pages_restart_at_the_last_millisecond(monkeypatch):
+  monkeypatch.setattr(public_hl_datasource, "FILLS_PAGE_LIMIT", 3)
+  fills = [api_fill(tid, 1_000 + tid // 2) for tid in range(10)]
+  stored = asyncio.run(upstream(fills, 3).get_user_fills(USER))
+  assert [f.tid for f in stored] == list(range(10))
+
+def test_full_page_inside_one_millisecond_is_reported(monkeypatch, caplog):
+  monkeypatch.setattr(public_hl_datasource, "FILLS_PAGE_LIMIT", 3)
+  fills = [api_fill(tid, 1_000) for tid in range(5)] + [api_fill(5, 1_001)]
+  with caplog.at_level(logging.WARNING, logger=public_hl_datasource.__name__):
+    stored = asyncio.run(upstream(fills, 3).get_user_fills(USER))
+  # Only a page's worth of that millisecond can be read; later fills still arrive
+  assert [f.tid for f in stored] == [0, 1, 2, 5]
+  assert f"more than 3 fills for {USER} at 1000 ms" in caplog.text
@@ -0,0 +1,44 @@
+import json
+import sqlite3
+from src.core.models import Fill
+from src.infrastructure.fill_store import SQLiteFillStore
+
+BUILDER = "0xbuilder"
+USER = "0xuser"
+
+def api_fill(tid):
+  return {
+    "coin": "BTC", "px": "100.0", "sz": "1.0", "side": "B", "time": 1_700_000_000_000 + tid * 1000,
+    "startPosition": "0.0", "closedPnl": "0.0", "fee": "0.1", "tid": tid, "hash": f"0x{tid:x}",
+    "builder": BUILDER, "builderFee": "0.01",
+  }
+
+def test_new_fills_are_stored_without_json():
+  store = SQLiteFillStore(":memory:")
+  fills = [Fill.from_api(api_fill(tid), BUILDER) for tid in range(3)]
+  store.insert_fills(USER, fills, fills[-1].time)
+  assert store._conn.execute("SELECT COUNT(*) FROM fills WHERE data IS NOT NULL").fetchone() == (0,)
+  assert store.query(USER, target_builder=BUILDER) == fills
+
+def test_json_only_store_is_migrated(tmp_path):
+  path = str(tmp_path / "fills.sqlite3")
+  conn = sqlite3.connect(path)
+  conn.execute(
+    "CREATE TABLE fills (user TEXT NOT NULL, tid INTEGER NOT NULL, coin TEXT NOT NULL, "
+    "time INTEGER NOT NULL, data TEXT NOT NULL, PRIMARY KEY (user, tid))"
+  )
+  conn.executemany(
+    "INSERT INTO fills (rowid, user, tid, coin, time, data) VALUES (?, ?, ?, ?, ?, ?)",
+    [(10 + tid, USER, tid, "BTC", api_fill(tid)["time"], json.dumps(api_fill(tid))) for tid in range(3)]
+  )
+  conn.commit()
+  conn.close()
+
+  store = SQLiteFillStore(path)
+  # Rowids are the aggregation and segment cursors, so they survive the rebuild
+  rows = store._conn.execute("SELECT rowid, tid, data FROM fills ORDER BY rowid").fetchall()
+  assert rows == [(10, 0, None), (11, 1, None), (12, 2, None)]
+  assert store.query(USER, target_builder=BUILDER) == [Fill.from_api(api_fill(tid), BUILDER) for tid in range(3)]
+  new = Fill.from_api(api_fill(3), BUILDER)
+  store.insert_fills(USER, [new], new.time)
+  assert len(store.query(USER)) == 4
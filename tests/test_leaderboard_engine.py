@@ -0,0 +1,107 @@
+import asyncio
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from src.api.leaderboard import router as leaderboard_router
+from src.core.base import BaseDataSource
+from src.core.models import Fill
+from src.services.leaderboard_engine import LeaderboardEngine
+
+BUILDER = "0xbuilder"
+FROM_MS = 1_700_000_000_000
+
+def fills(pnl):
+  # Opened and closed in the window, realizing `pnl`
+  return [
+    Fill.from_api({
+      "coin": "BTC", "px": "100.0", "sz": "1.0", "side": side, "time": FROM_MS + tid * 1000,
+      "startPosition": start, "closedPnl": closed_pnl, "fee": "0.0", "tid": tid, "hash": f"0x{tid:x}",
+    }, BUILDER)
+    for tid, side, start, closed_pnl in ((1, "B", "0.0", "0.0"), (2, "A", "1.0", str(pnl)))
+  ]
+
+class Source(BaseDataSource):
+  target_builder = BUILDER
+
+  def __init__(self, fills, equities):
+    self.fills = fills
+    self.equities = equities
+
+  async def get_deposits(self, wallet_address, from_ms=None, to_ms=None):
+    return []
+
+  async def get_user_fills(self, user, from_ms=None, to_ms=None, coin=None):
+    return [f for f in self.fills[user] if not from_ms or f.time >= from_ms]
+
+  async def iter_user_fill_pages(self, user, from_ms=None, to_ms=None, coin=None):
+    yield await self.get_user_fills(user, from_ms, to_ms, coin)
+
+  async def get_equity_at_timestamp(self, user, timestamp_ms):
+    assert timestamp_ms == FROM_MS
+    return self.equities[user]
+
+def ranking(engine, metric, max_start_capital=None):
+  rows, _ = engine.top(metric, max_start_capital=max_start_capital)
+  return [(row.user, row.metricValue) for row in rows]
+
+def test_return_pct_uses_each_users_start_equity():
+  source = Source({"0xa": fills(10.0), "0xb": fills(20.0), "0xc": fills(30.0)}, {"0xa": 100.0, "0xb": 1000.0})
+  engine = LeaderboardEngine(source, BUILDER, from_ms=FROM_MS)
+  engine.add_users(["0xa", "0xb", "0xc"])
+  asyncio.run(engine.refresh())
+
+  assert [user for user, _ in ranking(engine, "pnl")] == ["0xc", "0xb", "0xa"]
+  # 0xc's start equity is unknown, so it isn't ranked by returnPct yet
+  assert ranking(engine, "returnPct", 10_000.0) == [("0xa", "10.0"), ("0xb", "2.0")]
+  # The cap changes the order
+  assert ranking(engine, "returnPct", 50.0) == [("0xb", "40.0"), ("0xa", "20.0")]
+  assert engine.rank_of("0xb", "returnPct", max_start_capital=10_000.0).rank == 2
+
+  # The lookup is retried, and new fills move the kept indexes
+  source.equities["0xc"] = 3000.0
+  source.fills["0xa"] = fills(10.0) + [
+    Fill.from_api({
+      "coin": "ETH", "px": "10.0", "sz": "1.0", "side": side, "time": FROM_MS + tid * 1000, "startPosition": start,
+      "closedPnl": closed_pnl, "fee": "0.0", "tid": tid, "hash": f"0x{tid:x}",
+    }, BUILDER)
+    for tid, side, start, closed_pnl in ((3, "B", "0.0", "0.0"), (4, "A", "1.0", "-9.0"))
+  ]
+  asyncio.run(engine.refresh())
+  assert ranking(engine, "returnPct", 10_000.0) == [("0xb", "2.0"), ("0xa", "1.0"), ("0xc", "1.0")]
+
+class LedgerSource(Source):
+  # Deposited 100 before the start and 400 after it, with 5 of funding paid since
+  async def get_ledger_totals(self, user, timestamp_ms=None):
+    if timestamp_ms == FROM_MS:
+      return {"deposited": 100.0, "withdrawn": 0.0, "funding": 0.0}
+    return {"deposited": 500.0, "withdrawn": 0.0, "funding": -5.0}
+
+  async def get_account_value(self, user):
+    return 520.0
+
+  async def get_equity_at_timestamps(self, users, timestamp_ms):
+    raise AssertionError("start equity should come from the ledger totals")
+
+def test_start_equity_from_ledger_totals():
+  engine = LeaderboardEngine(LedgerSource({"0xa": fills(25.0)}, {}), BUILDER, from_ms=FROM_MS)
+  engine.add_users(["0xa"])
+  asyncio.run(engine.refresh())
+  assert engine.cohort["0xa"].equity_at_start == 125.0
+  assert ranking(engine, "returnPct", 10_000.0) == [("0xa", "20.0")]
+
+def test_precomputed_and_on_demand_return_pct_agree():
+  source = Source({"0xa": fills(10.0), "0xb": fills(20.0), "0xc": fills(30.0)}, {"0xa": 100.0, "0xb": 1000.0, "0xc": 0.5})
+  engine = LeaderboardEngine(source, BUILDER, from_ms=FROM_MS)
+  engine.add_users(source.fills)
+  asyncio.run(engine.refresh())
+  app = FastAPI()
+  app.include_router(leaderboard_router)
+  app.state.datasource = source
+  app.state.leaderboard_engine = engine
+
+  with TestClient(app) as client:
+    for cap in (50.0, 10_000.0):
+      window = f"metric=returnPct&maxStartCapital={cap}"
+      on_demand = client.get(f"/v1/leaderboard?users=0xa,0xb,0xc&fromMs={FROM_MS}&{window}").json()["leaderboard"]
+      precomputed = client.get(f"/v1/leaderboard/top?{window}").json()["leaderboard"]
+      assert on_demand == precomputed
+      assert client.get(f"/v1/leaderboard/rank/0xb?{window}").json() == on_demand[[r["user"] for r in on_demand].index("0xb")]
@@ -0,0 +1,55 @@
+import json
+import asyncio
+import httpx
+from src.infrastructure.fill_store import SQLiteFillStore, StoredFillDataSource
+from src.infrastructure.public_hl_datasource import LEDGER_PAGE_LIMITS, PublicHLDataSource
+from src.infrastructure.rate_limiter import TokenBucketRateLimiter
+
+USER = "0xuser"
+
+def update(i, kind):
+  delta = {"type": kind, "usdc": "1.0"}
+  if kind == "withdraw":
+    delta["fee"] = "0.0"
+  return {"time": 1_700_000_000_000 + i * 1000, "hash": f"0x{i:x}", "delta": delta}
+
+# More non-funding updates than a funding page holds, but fewer than a full non-funding page
+LEDGER = [update(i, "deposit" if i % 3 else "withdraw") for i in range(LEDGER_PAGE_LIMITS["userFunding"] + 100)]
+
+def upstream(requests):
+  def handler(request):
+    payload = json.loads(request.content)
+    requests.append(payload)
+    if payload["type"] == "userNonFundingLedgerUpdates":
+      page = [u for u in LEDGER if u["time"] >= payload.get("startTime", 0)]
+      return httpx.Response(200, json=page[:LEDGER_PAGE_LIMITS["userNonFundingLedgerUpdates"]])
+    return httpx.Response(200, json=[])
+
+  return PublicHLDataSource(
+    client=httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+    rate_limiter=TokenBucketRateLimiter(10**9),
+  )
+
+def test_deposits_only_include_deposits():
+  requests = []
+  public = upstream(requests)
+  deposits = [u for u in LEDGER if u["delta"]["type"] == "deposit"]
+  assert asyncio.run(public.get_deposits(USER)) == deposits
+  # A short non-funding page is the last one
+  assert len(requests) == 1
+
+  stored = StoredFillDataSource(upstream([]), SQLiteFillStore(":memory:"))
+  assert asyncio.run(stored.get_deposits(USER)) == deposits
+  assert len(asyncio.run(stored.get_ledger_updates(USER))) == len(LEDGER)
+
+def test_ledger_totals_at_timestamp():
+  stored = StoredFillDataSource(upstream([]), SQLiteFillStore(":memory:"))
+  cutoff = LEDGER[100]["time"]
+  before = LEDGER[:100]
+  deposited = sum(1.0 for u in before if u["delta"]["type"] == "deposit")
+  assert asyncio.run(stored.get_ledger_totals(USER, cutoff)) == {
+    "deposited": deposited, "withdrawn": len(before) - deposited, "funding": 0.0
+  }
+  assert asyncio.run(stored.get_ledger_totals(USER))["deposited"] == sum(
+    1.0 for u in LEDGER if u["delta"]["type"] == "deposit"
+  )
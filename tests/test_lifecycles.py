@@ -0,0 +1,59 @@
+import random
+import pytest
+from src.core.models import Fill
+from src.services.fill_engine import FillEngine, process_fills
+from src.services.fill_frame import summarize_fills
+
+BUILDER = "0xbuilder"
+
+def history(seed, with_start_position):
+  """
+  Random fills over two coins; sizes like 0.1 and 0.3 make the running sums inexact
+  """
+  rng = random.Random(seed)
+  positions = {"BTC": 0.0, "ETH": 0.0}
+  fills = []
+  for tid in range(400):
+    coin = rng.choice(list(positions))
+    position = positions[coin]
+    # Often close exactly, to exercise returns to zero
+    if position and rng.random() < 0.3:
+      side, sz = ("A", position) if position > 0 else ("B", -position)
+    else:
+      side, sz = rng.choice("AB"), rng.choice((0.1, 0.2, 0.3, 0.7, 1.0))
+    f = {
+      "coin": coin, "px": str(rng.uniform(90, 110)), "sz": str(sz), "side": side, "time": 1_000 + tid // 2,
+      "closedPnl": str(rng.uniform(-1, 1)), "fee": "0.01", "tid": tid, "hash": f"0x{tid:x}",
+    }
+    if with_start_position == "all" or (with_start_position == "some" and rng.random() < 0.5):
+      f["startPosition"] = str(position)
+    if rng.random() < 0.6:
+      f["builder"] = BUILDER
+      f["builderFee"] = "0.01"
+    positions[coin] = position + sz if side == "B" else position - sz
+    fills.append(Fill.from_api(f, BUILDER))
+  return fills
+
+@pytest.mark.parametrize("with_start_position", ["all", "some", "none"])
+@pytest.mark.parametrize("seed", range(5))
+def test_frame_matches_engine_on_seeded_windows(seed, with_start_position):
+  fills = history(seed, with_start_position)
+  for split in (0, 137, 251):
+    # State at the window start, as the checkpoints would give it
+    engine = FillEngine(BUILDER)
+    for fill in fills[:split]:
+      engine.feed(fill)
+    state = engine.export_state() or None
+    for builder_only in (False, True):
+      expected = process_fills(
+        fills[split:], BUILDER, builder_only, collect_trades=True, collect_positions=True, engine_state=state
+      )
+      actual = summarize_fills(
+        fills[split:], BUILDER, builder_only, collect_trades=True, collect_positions=True, initial_state=state
+      )
+      assert actual.trade_count == expected.trade_count
+      assert actual.tainted == expected.tainted
+      assert actual.trades == expected.trades
+      assert actual.positions == expected.positions
+      assert actual.realized_pnl == pytest.approx(expected.realized_pnl)
+      assert actual.volume == pytest.approx(expected.volume)
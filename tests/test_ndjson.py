@@ -0,0 +1,83 @@
+import os
+import json
+import random
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from src.api.trades import router as trades_router
+from src.api.positions_history import router as positions_router
+from src.infrastructure import public_hl_datasource
+from src.infrastructure.fill_store import SQLiteFillStore, StoredFillDataSource
+from src.infrastructure.public_hl_datasource import PublicHLDataSource
+from src.infrastructure.rate_limiter import TokenBucketRateLimiter
+
+BUILDER = os.environ["TARGET_BUILDER"]
+USER = "0xuser"
+PAGE_LIMIT = 40
+
+def history(n=300, seed=7):
+  # Several coins, mixed builders, some fills without startPosition, a few sharing a millisecond
+  rng = random.Random(seed)
+  positions = {"BTC": 0.0, "ETH": 0.0, "SOL": 0.0}
+  fills = []
+  for tid in range(n):
+    coin = rng.choice(list(positions))
+    position = positions[coin]
+    if position and rng.random() < 0.3:
+      side, sz = ("A", position) if position > 0 else ("B", -position)
+    else:
+      side, sz = rng.choice("AB"), rng.choice((0.5, 1.0, 2.0))
+    f = {
+      "coin": coin, "px": str(round(rng.uniform(90, 110), 2)), "sz": str(sz), "side": side,
+      "time": 1_700_000_000_000 + tid // 3 * 1000, "closedPnl": str(round(rng.uniform(-1, 1), 3)), "fee": "0.01",
+      "tid": tid, "hash": f"0x{tid:x}",
+    }
+    if rng.random() < 0.8:
+      f["startPosition"] = str(position)
+    if rng.random() < 0.6:
+      f["builder"] = BUILDER
+      f["builderFee"] = "0.01"
+    positions[coin] = position + sz if side == "B" else position - sz
+    fills.append(f)
+  return fills
+
+FILLS = history()
+FROM_MS = FILLS[120]["time"]
+
+def handler(request):
+  payload = json.loads(request.content)
+  if payload["type"] != "userFillsByTime":
+    return httpx.Response(200, json=[])
+  start, end = payload.get("startTime", 0), payload.get("endTime", 1 << 62)
+  return httpx.Response(200, json=[f for f in FILLS if start <= f["time"] <= end][:PAGE_LIMIT])
+
+@pytest.fixture(params=["direct", "store"])
+def client(request, monkeypatch):
+  # Small pages, so the stream arrives in several chunks
+  monkeypatch.setattr(public_hl_datasource, "FILLS_PAGE_LIMIT", PAGE_LIMIT)
+  ds = PublicHLDataSource(
+    client=httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+    rate_limiter=TokenBucketRateLimiter(10**9),
+  )
+  if request.param == "store":
+    ds = StoredFillDataSource(ds, SQLiteFillStore(":memory:"))
+  app = FastAPI()
+  for router in (trades_router, positions_router):
+    app.include_router(router)
+  app.state.datasource = ds
+  with TestClient(app) as c:
+    yield c
+
+@pytest.mark.parametrize("path", ["/v1/trades", "/v1/positions/history"])
+@pytest.mark.parametrize("query", ["", "&builderOnly=true", f"&fromMs={FROM_MS}", "&coin=ETH&builderOnly=true"])
+def test_ndjson_rows_match_json_body(client, path, query):
+  url = f"{path}?user={USER}{query}"
+  body = client.get(url).json()
+  streamed = client.get(f"{url}&format=ndjson")
+  assert streamed.headers["content-type"] == "application/x-ndjson"
+  assert [json.loads(line) for line in streamed.text.splitlines()] == body
+  assert body
+  # The Accept header opts in the same way
+  accepted = client.get(url, headers={"Accept": "application/x-ndjson"})
+  assert accepted.text == streamed.text
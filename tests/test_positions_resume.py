@@ -0,0 +1,97 @@
+import os
+import json
+import random
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from src.api.positions_history import router as positions_router
+from src.infrastructure.fill_store import SQLiteFillStore, StoredFillDataSource
+from src.infrastructure.public_hl_datasource import PublicHLDataSource
+from src.infrastructure.rate_limiter import TokenBucketRateLimiter
+from src.services.fill_buckets import BucketAggregator
+
+BUILDER = os.environ["TARGET_BUILDER"]
+USER = "0xuser"
+
+def history(n, seed=3):
+  # Two coins, mixed builders, some fills without startPosition, several per millisecond
+  rng = random.Random(seed)
+  positions = {"BTC": 0.0, "ETH": 0.0}
+  fills = []
+  for tid in range(n):
+    coin = rng.choice(list(positions))
+    position = positions[coin]
+    if position and rng.random() < 0.3:
+      side, sz = ("A", position) if position > 0 else ("B", -position)
+    else:
+      side, sz = rng.choice("AB"), rng.choice((0.1, 0.3, 1.0))
+    f = {
+      "coin": coin, "px": str(round(rng.uniform(90, 110), 2)), "sz": str(sz), "side": side,
+      "time": 1_700_000_000_000 + tid // 3 * 1000, "closedPnl": "0.0", "fee": "0.01",
+      "tid": tid, "hash": f"0x{tid:x}",
+    }
+    if rng.random() < 0.8:
+      f["startPosition"] = str(position)
+    if rng.random() < 0.6:
+      f["builder"] = BUILDER
+      f["builderFee"] = "0.01"
+    positions[coin] = position + sz if side == "B" else position - sz
+    fills.append(f)
+  return fills
+
+HISTORY = history(300)
+
+@pytest.fixture
+def upstream_fills():
+  # Fills the upstream knows about so far; tests append to it as time passes
+  return list(HISTORY[:200])
+
+@pytest.fixture
+def client(upstream_fills):
+  def handler(request):
+    payload = json.loads(request.content)
+    if payload["type"] != "userFillsByTime":
+      return httpx.Response(200, json=[])
+    start, end = payload.get("startTime", 0), payload.get("endTime", 1 << 62)
+    return httpx.Response(200, json=[f for f in upstream_fills if start <= f["time"] <= end])
+
+  upstream = PublicHLDataSource(
+    client=httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+    rate_limiter=TokenBucketRateLimiter(10**9),
+  )
+  store = SQLiteFillStore(":memory:")
+  app = FastAPI()
+  app.include_router(positions_router)
+  # Frequent checkpoints, so resumes start from one rather than the first fill
+  app.state.datasource = StoredFillDataSource(upstream, store, BucketAggregator(store, BUILDER, checkpoint_every=20))
+  with TestClient(app) as c:
+    yield c
+
+@pytest.mark.parametrize("query", ["", "&builderOnly=true", "&coin=ETH"])
+def test_since_and_cursor_match_full_replay(client, upstream_fills, query):
+  url = f"/v1/positions/history?user={USER}{query}"
+  since = HISTORY[90]["time"]
+
+  first = client.get(f"{url}&sinceMs={since}&toMs={HISTORY[150]['time']}").json()
+  rows = first["positions"]
+  assert first["cursor"] == f"{HISTORY[152]['time']}:{HISTORY[152]['tid']}"
+  second = client.get(f"{url}&cursor={first['cursor']}").json()
+  rows += second["positions"]
+
+  # New fills arrive; resuming from the last cursor returns only their snapshots
+  upstream_fills.extend(HISTORY[200:])
+  third = client.get(f"{url}&cursor={second['cursor']}").json()
+  assert third["cursor"] == f"{HISTORY[-1]['time']}:{HISTORY[-1]['tid']}"
+  rows += third["positions"]
+  assert third["positions"]
+
+  full = [row for row in client.get(url).json() if row["timeMs"] >= since]
+  assert rows == full
+
+  # Nothing new since the last cursor
+  assert client.get(f"{url}&cursor={third['cursor']}").json() == {"positions": [], "cursor": third["cursor"]}
+
+def test_since_and_from_are_exclusive(client):
+  assert client.get(f"/v1/positions/history?user={USER}&sinceMs=1&fromMs=1").status_code == 400
+  assert client.get(f"/v1/positions/history?user={USER}&cursor=bad").status_code == 400
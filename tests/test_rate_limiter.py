@@ -0,0 +1,64 @@
+import time
+import asyncio
+import httpx
+import pytest
+from src.infrastructure.public_hl_datasource import PublicHLDataSource
+from src.infrastructure.rate_limiter import TokenBucketRateLimiter, request_weight, response_weight
+
+def test_request_and_response_weights():
+  assert request_weight({"type": "clearinghouseState"}) == 2
+  assert request_weight({"type": "userFillsByTime"}) == 20
+  assert request_weight({"type": "userRole"}) == 60
+  payload = {"type": "userFillsByTime"}
+  assert response_weight(payload, [{}] * 45) == 2
+  assert response_weight({"type": "clearinghouseState"}, [{}] * 45) == 0
+  assert response_weight(payload, {"not": "a list"}) == 0
+
+def test_waiters_are_served_in_arrival_order():
+  async def run():
+    # 100 weight/s from an empty bucket
+    limiter = TokenBucketRateLimiter(6000, capacity=10)
+    limiter.tokens = 0.0
+    served = []
+
+    async def call(name, weight):
+      await limiter.acquire(weight)
+      served.append(name)
+
+    tasks = []
+    for name, weight in (("first", 5), ("cheap", 1), ("last", 1)):
+      tasks.append(asyncio.create_task(call(name, weight)))
+      await asyncio.sleep(0)
+    await asyncio.gather(*tasks)
+    # A cheap request doesn't jump the queue ahead of a heavier one
+    assert served == ["first", "cheap", "last"]
+    assert limiter.stats()["maxQueueDepth"] == 3
+
+  asyncio.run(run())
+
+def test_charge_can_drive_the_bucket_negative():
+  async def run():
+    limiter = TokenBucketRateLimiter(6000, capacity=10)
+    await limiter.acquire(10)
+    limiter.charge(20)
+    assert limiter.tokens == pytest.approx(-20, abs=1)
+    # The next caller waits for the debt plus its own weight: ~0.21s at 100 weight/s
+    started = time.monotonic()
+    await limiter.acquire(1)
+    assert time.monotonic() - started >= 0.18
+
+  asyncio.run(run())
+
+def test_datasource_charges_list_responses():
+  def handler(request):
+    return httpx.Response(200, json=[{}] * 45)
+
+  async def run():
+    # Slow enough that refill during the test is negligible
+    limiter = TokenBucketRateLimiter(60, capacity=100)
+    ds = PublicHLDataSource(client=httpx.AsyncClient(transport=httpx.MockTransport(handler)), rate_limiter=limiter)
+    await ds._post({"type": "userFillsByTime", "user": "0xuser", "startTime": 0})
+    # 20 for the request, 2 for the 45 fills that came back
+    assert limiter.tokens == pytest.approx(100 - 22, abs=0.5)
+
+  asyncio.run(run())
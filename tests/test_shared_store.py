@@ -0,0 +1,47 @@
+import threading
+from src.core.models import Fill
+from src.infrastructure.fill_store import SQLiteFillStore
+from src.services.fill_buckets import BucketAggregator
+
+BUILDER = "0xbuilder"
+USER = "0xuser"
+
+def fills(n, start_tid=0):
+  return [
+    Fill.from_api({
+      "coin": "BTC", "px": "100.0", "sz": "1.0", "side": "B" if i % 2 else "A", "time": 1_700_000_000_000 + i * 1000,
+      "startPosition": "0.0" if i % 2 else "1.0", "closedPnl": "0.5", "fee": "0.1", "tid": i, "hash": f"0x{i:x}",
+    }, BUILDER)
+    for i in range(start_tid, start_tid + n)
+  ]
+
+def test_two_handles_aggregate_each_fill_once(tmp_path):
+  path = str(tmp_path / "fills.sqlite3")
+  stores = [SQLiteFillStore(path), SQLiteFillStore(path)]
+  aggregators = [BucketAggregator(store, BUILDER) for store in stores]
+  total = 0
+  for batch in range(5):
+    new = fills(100, start_tid=batch * 100)
+    stores[batch % 2].insert_fills(USER, new, new[-1].time)
+    total += len(new)
+    # Both workers fold the same new fills at once
+    threads = [threading.Thread(target=aggregator.update, args=(USER,)) for aggregator in aggregators]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+    for aggregator in aggregators:
+      assert aggregator.window(USER).trade_count == total
+
+def test_stale_cursor_is_not_applied(tmp_path):
+  path = str(tmp_path / "fills.sqlite3")
+  first, second = SQLiteFillStore(path), SQLiteFillStore(path)
+  new = fills(10)
+  first.insert_fills(USER, new, new[-1].time)
+  # Both read the cursor before either applies
+  after_first, _ = first.aggregate_state(USER, BUILDER)
+  after_second, _ = second.aggregate_state(USER, BUILDER)
+  buckets = {("day", 0, "BTC"): [0.0, 0.0, 0.0, 10, 0.0, 0.0, 0.0, 0, 0]}
+  assert first.apply_aggregates(USER, BUILDER, after_first, 10, {}, [], buckets)
+  assert not second.apply_aggregates(USER, BUILDER, after_second, 10, {}, [], buckets)
+  assert second.bucket_sums(USER, None, "day", 0, 1)[3] == 10